@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import DailySales
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    # Admin configuration for the DailySales model.
+    list_display = ('date', 'dimension', 'key', 'revenue', 'units', 'orders', 'refunds', 'returned_units')
+    list_filter = ('dimension',)
+    date_hierarchy = 'date'
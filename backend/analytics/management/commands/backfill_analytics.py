@@ -0,0 +1,40 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from orders.models import Order
+from analytics.rollups import backfill
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups from order history (all of it by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First date (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='end', help='Last date (YYYY-MM-DD).')
+        parser.add_argument('--days-per-batch', type=int, default=31, help='Dates rebuilt per transaction.')
+
+    def parse(self, value, name):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid --{name} date: {value}')
+        return day
+
+    def handle(self, *args, **options):
+        bounds = Order.objects.aggregate(first=Min('order_date'), last=Max('order_date'))
+        if not (options['start'] and options['end']) and bounds['first'] is None:
+            self.stdout.write('No orders to backfill.')
+            return
+        start = self.parse(options['start'], 'from') if options['start'] else timezone.localdate(bounds['first'])
+        end = self.parse(options['end'], 'to') if options['end'] else timezone.localdate(bounds['last'])
+        if start > end:
+            raise CommandError('--from must not be after --to.')
+
+        rows = 0
+        step = timedelta(days=options['days_per_batch'])
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + step - timedelta(days=1), end)
+            rows += backfill(chunk_start, chunk_end)
+            chunk_start = chunk_end + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup rows for {start} to {end}.'))
@@ -0,0 +1,43 @@
+from django.db import models
+
+class DailySales(models.Model):
+    # Sales of one product, category or vendor (or the whole shop) on one day, kept up to date by analytics.rollups.
+    DIMENSION_TOTAL = 'total'
+    DIMENSION_PRODUCT = 'product'
+    DIMENSION_CATEGORY = 'category'
+    DIMENSION_VENDOR = 'vendor'
+    DIMENSIONS = [DIMENSION_TOTAL, DIMENSION_PRODUCT, DIMENSION_CATEGORY, DIMENSION_VENDOR]
+
+    date = models.DateField()
+    dimension = models.CharField(max_length=20)
+    key = models.IntegerField() # Product, category or vendor id; 0 for the shop total
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    returned_units = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily sales'
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key', 'date'], name='dailysales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['dimension', 'date'], name='dailysales_dim_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.key} on {self.date}"
+
+class AppliedEvent(models.Model):
+    # Orders and return items already counted, so a retried task never counts them twice.
+    kind = models.CharField(max_length=20) # 'order' or 'return_item'
+    object_id = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='appliedevent_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
@@ -0,0 +1,208 @@
+"""
+Daily sales rollups.
+
+DailySales holds one row per day for each product, category and vendor that
+sold something, plus a shop-wide ``total`` row. Reports read these rows
+instead of grouping over OrderItem.
+
+Rows are kept current incrementally. Every order queues an
+``analytics_order`` task at checkout and every return item an
+``analytics_return_item`` task (see analytics.tasks), and ``apply_event``
+adds that order's or item's figures to the rows of its day. Returns are
+counted against the day of the original order, so a day's net revenue is
+``revenue - refunds``. Revenue is what the lines cost after discounts
+(OrderItem.line_total), and a return refunds its share of that. An AppliedEvent row, written in the same
+transaction as the increments, makes a retried task a no-op.
+
+``backfill`` rebuilds a date range from order history in a handful of
+GROUP BY queries per batch of orders, plus one pass over the returns, and marks those orders and returns as applied. It also
+reconciles anything the incremental path does not follow, such as orders
+canceled after checkout. It can run against a live shop: the orders and
+returns it rebuilds are read once up front, and anything applied by a task
+while it runs is added back after the old rows are deleted.
+"""
+from datetime import datetime, time, timedelta
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from catalog.pricing import quantize
+from orders.models import Order, OrderItem
+from vendor.models import VendorProduct
+from .models import AppliedEvent, DailySales
+
+# The app is named after a keyword, so its models can't be imported with an import statement.
+ReturnItem = apps.get_model('return', 'ReturnItem')
+
+EXCLUDED_STATUSES = ('canceled', 'cancelled')
+MEASURES = ['revenue', 'units', 'orders', 'refunds', 'returned_units']
+# Items from before line_total was recorded sold at their list price.
+LINE_TOTAL = Sum(Coalesce(F('line_total'), F('quantity') * F('price')), output_field=DecimalField(max_digits=14, decimal_places=2))
+RETURN_FIELDS = (
+    'quantity', 'order_item__quantity', 'order_item__price', 'order_item__line_total',
+    'order_item__product_id', 'order_item__product__category_id', 'order_item__order__order_date',
+)
+
+def vendors_by_product(product_ids):
+    vendors = {}
+    for product_id, vendor_id in VendorProduct.objects.filter(product_id__in=product_ids).values_list('product_id', 'vendor_id'):
+        vendors.setdefault(product_id, []).append(vendor_id)
+    return vendors
+
+def line_keys(product_id, category_id, vendors):
+    # Every rollup row one order line counts towards.
+    keys = [(DailySales.DIMENSION_TOTAL, 0), (DailySales.DIMENSION_PRODUCT, product_id), (DailySales.DIMENSION_CATEGORY, category_id)]
+    keys += [(DailySales.DIMENSION_VENDOR, vendor_id) for vendor_id in vendors.get(product_id, ())]
+    return keys
+
+def refund_amount(quantity, ordered, price, line_total):
+    # What returning `quantity` of the `ordered` units gives back.
+    if line_total is None:
+        return quantity * price
+    return quantize(line_total * quantity / ordered)
+
+def add(deltas, row_key, **measures):
+    totals = deltas.setdefault(row_key, dict.fromkeys(MEASURES, 0))
+    for name, value in measures.items():
+        totals[name] += value
+
+def order_deltas(order_id):
+    # Changes one order makes to the rollups, as {(dimension, key, date): {measure: delta}}.
+    order = Order.objects.filter(pk=order_id).exclude(status__in=EXCLUDED_STATUSES).values('order_date').first()
+    if order is None:
+        return {}
+    day = timezone.localdate(order['order_date'])
+    items = list(OrderItem.objects.filter(order_id=order_id).values_list('product_id', 'product__category_id', 'quantity', 'price', 'line_total'))
+    vendors = vendors_by_product({item[0] for item in items})
+    deltas = {}
+    for product_id, category_id, quantity, price, line_total in items:
+        revenue = quantity * price if line_total is None else line_total
+        for dimension, key in line_keys(product_id, category_id, vendors):
+            add(deltas, (dimension, key, day), revenue=revenue, units=quantity)
+    for totals in deltas.values():
+        totals['orders'] = 1 # Each row this order touches gains one order, however many lines it has there.
+    return deltas
+
+def return_item_deltas(return_item_id):
+    item = (
+        ReturnItem.objects.filter(pk=return_item_id)
+        .exclude(order_item__order__status__in=EXCLUDED_STATUSES)
+        .values_list(*RETURN_FIELDS)
+        .first()
+    )
+    if item is None:
+        return {}
+    deltas = {}
+    add_return(deltas, item, vendors_by_product([item[4]]))
+    return deltas
+
+def add_return(deltas, item, vendors):
+    quantity, ordered, price, line_total, product_id, category_id, order_date = item
+    refund = refund_amount(quantity, ordered, price, line_total)
+    for dimension, key in line_keys(product_id, category_id, vendors):
+        add(deltas, (dimension, key, timezone.localdate(order_date)), refunds=refund, returned_units=quantity)
+
+def increment(row_key, totals):
+    dimension, key, day = row_key
+    changes = {name: F(name) + value for name, value in totals.items() if value}
+    rows = DailySales.objects.filter(dimension=dimension, key=key, date=day)
+    if not changes or rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(dimension=dimension, key=key, date=day, **totals)
+    except IntegrityError:
+        # Another worker created the row first.
+        rows.update(**changes)
+
+BUILDERS = {'order': order_deltas, 'return_item': return_item_deltas}
+
+def apply_event(kind, object_id):
+    # Add one order or return item to the rollups, exactly once; returns whether it was applied now.
+    with transaction.atomic():
+        _, created = AppliedEvent.objects.get_or_create(kind=kind, object_id=object_id)
+        if not created:
+            return False
+        for row_key, totals in sorted(BUILDERS[kind](object_id).items()):
+            increment(row_key, totals)
+    return True
+
+def day_bounds(start, end):
+    # Aware datetimes covering the local dates start..end, so the order_date index can be used.
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+def grouped(queryset, date_lookup, key_lookup, measures):
+    # Sum `measures` per (day, key); key_lookup None groups the whole shop.
+    fields = ['day'] + ([key_lookup] if key_lookup else [])
+    rows = queryset.annotate(day=TruncDate(date_lookup)).values(*fields).annotate(**measures).order_by()
+    for row in rows:
+        yield row.pop('day'), row.pop(key_lookup) if key_lookup else 0, row
+
+DIMENSION_LOOKUPS = {
+    DailySales.DIMENSION_TOTAL: None,
+    DailySales.DIMENSION_PRODUCT: 'product_id',
+    DailySales.DIMENSION_CATEGORY: 'product__category_id',
+    DailySales.DIMENSION_VENDOR: 'product__vendorproduct__vendor_id',
+}
+
+def chunked(ids, size):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def backfill(start, end, batch_size=1000):
+    # Recompute the rollups for local dates start..end (inclusive) from orders and returns; returns the row count.
+    lower, upper = day_bounds(start, end)
+    orders = Order.objects.filter(order_date__gte=lower, order_date__lt=upper)
+    # What gets rebuilt is fixed here: exactly these are counted and marked as applied, so an order placed while
+    # the backfill runs is left to its own task.
+    order_ids = list(orders.values_list('pk', flat=True))
+    return_ids = [
+        pk for batch in chunked(order_ids, batch_size)
+        for pk in ReturnItem.objects.filter(order_item__order_id__in=batch).values_list('pk', flat=True)
+    ]
+
+    rows = {}
+    for batch in chunked(order_ids, batch_size):
+        items = OrderItem.objects.filter(order_id__in=batch).exclude(order__status__in=EXCLUDED_STATUSES)
+        for dimension, lookup in DIMENSION_LOOKUPS.items():
+            sales = grouped(items, 'order__order_date', lookup, {
+                'revenue': LINE_TOTAL, 'units': Sum('quantity'), 'orders': Count('order_id', distinct=True),
+            })
+            for day, key, measures in sales:
+                if key is not None: # Products without a vendor have no vendor row.
+                    add(rows, (dimension, key, day), **measures)
+    # Refunds are a share of each line's discounted total, which is exact in Python but not in SQLite's arithmetic.
+    for batch in chunked(return_ids, batch_size):
+        returns = ReturnItem.objects.filter(pk__in=batch).exclude(order_item__order__status__in=EXCLUDED_STATUSES)
+        vendors = vendors_by_product(set(returns.values_list('order_item__product_id', flat=True)))
+        for item in returns.values_list(*RETURN_FIELDS):
+            add_return(rows, item, vendors)
+
+    with transaction.atomic():
+        DailySales.objects.filter(date__gte=start, date__lte=end).delete()
+        # Events applied since the ids were read had their increments deleted just now, so they are added back.
+        late = {
+            'order': set(orders.values_list('pk', flat=True)) - set(order_ids),
+            'return_item': set(ReturnItem.objects.filter(order_item__order__in=orders).values_list('pk', flat=True)) - set(return_ids),
+        }
+        for kind, object_ids in late.items():
+            for batch in chunked(sorted(object_ids), batch_size):
+                for object_id in AppliedEvent.objects.filter(kind=kind, object_id__in=batch).values_list('object_id', flat=True):
+                    for row_key, totals in BUILDERS[kind](object_id).items():
+                        add(rows, row_key, **totals)
+        DailySales.objects.bulk_create(
+            [DailySales(dimension=dimension, key=key, date=day, **totals) for (dimension, key, day), totals in rows.items()],
+            batch_size=batch_size,
+        )
+        # Mark everything counted here so tasks still in the queue don't add it again.
+        mark_applied('order', order_ids, batch_size)
+        mark_applied('return_item', return_ids, batch_size)
+    return len(rows)
+
+def mark_applied(kind, object_ids, batch_size):
+    for batch in chunked(object_ids, batch_size):
+        AppliedEvent.objects.bulk_create([AppliedEvent(kind=kind, object_id=object_id) for object_id in batch], ignore_conflicts=True)
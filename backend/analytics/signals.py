@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from orders.tasks import enqueue
+
+@receiver(post_save, sender='return.ReturnItem')
+def return_item_created(sender, instance, created, **kwargs):
+    # Returns are counted once, when the item is recorded.
+    if created:
+        enqueue('analytics_return_item', {'return_item_id': instance.pk}, f'analytics_return_item:{instance.pk}')
@@ -0,0 +1,10 @@
+from orders.tasks import register
+from .rollups import apply_event
+
+@register('analytics_order', on_order=True)
+def count_order(payload):
+    apply_event('order', payload['order_id'])
+
+@register('analytics_return_item')
+def count_return_item(payload):
+    apply_event('return_item', payload['return_item_id'])
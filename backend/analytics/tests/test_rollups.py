@@ -0,0 +1,138 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.apps import apps
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from analytics.models import DailySales
+from analytics import rollups as rollups_module
+from analytics.rollups import apply_event, backfill
+from catalog.models import Category, Product
+from orders.models import Order, OrderItem, OrderTask
+from orders.tasks import run_pending
+from users.models import Address
+from vendor.models import Vendor, VendorProduct
+
+User = get_user_model()
+ReturnRequest = apps.get_model('return', 'ReturnRequest')
+ReturnItem = apps.get_model('return', 'ReturnItem')
+
+def rollups():
+    return {
+        (row.dimension, row.key, row.date): (row.revenue, row.units, row.orders, row.refunds, row.returned_units)
+        for row in DailySales.objects.all()
+    }
+
+class RollupTest(TestCase):
+    # Test cases for maintaining the daily sales rollups.
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='password123')
+        self.address = Address.objects.create(user=self.user, street='1 Main St', city='Tehran', state='Tehran', zip_code='12345')
+        self.category = Category.objects.create(name='Audio', description='Audio.')
+        self.headphones = Product.objects.create(
+            product_name='Headphones', sku='HP1', description='Headphones.', price=50,
+            weight=0.3, dimensions='20x18x8 cm', status='available', category=self.category
+        )
+        self.speaker = Product.objects.create(
+            product_name='Speaker', sku='SP1', description='A speaker.', price=80,
+            weight=1, dimensions='20x10x10 cm', status='available', category=self.category
+        )
+        seller = User.objects.create_user(email='seller@example.com', password='password123')
+        self.vendor = Vendor.objects.create(user=seller, shop_name='Sound Shop', description='Audio.', status='active')
+        VendorProduct.objects.create(vendor=self.vendor, product=self.headphones)
+        self.today = timezone.localdate()
+
+    def order(self, lines, days_ago=0, status='pending'):
+        order = Order.objects.create(user=self.user, total_price=0, status=status, address=self.address)
+        Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days_ago))
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        return order
+
+    def test_order_rollup(self):
+        # One order adds to the product, category, vendor and total rows of its day, once.
+        order = self.order([(self.headphones, 2), (self.speaker, 1)])
+        self.assertTrue(apply_event('order', order.pk))
+        self.assertFalse(apply_event('order', order.pk))
+        rows = rollups()
+        self.assertEqual(rows[('total', 0, self.today)], (Decimal('180.00'), 3, 1, 0, 0))
+        self.assertEqual(rows[('category', self.category.pk, self.today)], (Decimal('180.00'), 3, 1, 0, 0))
+        self.assertEqual(rows[('product', self.speaker.pk, self.today)], (Decimal('80.00'), 1, 1, 0, 0))
+        self.assertEqual(rows[('vendor', self.vendor.pk, self.today)], (Decimal('100.00'), 2, 1, 0, 0))
+
+        apply_event('order', self.order([(self.headphones, 1)]).pk)
+        self.assertEqual(rollups()[('product', self.headphones.pk, self.today)], (Decimal('150.00'), 3, 2, 0, 0))
+
+    def test_return_counted_by_worker(self):
+        # Recording a return item queues a task that adds the refund to the order's day.
+        order = self.order([(self.headphones, 2)], days_ago=3)
+        apply_event('order', order.pk)
+        request = ReturnRequest.objects.create(order=order, user=self.user, status='pending', reason='Broken.', refund_amount=50)
+        ReturnItem.objects.create(
+            return_request=request, order_item=order.orderitem_set.get(), quantity=1, status='pending', description='Broken.',
+        )
+        self.assertEqual(OrderTask.objects.filter(task_type='analytics_return_item').count(), 1)
+        run_pending('test')
+        day = self.today - timedelta(days=3)
+        self.assertEqual(rollups()[('product', self.headphones.pk, day)], (Decimal('100.00'), 2, 1, Decimal('50.00'), 1))
+
+    def test_backfill_matches_incremental(self):
+        # Rebuilding from history gives the same rows and marks orders as applied.
+        orders = [
+            self.order([(self.headphones, 2), (self.speaker, 1)]),
+            self.order([(self.speaker, 3)], days_ago=1),
+            self.order([(self.headphones, 1)], days_ago=1),
+        ]
+        self.order([(self.speaker, 5)], status='canceled')
+        for order in orders:
+            apply_event('order', order.pk)
+        incremental = rollups()
+
+        DailySales.objects.all().delete()
+        backfill(self.today - timedelta(days=7), self.today)
+        self.assertEqual(rollups(), incremental)
+        self.assertFalse(apply_event('order', orders[0].pk))
+
+    def test_orders_arriving_mid_backfill(self):
+        # One order placed and applied while the backfill aggregates, one still waiting for its task: both count once.
+        self.order([(self.headphones, 1)])
+        late = []
+        grouped = rollups_module.grouped
+        def place_orders(*args):
+            if not late:
+                late.append(self.order([(self.speaker, 1)]))
+                apply_event('order', late[0].pk)
+                late.append(self.order([(self.speaker, 2)]))
+            return grouped(*args)
+        with mock.patch.object(rollups_module, 'grouped', place_orders):
+            backfill(self.today, self.today)
+        self.assertTrue(apply_event('order', late[1].pk))
+        self.assertEqual(rollups()[('total', 0, self.today)], (Decimal('290.00'), 4, 3, 0, 0))
+
+    def test_discounted_lines(self):
+        # Revenue and refunds follow what a line cost after discounts, not its list price.
+        order = self.order([])
+        item = OrderItem.objects.create(order=order, product=self.headphones, quantity=3, price=50, line_total=Decimal('100.00'))
+        request = ReturnRequest.objects.create(order=order, user=self.user, status='pending', reason='Broken.', refund_amount=0)
+        ReturnItem.objects.create(return_request=request, order_item=item, quantity=1, status='pending', description='Broken.')
+        run_pending('test')
+        apply_event('order', order.pk)
+        incremental = rollups()
+        self.assertEqual(incremental[('product', self.headphones.pk, self.today)], (Decimal('100.00'), 3, 1, Decimal('33.33'), 1))
+
+        DailySales.objects.all().delete()
+        backfill(self.today, self.today)
+        self.assertEqual(rollups(), incremental)
+
+    def test_backfill_command(self):
+        self.order([(self.speaker, 1)], days_ago=40)
+        self.order([(self.speaker, 2)])
+        out = StringIO()
+        call_command('backfill_analytics', '--days-per-batch', '7', stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        self.assertEqual(
+            sorted(DailySales.objects.filter(dimension='total').values_list('units', flat=True)), [1, 2],
+        )
@@ -0,0 +1,64 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from analytics.models import DailySales
+from catalog.models import Category, Product
+
+User = get_user_model()
+
+class AnalyticsAPITest(APITestCase):
+    # Test cases for the reporting endpoints over the rollups.
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        category = Category.objects.create(name='Audio', description='Audio.')
+        self.products = [
+            Product.objects.create(
+                product_name=f'Speaker {i}', sku=f'SP{i}', description='A speaker.', price=10,
+                weight=1, dimensions='20x10x10 cm', status='available', category=category
+            )
+            for i in range(3)
+        ]
+        today = timezone.localdate()
+        rows = []
+        for days_ago in range(60):
+            day = today - timedelta(days=days_ago)
+            for i, product in enumerate(self.products):
+                # Product 2 sells most recently, product 0 only sold more than 30 days ago.
+                if (i == 0 and days_ago < 30) or (i == 2 and days_ago >= 30):
+                    continue
+                rows.append(DailySales(date=day, dimension='product', key=product.pk, revenue=10 * (i + 1), units=i + 1, orders=1))
+            rows.append(DailySales(date=day, dimension='total', key=0, revenue=100, units=10, orders=5, refunds=10))
+        DailySales.objects.bulk_create(rows)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_top_products(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('analytics-top-products'), {'days': 30, 'limit': 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([row['id'] for row in results], [self.products[2].pk, self.products[1].pk])
+        self.assertEqual((results[0]['name'], results[0]['revenue'], results[0]['units']), ('Speaker 2', 900.0, 90))
+
+    def test_revenue_series(self):
+        today = timezone.localdate()
+        params = {'from': today - timedelta(days=365), 'to': today, 'interval': 'month'}
+        response = self.client.get(reverse('analytics-revenue'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(point['revenue'] for point in response.data['series']), 6000.0)
+        self.assertEqual(sum(point['net_revenue'] for point in response.data['series']), 5400.0)
+        daily = self.client.get(reverse('analytics-revenue')).data['series']
+        self.assertEqual(len(daily), 30)
+        self.assertEqual(daily[-1]['period'], timezone.localdate())
+
+    def test_product_series_requires_id(self):
+        url = reverse('analytics-revenue')
+        self.assertEqual(self.client.get(url, {'dimension': 'product'}).status_code, status.HTTP_400_BAD_REQUEST)
+        series = self.client.get(url, {'dimension': 'product', 'id': self.products[1].pk}).data['series']
+        self.assertEqual(sum(point['units'] for point in series), 60)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=User.objects.create_user(email='user@example.com', password='password123'))
+        self.assertEqual(self.client.get(reverse('analytics-top-products')).status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,10 @@
+from django.urls import path
+from .models import DailySales
+from .views import TopSellersView, RevenueSeriesView
+
+urlpatterns = [
+    path('top-products/', TopSellersView.as_view(dimension=DailySales.DIMENSION_PRODUCT), name='analytics-top-products'),
+    path('top-categories/', TopSellersView.as_view(dimension=DailySales.DIMENSION_CATEGORY), name='analytics-top-categories'),
+    path('top-vendors/', TopSellersView.as_view(dimension=DailySales.DIMENSION_VENDOR), name='analytics-top-vendors'),
+    path('revenue/', RevenueSeriesView.as_view(), name='analytics-revenue'),
+]
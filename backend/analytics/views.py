@@ -0,0 +1,99 @@
+from datetime import timedelta
+from django.db.models import Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from catalog.models import Category, Product
+from vendor.models import Vendor
+from .models import DailySales
+from .rollups import MEASURES
+
+def int_param(request, name, default, lowest, highest):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return min(max(int(value), lowest), highest)
+    except ValueError:
+        raise ValidationError({name: 'A whole number is required.'})
+
+def date_param(request, name, default):
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: 'Use YYYY-MM-DD.'})
+    return day
+
+def measure_sums():
+    return {name: Sum(name) for name in MEASURES}
+
+def plain_measures(row):
+    # JSON-friendly totals, with net revenue after refunds.
+    values = {name: row[name] or 0 for name in MEASURES}
+    values['net_revenue'] = values['revenue'] - values['refunds']
+    return {name: float(value) if name in ('revenue', 'refunds', 'net_revenue') else value for name, value in values.items()}
+
+class TopSellersView(APIView):
+    # Best sellers over the last `days` days, read from the daily rollups.
+    permission_classes = [IsAdminUser]
+    dimension = DailySales.DIMENSION_PRODUCT
+    orderings = ['revenue', 'units', 'orders']
+
+    def names(self, keys):
+        if self.dimension == DailySales.DIMENSION_PRODUCT:
+            return dict(Product.objects.filter(pk__in=keys).values_list('pk', 'product_name'))
+        if self.dimension == DailySales.DIMENSION_CATEGORY:
+            return dict(Category.objects.filter(pk__in=keys).values_list('pk', 'name'))
+        return dict(Vendor.objects.filter(pk__in=keys).values_list('pk', 'shop_name'))
+
+    def get(self, request):
+        days = int_param(request, 'days', 30, 1, 366)
+        limit = int_param(request, 'limit', 50, 1, 200)
+        ordering = request.query_params.get('by', 'revenue')
+        if ordering not in self.orderings:
+            raise ValidationError({'by': f"Choose one of: {', '.join(self.orderings)}."})
+        end = timezone.localdate()
+        start = end - timedelta(days=days - 1)
+        rows = list(
+            DailySales.objects.filter(dimension=self.dimension, date__gte=start, date__lte=end)
+            .values('key').annotate(**measure_sums()).order_by(f'-{ordering}', 'key')[:limit]
+        )
+        names = self.names([row['key'] for row in rows])
+        results = [dict(id=row['key'], name=names.get(row['key']), **plain_measures(row)) for row in rows]
+        return Response({'from': start, 'to': end, 'results': results})
+
+class RevenueSeriesView(APIView):
+    # Sales per day, week or month for the shop, or one product, category or vendor.
+    permission_classes = [IsAdminUser]
+    intervals = ['day', 'week', 'month']
+
+    def get(self, request):
+        end = date_param(request, 'to', timezone.localdate())
+        start = date_param(request, 'from', end - timedelta(days=29))
+        interval = request.query_params.get('interval', 'day')
+        if interval not in self.intervals:
+            raise ValidationError({'interval': f"Choose one of: {', '.join(self.intervals)}."})
+        dimension = request.query_params.get('dimension', DailySales.DIMENSION_TOTAL)
+        if dimension not in DailySales.DIMENSIONS:
+            raise ValidationError({'dimension': f"Choose one of: {', '.join(DailySales.DIMENSIONS)}."})
+        key = 0
+        if dimension != DailySales.DIMENSION_TOTAL:
+            key = int_param(request, 'id', None, 1, 2 ** 31 - 1)
+            if key is None:
+                raise ValidationError({'id': f'Required for the {dimension} dimension.'})
+
+        rows = (
+            DailySales.objects.filter(dimension=dimension, key=key, date__gte=start, date__lte=end)
+            .annotate(period=Trunc('date', interval)).values('period').annotate(**measure_sums()).order_by('period')
+        )
+        series = [dict(period=row['period'], **plain_measures(row)) for row in rows]
+        return Response({'from': start, 'to': end, 'interval': interval, 'dimension': dimension, 'id': key or None, 'series': series})
@@ -0,0 +1,85 @@
+"""
+Response cache for the catalog read endpoints.
+
+Every cached entry is keyed under the catalog's current version, and any
+write to a catalog model bumps that version (see catalog.signals), so all
+product pages, details, categories and bundles are invalidated at once
+without having to enumerate their keys. Entries carry an ETag so clients
+can revalidate with If-None-Match and get a 304.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version'
+STATS_KEYS = {'hits': 'catalog:cache:hits', 'misses': 'catalog:cache:misses'}
+
+def increment(key):
+    # Atomic counter in the shared cache, created on first use.
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+def catalog_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+def invalidate_catalog():
+    # Move every catalog cache entry to a new version; old entries simply expire.
+    increment(VERSION_KEY)
+
+def cache_stats():
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    stats['version'] = catalog_version()
+    return stats
+
+def response_key(request):
+    # Normalize the query string so equivalent requests share an entry.
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists()
+        for value in values if value != ''
+    )
+    raw = json.dumps([request.get_host(), request.path, params])
+    return f'catalog:response:{catalog_version()}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+def make_etag(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return '"%s"' % hashlib.md5(body.encode()).hexdigest()
+
+class CachedReadMixin:
+    # Serve list and retrieve from the catalog cache, answering If-None-Match with 304.
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        key = response_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            increment(STATS_KEYS['misses'])
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {'data': response.data, 'etag': make_etag(response.data)}
+            cache.set(key, entry, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+        else:
+            increment(STATS_KEYS['hits'])
+
+        headers = {'ETag': entry['etag']}
+        if entry['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(entry['data'], headers=headers)
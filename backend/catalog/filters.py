@@ -0,0 +1,13 @@
+import django_filters
+from .models import Product
+
+class ProductFilter(django_filters.FilterSet):
+    # Product filters; category_tree matches a category and all of its subcategories.
+    category_tree = django_filters.NumberFilter(method='filter_category_tree')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'status', 'price']
+
+    def filter_category_tree(self, queryset, name, value):
+        return queryset.in_category_tree(value)
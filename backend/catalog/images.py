@@ -0,0 +1,105 @@
+"""
+Responsive product images.
+
+When a product's image changes, a ``product_image_variants`` task is queued
+on the order task outbox (see orders.tasks) and a ``run_workers`` process
+renders resized copies of it for every size in VARIANT_WIDTHS, as WebP and,
+where Pillow has AVIF support, AVIF. Each file is named after a hash of its
+bytes, so its URL never changes meaning and can be cached forever. The file
+names are stored on ``Product.image_variants`` together with the source
+image they came from; variants of a replaced image are ignored until they
+are regenerated.
+"""
+import hashlib
+import io
+import os
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+from orders.tasks import enqueue, register
+from .cache import invalidate_catalog
+from .models import Product
+
+# Largest width of each variant; images are never upscaled.
+VARIANT_WIDTHS = {'thumb': 160, 'card': 480, 'detail': 1200}
+ENCODERS = {
+    'avif': {'format': 'AVIF', 'quality': 45, 'speed': 6},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+VARIANT_DIR = 'products/derived'
+TASK_TYPE = 'product_image_variants'
+
+def available_formats():
+    return [name for name in ENCODERS if features.check(name)]
+
+def encode(image, name):
+    options = dict(ENCODERS[name])
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+def render_variants(source_name, storage=default_storage):
+    # Write every size and format of one stored image; returns {size: {'width', 'height', format: file name}}.
+    with storage.open(source_name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info or original.mode in ('LA', 'PA') else 'RGB')
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    variants = {}
+    for size, width in VARIANT_WIDTHS.items():
+        image = original.copy()
+        image.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        variant = {'width': image.width, 'height': image.height}
+        for name in available_formats():
+            data = encode(image, name)
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            file_name = f'{VARIANT_DIR}/{stem}-{size}-{digest}.{name}'
+            if not storage.exists(file_name):
+                file_name = storage.save(file_name, ContentFile(data))
+            variant[name] = file_name
+        variants[size] = variant
+    return variants
+
+def variants_are_current(product):
+    return bool(product.image) and product.image_variants.get('source') == product.image.name
+
+def queue_variants(product):
+    # Called from the Product post_save signal; a no-op when the variants match the image or are already queued.
+    if product.image and not variants_are_current(product):
+        enqueue(TASK_TYPE, {'product_id': product.pk, 'image': product.image.name}, f'{TASK_TYPE}:{product.pk}:{product.image.name}')
+
+@register(TASK_TYPE)
+def build_variants(payload):
+    product = Product.objects.filter(pk=payload['product_id']).only('id', 'image', 'category_id').first()
+    if product is None or product.image.name != payload['image']:
+        return # Deleted or re-uploaded since the task was queued; a newer task covers it.
+    variants = render_variants(payload['image'])
+    updated = Product.objects.filter(pk=product.pk, image=payload['image']).update(
+        image_variants={'source': payload['image'], 'sizes': variants},
+    )
+    if updated:
+        invalidate_catalog()
+
+def image_variant_urls(product, storage=default_storage):
+    """
+    URLs of a product's current variants for the serializers.
+
+    Returns None when there are none yet, otherwise
+    ``{'thumb': {'width': 160, 'height': 90, 'webp': url, 'avif': url}, ...,
+    'srcset': {'webp': 'url 160w, url 480w, ...', 'avif': ...}}``.
+    """
+    if not variants_are_current(product):
+        return None
+    sizes = product.image_variants.get('sizes', {})
+    urls = {}
+    srcset = {}
+    for size, variant in sizes.items():
+        urls[size] = {'width': variant['width'], 'height': variant['height']}
+        for name in ENCODERS:
+            if name in variant:
+                url = storage.url(variant[name])
+                urls[size][name] = url
+                srcset.setdefault(name, []).append(f"{url} {variant['width']}w")
+    urls['srcset'] = {name: ', '.join(entries) for name, entries in srcset.items()}
+    return urls
@@ -0,0 +1,185 @@
+"""
+Bulk product import.
+
+``ProductImporter`` reads a CSV or JSON Lines file row by row and upserts
+products on ``sku`` in batches:
+
+1. Each row is validated with ProductImportRowSerializer; a bad
+   row is reported with its line number and skipped, the rest of the file
+   still loads.
+2. The batch's category names are resolved with one query (names already
+   seen are remembered). With ``create_categories`` unknown names become new
+   root categories, otherwise the row is rejected.
+3. Existing products for the batch's skus are read with one query, so the
+   report can tell created from updated rows and category counts can follow
+   products that moved. A sku repeated within the file keeps its last row.
+4. The batch is written with one ``bulk_create(update_conflicts=True)`` in
+   its own savepoint; if the database rejects it, the batch's rows are
+   reported and the import continues.
+
+bulk_create skips model signals, so the importer does their work itself:
+it re-indexes the written products for search, moves category product
+counts, sends ``products_repriced`` for the prices it changed (wishlist
+price-drop alerts listen to it), and invalidates the catalog and pricing
+caches once at the end.
+"""
+import csv
+import json
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+from .cache import invalidate_catalog
+from .models import Category, Product
+from .pricing import invalidate_pricing
+from .search import get_backend
+from .serializers import ProductImportRowSerializer
+from .signals import adjust_products_count, products_repriced
+
+UPDATE_FIELDS = ['product_name', 'description', 'price', 'weight', 'dimensions', 'status', 'category', 'image_url']
+
+def read_rows(stream, file_format):
+    # Yield (line number, row dict) from a text stream; undecodable JSON lines come back as strings.
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, line
+    else:
+        raise ValueError(f'Unsupported format: {file_format}')
+
+class ProductImporter:
+    # Upserts validated rows in batches and collects a per-line error report.
+    def __init__(self, batch_size=1000, create_categories=False):
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.categories = {}
+        self.category_paths = {}
+        self.count_deltas = {}
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        # One serializer validates every row, so its fields are only built once.
+        self.row_serializer = ProductImportRowSerializer()
+
+    def run(self, rows):
+        # Import an iterable of (line number, row) pairs and return the report.
+        batch = []
+        try:
+            for line_number, row in rows:
+                if not isinstance(row, dict):
+                    self.errors.append({'line': line_number, 'errors': {'non_field_errors': ['Not a JSON object.']}})
+                    continue
+                try:
+                    data = self.row_serializer.run_validation(row)
+                except ValidationError as exc:
+                    self.errors.append({'line': line_number, 'errors': exc.detail})
+                    continue
+                batch.append((line_number, data))
+                if len(batch) >= self.batch_size:
+                    self.write_batch(batch)
+                    batch = []
+            if batch:
+                self.write_batch(batch)
+        finally:
+            self.finish()
+        return self.report()
+
+    def report(self):
+        return {'created': self.created, 'updated': self.updated, 'failed': len(self.errors), 'errors': self.errors}
+
+    def resolve_categories(self, names):
+        # Map category names to ids, one query for the names not seen yet; duplicates resolve to the oldest category.
+        missing = set(names) - set(self.categories)
+        if missing:
+            for pk, name, path in Category.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name', 'path'):
+                self.categories[name] = pk
+                self.category_paths[pk] = path
+            unknown = missing - set(self.categories)
+            if unknown and self.create_categories:
+                for name in sorted(unknown):
+                    # save() assigns the path through the category signals, so the counts below can follow it.
+                    category = Category.objects.create(name=name, description='')
+                    self.categories[name] = category.pk
+                    self.category_paths[category.pk] = Category.objects.values_list('path', flat=True).get(pk=category.pk)
+
+    def write_batch(self, batch):
+        self.resolve_categories({data['category'] for _, data in batch})
+        rows = {}
+        for line_number, data in batch:
+            category_id = self.categories.get(data['category'])
+            if category_id is None:
+                self.errors.append({'line': line_number, 'errors': {'category': [f"Unknown category: {data['category']}."]}})
+                continue
+            rows[data['sku']] = (line_number, data, category_id)
+        if not rows:
+            return
+
+        existing = {}
+        previous_prices = {}
+        for sku, category_id, price in Product.objects.filter(sku__in=list(rows)).values_list('sku', 'category_id', 'price'):
+            existing[sku] = category_id
+            previous_prices[sku] = price
+        products = [
+            Product(
+                sku=sku, product_name=data['product_name'], description=data['description'], price=data['price'],
+                weight=data['weight'], dimensions=data['dimensions'], status=data['status'],
+                category_id=category_id, image_url=data['image_url'],
+            )
+            for sku, (_, data, category_id) in rows.items()
+        ]
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    products, update_conflicts=True, unique_fields=['sku'], update_fields=UPDATE_FIELDS,
+                )
+                if any(product.pk is None for product in products):
+                    # Backends that can't return ids from an upsert; category_id is loaded for the post_init signal.
+                    products = Product.objects.filter(sku__in=list(rows)).only('id', 'product_name', 'description', 'sku', 'category_id')
+                get_backend().index_products(products)
+                prices = {
+                    product.pk: (previous_prices[product.sku], rows[product.sku][1]['price'])
+                    for product in products
+                    if product.sku in previous_prices and previous_prices[product.sku] != rows[product.sku][1]['price']
+                }
+                if prices:
+                    products_repriced.send(sender=Product, prices=prices)
+        except DatabaseError as exc:
+            for line_number, _, _ in rows.values():
+                self.errors.append({'line': line_number, 'errors': {'non_field_errors': [f'Database error: {exc}']}})
+            return
+
+        for sku, (_, _, category_id) in rows.items():
+            previous = existing.get(sku)
+            if previous is None:
+                self.created += 1
+            else:
+                self.updated += 1
+            if previous != category_id:
+                self.count_deltas[category_id] = self.count_deltas.get(category_id, 0) + 1
+                if previous is not None:
+                    self.count_deltas[previous] = self.count_deltas.get(previous, 0) - 1
+
+    def finish(self):
+        # Apply the category count changes to every ancestor, then drop the cached catalog.
+        deltas = {category_id: delta for category_id, delta in self.count_deltas.items() if delta}
+        unknown = set(deltas) - set(self.category_paths)
+        if unknown:
+            self.category_paths.update(Category.objects.filter(pk__in=unknown).values_list('pk', 'path'))
+        subtree_deltas = {}
+        for category_id, delta in deltas.items():
+            for ancestor_id in Category.path_ids(self.category_paths.get(category_id, '')):
+                subtree_deltas[ancestor_id] = subtree_deltas.get(ancestor_id, 0) + delta
+        by_delta = {}
+        for category_id, delta in subtree_deltas.items():
+            by_delta.setdefault(delta, []).append(category_id)
+        for delta, category_ids in by_delta.items():
+            adjust_products_count(category_ids, delta)
+        self.count_deltas = {}
+        if self.created or self.updated:
+            invalidate_catalog()
+            invalidate_pricing()
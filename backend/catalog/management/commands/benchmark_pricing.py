@@ -0,0 +1,54 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from catalog.pricing import DiscountIndex
+
+class Command(BaseCommand):
+    help = 'Time building the pricing index and pricing carts against many active discounts (in memory).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--discounts', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--bundles', type=int, default=2000)
+        parser.add_argument('--carts', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        now = timezone.now()
+        discount_count, product_count, user_count = options['discounts'], options['products'], options['users']
+        # Rows shaped exactly like the values_list queries DiscountIndex.build runs.
+        discounts = [
+            (
+                discount_id, rng.choice(['percentage', 'fixed_amount']), Decimal(rng.randint(1, 40)),
+                now - timedelta(days=rng.randint(0, 30)), now + timedelta(days=rng.randint(-5, 30)),
+            )
+            for discount_id in range(1, discount_count + 1)
+        ]
+        product_discounts = [(product_id, rng.randint(1, discount_count)) for product_id in range(1, product_count + 1, 2)]
+        user_discounts = [(rng.randint(1, user_count), rng.randint(1, discount_count)) for _ in range(user_count * 3)]
+        bundle_products = [
+            (bundle_id, product_id, rng.randint(1, 2), Decimal(-rng.randint(1, 20)))
+            for bundle_id in range(1, options['bundles'] + 1)
+            for product_id in rng.sample(range(1, product_count + 1), 3)
+        ]
+
+        start = time.perf_counter()
+        index = DiscountIndex(discounts, product_discounts, user_discounts, bundle_products)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        carts = [
+            ([(product_id, rng.randint(1, 4), Decimal(rng.randint(5, 500))) for product_id in rng.sample(range(1, product_count + 1), rng.randint(1, 20))],
+             rng.randint(1, user_count))
+            for _ in range(options['carts'])
+        ]
+        start = time.perf_counter()
+        for lines, user_id in carts:
+            index.price(lines, user_id=user_id, at=now)
+        price_us = (time.perf_counter() - start) / len(carts) * 1000000
+
+        self.stdout.write(f'index build ({discount_count} discounts, {len(user_discounts)} user links, {len(bundle_products)} bundle rows): {build_ms:.1f} ms')
+        self.stdout.write(f'price one cart (1-20 lines): {price_us:.1f} us')
@@ -0,0 +1,59 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from catalog.models import Category, Product
+from catalog.search import get_backend, search_products
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'qui', 'dor', 'lin', 'tra', 'mex']
+# Synthetic vocabulary so that, as in a real catalog, most terms match only a few products.
+WORDS = sorted({a + b + c for a in SYLLABLES for b in SYLLABLES for c in SYLLABLES})
+TERMS = ['kalomi', 'kalomi nerusa', 'tradorl', 'quimexpa zeka', 'headphones', 'BENCH0004242']
+
+class Command(BaseCommand):
+    help = 'Compare full-text product search with the icontains SearchFilter on synthetic products (rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def timed(self, func, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        repeat = options['repeat']
+        with transaction.atomic():
+            category = Category.objects.create(name='Benchmark', description='Synthetic products.')
+            products = (
+                Product(
+                    product_name=' '.join(rng.choices(WORDS, k=3)).title(),
+                    description=' '.join(rng.choices(WORDS, k=40)),
+                    sku=f'BENCH{i:07d}', price=rng.randint(1, 2000), weight=1, dimensions='1x1x1 cm',
+                    status='available', category=category,
+                )
+                for i in range(options['products'])
+            )
+            batch = []
+            for product in products:
+                batch.append(product)
+                if len(batch) == 5000:
+                    Product.objects.bulk_create(batch)
+                    batch = []
+            Product.objects.bulk_create(batch)
+            get_backend().rebuild()
+
+            for term in TERMS:
+                # Same lookup the SearchFilter on ProductViewSet builds for this term.
+                like_filter = Q()
+                for word in term.split():
+                    like_filter &= Q(product_name__icontains=word) | Q(description__icontains=word) | Q(sku__icontains=word)
+                like_ms = self.timed(lambda: list(Product.objects.filter(like_filter).values_list('id', flat=True)[:20]), repeat)
+                search_ms = self.timed(lambda: search_products(term, 20), repeat)
+                self.stdout.write(f'{term!r:24} icontains {like_ms:9.2f} ms   search {search_ms:9.2f} ms')
+
+            transaction.set_rollback(True)
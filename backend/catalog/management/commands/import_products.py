@@ -0,0 +1,35 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from catalog.importer import ProductImporter, read_rows
+
+class Command(BaseCommand):
+    help = 'Upsert products by sku from a CSV or JSON Lines file, reporting bad rows without stopping.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-categories', action='store_true', help='Create unknown category names as root categories.')
+        parser.add_argument('--max-errors', type=int, default=50, help='How many row errors to print.')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Cannot tell the file format; pass --format csv or --format jsonl.')
+        importer = ProductImporter(batch_size=options['batch_size'], create_categories=options['create_categories'])
+        start = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = importer.run(read_rows(stream, file_format))
+        except OSError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - start
+
+        for error in report['errors'][:options['max_errors']]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report['failed'] > options['max_errors']:
+            self.stderr.write(f"... and {report['failed'] - options['max_errors']} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, failed {report['failed']} in {elapsed:.1f}s."
+        ))
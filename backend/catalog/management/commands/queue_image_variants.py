@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from catalog.images import queue_variants
+from catalog.models import Product
+
+class Command(BaseCommand):
+    help = 'Queue responsive image variants for products whose image has none yet (run_workers renders them).'
+
+    def handle(self, *args, **options):
+        queued = 0
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants', 'category_id')
+        for product in products.iterator(chunk_size=500):
+            if product.image_variants.get('source') != product.image.name:
+                queue_variants(product)
+                queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued variants for {queued} products.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from catalog.models import Category, Product
+from catalog.cache import invalidate_catalog
+
+class Command(BaseCommand):
+    help = 'Recompute category materialized paths, depths and subtree product counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        parents = dict(Category.objects.values_list('id', 'parent_category'))
+        direct_counts = dict(
+            Product.objects.values('category').annotate(count=Count('id')).order_by().values_list('category', 'count')
+        )
+
+        paths = {}
+        def path_of(category_id, seen=()):
+            if category_id not in paths:
+                parent = parents.get(category_id)
+                # A parent cycle in legacy data is cut by treating the category as a root.
+                prefix = path_of(parent, seen + (category_id,)) if parent and parent not in seen + (category_id,) else ''
+                paths[category_id] = f'{prefix}{category_id}/'
+            return paths[category_id]
+
+        counts = dict.fromkeys(parents, 0)
+        for category_id in parents:
+            for ancestor_id in Category.path_ids(path_of(category_id)):
+                counts[ancestor_id] += direct_counts.get(category_id, 0)
+
+        categories = [
+            Category(pk=category_id, path=paths[category_id], depth=paths[category_id].count('/') - 1, products_count=counts[category_id])
+            for category_id in parents
+        ]
+        with transaction.atomic():
+            Category.objects.bulk_update(categories, ['path', 'depth', 'products_count'], batch_size=options['batch_size'])
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt tree for {len(categories)} categories.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from catalog.cache import invalidate_catalog
+from catalog.models import Comment, Product
+from catalog.signals import star_field
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating aggregates on every product from its comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        star_fields = [star_field(star) for star in range(1, 6)]
+        aggregates = Comment.objects.values('product').annotate(
+            rating_sum=Sum('star'),
+            rating_count=Count('id'),
+            **{star_field(star): Count('id', filter=Q(star=star)) for star in range(1, 6)},
+        ).order_by()
+        fields = ['rating_sum', 'rating_count', 'rating_avg'] + star_fields
+
+        with transaction.atomic():
+            Product.objects.update(**{field: 0 for field in fields})
+            batch = []
+            for row in aggregates.iterator(chunk_size=batch_size):
+                product = Product(pk=row['product'], rating_sum=row['rating_sum'], rating_count=row['rating_count'])
+                product.rating_avg = row['rating_sum'] / row['rating_count']
+                for field in star_fields:
+                    setattr(product, field, row[field])
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    Product.objects.bulk_update(batch, fields)
+                    batch = []
+            if batch:
+                Product.objects.bulk_update(batch, fields)
+        invalidate_catalog()
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {Product.objects.count()} products.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from catalog.models import Product
+from catalog.search import get_backend
+
+class Command(BaseCommand):
+    help = 'Re-index every product for full-text search, e.g. after writes that skipped model signals.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.setup()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {Product.objects.count()} products with {type(backend).__name__}.'))
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Concat, Length, Substr
 
 # A helper class for common fields used in products.
 class ProductCommon(models.Model):
@@ -18,10 +19,31 @@ class Category(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     parent_category = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subcategories')
+    # Materialized path of ancestor ids including this one, e.g. "1/5/12/", and its depth (0 for roots).
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.IntegerField(editable=False, default=0)
+    # Products in this category and all of its descendants.
+    products_count = models.IntegerField(editable=False, default=0)
+
+    # Columns maintained by catalog.signals; ordinary saves must not write back stale copies of them.
+    TREE_FIELDS = ('path', 'depth', 'products_count')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TREE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def path_ids(path):
+        # Category ids along a materialized path, root first.
+        return [int(pk) for pk in path.split('/') if pk]
+
 class Discount(models.Model):
     # Discount codes.
     value = models.DecimalField(max_digits=10, decimal_places=2)
@@ -30,6 +52,11 @@ class Discount(models.Model):
     end_date = models.DateTimeField()
     description = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'end_date'], name='discount_active_idx'),
+        ]
+
     def __str__(self):
         return self.description
 
@@ -44,6 +71,20 @@ class UserDiscount(models.Model):
     def __str__(self):
         return f"{self.user.username} has discount {self.discount.description}"
 
+class ProductQuerySet(models.QuerySet):
+    # Querysets shared by the product read endpoints.
+    def for_listing(self):
+        # Join category/discount so a page of products serializes in one query.
+        return self.select_related('category', 'discount')
+
+    def in_category_tree(self, category_id):
+        # Products in a category or any of its descendants, in one query via the materialized path.
+        # The subtree of "1/5/" is the index range ["1/5/", "1/50"), since "/" sorts just before "0".
+        path = models.Subquery(Category.objects.filter(pk=category_id).values('path')[:1])
+        upper = Concat(Substr(path, 1, Length(path) - 1), models.Value('0'))
+        subtree = Category.objects.filter(path__gte=path, path__lt=upper).values('pk')
+        return self.filter(category__in=subtree)
+
 class Product(ProductCommon):
     # Product model with foreign keys to Category and Discount.
     sku = models.CharField(max_length=50, unique=True)
@@ -51,10 +92,45 @@ class Product(ProductCommon):
     discount = models.ForeignKey(Discount, on_delete=models.SET_NULL, null=True, blank=True)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
     image_url = models.URLField(max_length=500, null=True, blank=True, help_text="External image URL")
+    # Resized copies of `image`, written by the image worker (see catalog.images).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Rating aggregates kept in step with Comment writes (see catalog.signals).
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_avg = models.FloatField(default=0, db_index=True)
+    star_1_count = models.IntegerField(default=0)
+    star_2_count = models.IntegerField(default=0)
+    star_3_count = models.IntegerField(default=0)
+    star_4_count = models.IntegerField(default=0)
+    star_5_count = models.IntegerField(default=0)
+
+    objects = ProductQuerySet.as_manager()
+
+    # Columns maintained by catalog.signals; ordinary saves must not write back stale copies of them.
+    RATING_FIELDS = (
+        'rating_sum', 'rating_count', 'rating_avg',
+        'star_1_count', 'star_2_count', 'star_3_count', 'star_4_count', 'star_5_count',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='product_status_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['product_name'], name='product_name_idx'),
+        ]
 
     def __str__(self):
         return self.product_name
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
 class Comment(models.Model):
     # Product reviews and comments.
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='comments')
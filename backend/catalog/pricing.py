@@ -0,0 +1,216 @@
+"""
+Discount pricing engine.
+
+Every current or upcoming discount, the products and users they are
+attached to, and the price adjustments of active bundles are loaded into a
+per-process ``DiscountIndex``. Pricing a cart is then pure Python over that
+index with no queries:
+
+1. Each line gets its product's discount if the discount window covers the
+   pricing time (percentage or fixed amount off the unit price).
+2. Complete bundle sets in the cart are priced at list price plus the
+   bundle's ``price_adjustment`` per unit, when that beats the discounted
+   unit prices. Bundles are applied greedily, biggest saving first.
+3. The best of the user's active discounts is applied to the order as a
+   whole. Order-level discounts do not stack.
+
+The index is tagged with a version token kept in the shared cache. Writes to
+Discount, UserDiscount, Product, Bundle and BundleProduct replace the token
+(see catalog.signals), so every process rebuilds on its next lookup.
+That only reaches other processes when the cache is shared (Redis or the
+file cache). With the default per-process memory cache they never see the
+new token, so each index is also rebuilt once it is PRICING_INDEX_MAX_AGE
+seconds old, which bounds how long another process charges old prices.
+Discounts that start later are loaded too and checked against their window
+on every lookup, so nothing needs rebuilding when a window opens or closes.
+Bulk updates that skip model signals must call ``invalidate_pricing()``.
+"""
+import time
+import uuid
+from bisect import bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import BundleProduct, Discount, Product, UserDiscount
+
+VERSION_KEY = 'catalog:pricing:version'
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+_index = None
+
+def pricing_version():
+    # A random token rather than a counter, so a cleared cache can never match an old index.
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+def invalidate_pricing():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+def quantize(amount):
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+def discount_amount(rule, amount):
+    # What a (id, type, value, start, end) rule takes off `amount`, never more than the amount itself.
+    if rule[1] == 'percentage':
+        return min(amount * rule[2] / 100, amount)
+    return min(rule[2], amount)
+
+class DiscountIndex:
+    # In-memory snapshot of everything the pricing engine needs.
+    def __init__(self, discounts, product_discounts, user_discounts, bundle_products, version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.rules = {row[0]: row for row in discounts}
+        self.product_rules = {product_id: self.rules[discount_id] for product_id, discount_id in product_discounts if discount_id in self.rules}
+        self.user_rules = {}
+        for user_id, discount_id in user_discounts:
+            if discount_id in self.rules:
+                self.user_rules.setdefault(user_id, []).append(self.rules[discount_id])
+        for rules in self.user_rules.values():
+            rules.sort(key=lambda rule: rule[3])
+        self.bundles = {}
+        self.bundles_by_product = {}
+        for bundle_id, product_id, quantity, adjustment in bundle_products:
+            if quantity > 0:
+                self.bundles.setdefault(bundle_id, []).append((product_id, quantity, adjustment))
+                self.bundles_by_product.setdefault(product_id, set()).add(bundle_id)
+
+    def is_stale(self):
+        return time.monotonic() - self.built_at >= settings.PRICING_INDEX_MAX_AGE
+
+    @classmethod
+    def build(cls, version=None):
+        # Four queries: discounts not yet expired, their products and users, and active bundle contents.
+        now = timezone.now()
+        discounts = Discount.objects.filter(end_date__gte=now).values_list('id', 'discount_type', 'value', 'start_date', 'end_date')
+        product_discounts = Product.objects.filter(discount__end_date__gte=now).values_list('id', 'discount_id')
+        user_discounts = UserDiscount.objects.filter(discount__end_date__gte=now).values_list('user_id', 'discount_id')
+        bundle_products = BundleProduct.objects.filter(bundle__status='active').values_list('bundle_id', 'product_id', 'quantity', 'price_adjustment')
+        return cls(discounts, product_discounts, user_discounts, bundle_products, version=version)
+
+    def user_rules_at(self, user_id, at):
+        # The user's rules are sorted by start date, so only those starting by `at` are checked.
+        rules = self.user_rules.get(user_id, ())
+        started = bisect_right(rules, at, key=lambda rule: rule[3])
+        return [rule for rule in rules[:started] if rule[4] >= at]
+
+    def product_rule_at(self, product_id, at):
+        rule = self.product_rules.get(product_id)
+        if rule and rule[3] <= at <= rule[4]:
+            return rule
+        return None
+
+    def price(self, lines, user_id=None, at=None):
+        """
+        Price a cart.
+
+        ``lines`` is an iterable of (product_id, quantity, unit_price) with
+        distinct products. Returns a dict with the Decimal ``subtotal`` at
+        list price, ``line_discount``, ``bundle_discount``,
+        ``order_discount`` and ``total_amount``, plus the id of the order
+        level discount applied (``discount_id``, or None). ``lines`` maps each
+        product to what its line costs after every discount; these add up to
+        ``total_amount`` to the cent.
+        """
+        at = at or timezone.now()
+        quantities = {}
+        list_prices = {}
+        unit_prices = {}
+        subtotal = ZERO
+        for product_id, quantity, price in lines:
+            price = Decimal(price)
+            quantities[product_id] = quantity
+            list_prices[product_id] = price
+            subtotal += price * quantity
+            rule = self.product_rule_at(product_id, at)
+            unit_prices[product_id] = price - discount_amount(rule, price) if rule else price
+
+        line_total = sum((unit_prices[product_id] * quantity for product_id, quantity in quantities.items()), ZERO)
+        bundle_discount, bundle_savings = self.apply_bundles(quantities, list_prices, unit_prices)
+        merchandise = max(line_total - bundle_discount, ZERO)
+
+        order_rule = None
+        order_discount = ZERO
+        if user_id is not None:
+            for rule in self.user_rules_at(user_id, at):
+                amount = discount_amount(rule, merchandise)
+                if amount > order_discount:
+                    order_rule, order_discount = rule, amount
+
+        total = quantize(merchandise - order_discount)
+        line_discount = quantize(subtotal - line_total)
+        bundle_discount = quantize(bundle_discount)
+        return {
+            'subtotal': quantize(subtotal),
+            'line_discount': line_discount,
+            'bundle_discount': bundle_discount,
+            'order_discount': quantize(subtotal) - line_discount - bundle_discount - total,
+            'total_amount': total,
+            'discount_id': order_rule[0] if order_rule else None,
+            'lines': self.line_totals(quantities, unit_prices, bundle_savings, order_discount, total),
+        }
+
+    def line_totals(self, quantities, unit_prices, bundle_savings, order_discount, total):
+        # Each line after its product and bundle discounts, less its share of the order discount, in cents.
+        amounts = {
+            product_id: max(unit_prices[product_id] * quantity - bundle_savings.get(product_id, ZERO), ZERO)
+            for product_id, quantity in quantities.items()
+        }
+        merchandise = sum(amounts.values(), ZERO)
+        if order_discount and merchandise:
+            amounts = {product_id: amount - order_discount * amount / merchandise for product_id, amount in amounts.items()}
+        lines = {product_id: quantize(amount) for product_id, amount in amounts.items()}
+        # Rounding leaves at most a few cents over or under, which the biggest line absorbs.
+        remainder = total - sum(lines.values(), ZERO)
+        if lines and remainder:
+            biggest = max(lines, key=lines.get)
+            lines[biggest] += remainder
+        return lines
+
+    def apply_bundles(self, quantities, list_prices, unit_prices):
+        # Saving of complete bundle sets over the already discounted line prices, in total and per product.
+        candidates = set()
+        for product_id in quantities:
+            candidates |= self.bundles_by_product.get(product_id, set())
+        offers = []
+        for bundle_id in candidates:
+            contents = self.bundles[bundle_id]
+            if all(product_id in quantities for product_id, _, _ in contents):
+                saving = sum(
+                    (quantity * (unit_prices[product_id] - max(list_prices[product_id] + adjustment, ZERO))
+                     for product_id, quantity, adjustment in contents),
+                    ZERO,
+                )
+                if saving > 0:
+                    offers.append((saving, bundle_id, contents))
+        offers.sort(key=lambda offer: (-offer[0], offer[1]))
+
+        remaining = dict(quantities)
+        total = ZERO
+        savings = {}
+        for saving, _, contents in offers:
+            sets = min(remaining[product_id] // quantity for product_id, quantity, _ in contents)
+            if sets:
+                total += saving * sets
+                for product_id, quantity, adjustment in contents:
+                    remaining[product_id] -= quantity * sets
+                    unit_saving = unit_prices[product_id] - max(list_prices[product_id] + adjustment, ZERO)
+                    savings[product_id] = savings.get(product_id, ZERO) + unit_saving * quantity * sets
+        return total, savings
+
+def get_index():
+    # This process's index, rebuilt whenever the version token has changed or it is too old.
+    global _index
+    version = pricing_version()
+    index = _index
+    if index is None or index.version != version or index.is_stale():
+        index = _index = DiscountIndex.build(version)
+    return index
+
+def price_lines(lines, user_id=None, at=None):
+    return get_index().price(lines, user_id=user_id, at=at)
@@ -0,0 +1,162 @@
+"""
+Full-text product search.
+
+Backends keep an inverted index of product name, description and SKU in step
+with Product writes (see catalog.signals) and return product ids ranked by
+relevance. The last search term is matched as a prefix so the same call
+serves autocomplete. The backend is picked from the database vendor and can
+be overridden with the ``CATALOG_SEARCH_BACKEND`` setting (a dotted path).
+"""
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from .models import Product
+
+TOKEN_RE = re.compile(r'\w+')
+
+def tokenize(query):
+    # Split a query into lowercase word tokens, dropping punctuation and FTS operators.
+    return TOKEN_RE.findall(query.lower())
+
+class BaseSearchBackend:
+    # Interface shared by the search backends.
+    def setup(self):
+        # Create the index structures if they don't exist yet; returns True if they were created empty.
+        return False
+
+    def index_products(self, products):
+        # Add or refresh index entries for the given products.
+        pass
+
+    def remove_products(self, product_ids):
+        # Drop index entries for deleted products.
+        pass
+
+    def rebuild(self):
+        # Re-index every product.
+        pass
+
+    def search(self, tokens, limit):
+        # Return up to `limit` product ids matching all tokens, best match first.
+        raise NotImplementedError
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    # SQLite FTS5 index ranked with BM25, keyed by product id.
+    table = 'catalog_product_fts'
+    # BM25 column weights for product_name, description and sku.
+    weights = (10.0, 1.0, 5.0)
+    batch_size = 2000
+
+    def setup(self):
+        if self.table in connection.introspection.table_names():
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5(product_name, description, sku, prefix='2 3', tokenize='unicode61')"
+            )
+        return True
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {self.table} (rowid, product_name, description, sku) VALUES (%s, %s, %s, %s)", rows
+        )
+
+    def index_products(self, products):
+        rows = [(p.pk, p.product_name, p.description, p.sku) for p in products]
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(row[0],) for row in rows])
+            self._insert(cursor, rows)
+
+    def remove_products(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+    def rebuild(self):
+        rows = Product.objects.values_list('id', 'product_name', 'description', 'sku').order_by()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            for row in rows.iterator(chunk_size=self.batch_size):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self._insert(cursor, batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+
+    def search(self, tokens, limit):
+        match = ' '.join(f'"{token}"' for token in tokens) + '*'
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+class PostgresSearchBackend(BaseSearchBackend):
+    # PostgreSQL tsvector search over a GIN expression index, which Postgres keeps current itself.
+    document = (
+        "setweight(to_tsvector('simple', product_name), 'A') || "
+        "setweight(to_tsvector('simple', sku), 'B') || "
+        "setweight(to_tsvector('simple', description), 'D')"
+    )
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS catalog_product_search_idx ON catalog_product USING GIN (({self.document}))"
+            )
+        # The index is built from the existing rows, so there is nothing to backfill.
+        return False
+
+    def search(self, tokens, limit):
+        query = ' & '.join(tokens) + ':*'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM catalog_product WHERE ({self.document}) @@ to_tsquery('simple', %s) "
+                f"ORDER BY ts_rank_cd(({self.document}), to_tsquery('simple', %s)) DESC LIMIT %s",
+                [query, query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+class LikeSearchBackend(BaseSearchBackend):
+    # Unindexed fallback for other databases: substring match on name and SKU.
+    def search(self, tokens, limit):
+        products = Product.objects.all()
+        for token in tokens:
+            products = products.filter(Q(product_name__icontains=token) | Q(sku__icontains=token))
+        return list(products.order_by('product_name').values_list('id', flat=True)[:limit])
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_backends = {}
+
+def get_backend():
+    # Search backend for the default database, built once per process.
+    path = getattr(settings, 'CATALOG_SEARCH_BACKEND', None)
+    key = path or connection.vendor
+    if key not in _backends:
+        backend_class = import_string(path) if path else VENDOR_BACKENDS.get(connection.vendor, LikeSearchBackend)
+        _backends[key] = backend_class()
+    return _backends[key]
+
+def search_products(query, limit=20):
+    # Ranked product ids for a free-text query, short-circuiting exact SKU lookups.
+    query = query.strip()
+    if not query:
+        return []
+    sku_match = Product.objects.filter(sku__in={query, query.upper()}).values_list('id', flat=True).first()
+    if sku_match is not None:
+        return [sku_match]
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    return get_backend().search(tokens, limit)
@@ -1,16 +1,18 @@
 from rest_framework import serializers
+from .images import image_variant_urls
 from .models import Category, Discount, Product, Comment, Bundle, BundleProduct, UserDiscount
 
 class CategorySerializer(serializers.ModelSerializer):
-    # Serializer for the Category model.
-    products_count = serializers.SerializerMethodField()
-    
+    # Serializer for the Category model; products_count includes subcategories.
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'parent_category', 'products_count']
-    
-    def get_products_count(self, obj):
-        return obj.products.count()
+        fields = ['id', 'name', 'description', 'parent_category', 'path', 'depth', 'products_count']
+
+    def validate_parent_category(self, value):
+        # A category can't be moved under itself or one of its descendants.
+        if value and self.instance and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category cannot be nested under its own subtree.")
+        return value
 
 class DiscountSerializer(serializers.ModelSerializer):
     # Serializer for the Discount model.
@@ -18,6 +20,15 @@ class DiscountSerializer(serializers.ModelSerializer):
         model = Discount
         fields = '__all__'
 
+def product_image_url(obj):
+    # Return the image URL if available, otherwise return a placeholder
+    if obj.image_url:
+        return obj.image_url
+    elif obj.image:
+        return obj.image.url
+    else:
+        return f"/placeholder.svg?height=200&width=300&query={obj.product_name}"
+
 class ProductSerializer(serializers.ModelSerializer):
     # Serializer for the Product model.
     name = serializers.CharField(source='product_name')
@@ -25,40 +36,68 @@ class ProductSerializer(serializers.ModelSerializer):
     vendor = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
     discount_percentage = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
         fields = ('id', 'name', 'product_name', 'description', 'price', 'weight', 'dimensions', 
                  'status', 'sku', 'category', 'category_name', 'vendor', 'rating', 'image_url', 
-                 'discount_percentage', 'discount')
+                 'images', 'discount_percentage', 'discount')
     
     def get_vendor(self, obj):
         # For now, return a default vendor. You can add a vendor field to the Product model later
         return "Default Vendor"
     
     def get_rating(self, obj):
-        # Calculate average rating from comments
-        comments = obj.comments.all()
-        if comments.exists():
-            total_stars = sum(comment.star for comment in comments)
-            return round(total_stars / comments.count(), 1)
-        return None
+        # Average rating from the aggregates maintained on Comment writes
+        if not obj.rating_count:
+            return None
+        return round(obj.rating_avg, 1)
     
     def get_image_url(self, obj):
-        # Return the image URL if available, otherwise return a placeholder
-        if obj.image_url:
-            return obj.image_url
-        elif obj.image:
-            return obj.image.url
-        else:
-            return f"/placeholder.svg?height=200&width=300&query={obj.product_name}"
+        return product_image_url(obj)
+
+    def get_images(self, obj):
+        return image_variant_urls(obj)
     
     def get_discount_percentage(self, obj):
         if obj.discount and obj.discount.discount_type == 'percentage':
             return float(obj.discount.value)
         return None
 
+def expansions(context):
+    # Names listed in ?expand= (comma separated) on a read request.
+    request = context.get('request')
+    if request is None or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        return set()
+    return {name.strip() for value in request.query_params.getlist('expand') for name in value.split(',')}
+
+class ExpandProductMixin:
+    # With ?expand=product the `product` field is rendered like ProductSerializer instead of an id.
+    # Views should select_related('product__category', 'product__discount') when expanding.
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'product' in expansions(self.context):
+            fields['product'] = ProductSerializer(read_only=True)
+        return fields
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    # Minimal product shape for badges and widgets that only need a name, price and picture.
+    name = serializers.CharField(source='product_name', read_only=True)
+    image_url = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ('id', 'name', 'price', 'image_url', 'images')
+
+    def get_image_url(self, obj):
+        return product_image_url(obj)
+
+    def get_images(self, obj):
+        return image_variant_urls(obj)
+
 class CommentSerializer(serializers.ModelSerializer):
     # Serializer for the Comment model.
     class Meta:
@@ -82,3 +121,18 @@ class UserDiscountSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserDiscount
         fields = '__all__'
+
+class ProductImportRowSerializer(serializers.Serializer):
+    # One row of a product import file; `category` is a category name, resolved in bulk by the importer.
+    sku = serializers.CharField(max_length=50)
+    product_name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=20, decimal_places=2, min_value=0)
+    weight = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, default=0)
+    dimensions = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    status = serializers.CharField(max_length=50, required=False, default='available')
+    category = serializers.CharField(max_length=255)
+    image_url = serializers.URLField(max_length=500, required=False, allow_blank=True, allow_null=True, default=None)
+
+    def validate_image_url(self, value):
+        return value or None
@@ -0,0 +1,167 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Concat, Substr
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from .cache import invalidate_catalog
+from .images import queue_variants
+from .models import Bundle, BundleProduct, Category, Comment, Discount, Product, UserDiscount
+from .pricing import invalidate_pricing
+from .search import get_backend
+
+# Sent by bulk writers that skip post_save (see catalog.importer) with `prices`, a dict mapping the id of
+# every product whose price changed to (previous price, new price). Sent inside the writing transaction.
+products_repriced = Signal()
+
+def star_field(star):
+    # Histogram column for a star value, or None when it falls outside 1-5.
+    if 1 <= star <= 5:
+        return f'star_{star}_count'
+    return None
+
+def apply_rating(product_id, star, sign):
+    # Add (sign=1) or remove (sign=-1) one rating in a single UPDATE so concurrent writes don't race.
+    # The right-hand side sees the pre-update row, so the average is derived from the old sum and count.
+    changes = {
+        'rating_sum': F('rating_sum') + sign * star,
+        'rating_count': F('rating_count') + sign,
+        'rating_avg': Case(
+            When(rating_count=-sign, then=Value(0.0)),
+            default=Cast(F('rating_sum') + sign * star, FloatField()) / (F('rating_count') + sign),
+            output_field=FloatField(),
+        ),
+    }
+    field = star_field(star)
+    if field:
+        changes[field] = F(field) + sign
+    Product.objects.filter(pk=product_id).update(**changes)
+
+# Remembered values are read from __dict__: reading a field deferred by only()/defer() would load the
+# instance again and re-enter post_init. A value that was deferred is fetched once it is needed.
+
+@receiver(post_init, sender=Comment)
+def remember_rating(sender, instance, **kwargs):
+    # Keep the rating as loaded so an edit can move it between products or stars.
+    instance._saved_rating = (instance.__dict__.get('product_id'), instance.__dict__.get('star')) if instance.pk else None
+
+@receiver(pre_save, sender=Comment)
+@receiver(pre_delete, sender=Comment)
+def load_deferred_rating(sender, instance, **kwargs):
+    if instance._saved_rating and None in instance._saved_rating:
+        instance._saved_rating = Comment.objects.filter(pk=instance.pk).values_list('product_id', 'star').first()
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    current = (instance.product_id, instance.star)
+    previous = None if created else instance._saved_rating
+    if previous != current:
+        with transaction.atomic():
+            if previous:
+                apply_rating(previous[0], previous[1], -1)
+            apply_rating(current[0], current[1], 1)
+    instance._saved_rating = current
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance._saved_rating:
+        apply_rating(instance._saved_rating[0], instance._saved_rating[1], -1)
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    # Keep the full-text search index in step with product writes.
+    get_backend().index_products([instance])
+
+@receiver(post_save, sender=Product)
+def product_image_saved(sender, instance, **kwargs):
+    # Queue responsive variants for a new or replaced image; written with the product, in its transaction.
+    queue_variants(instance)
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    get_backend().remove_products([instance.pk])
+
+def create_search_index(sender, **kwargs):
+    # Connected to post_migrate in CatalogConfig.ready(). A new index is filled with the products already there.
+    backend = get_backend()
+    if backend.setup():
+        backend.rebuild()
+
+def adjust_products_count(category_ids, delta):
+    # Shift the subtree product count of every listed category by delta.
+    if category_ids and delta:
+        Category.objects.filter(pk__in=category_ids).update(products_count=F('products_count') + delta)
+
+def category_ancestry(category_id):
+    # Ids of a category and all of its ancestors, read from its materialized path.
+    path = Category.objects.filter(pk=category_id).values_list('path', flat=True).first()
+    return Category.path_ids(path) if path else []
+
+@receiver(post_init, sender=Product)
+def remember_category(sender, instance, **kwargs):
+    instance._saved_category_id = instance.__dict__.get('category_id') if instance.pk else None
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def load_deferred_category(sender, instance, **kwargs):
+    if instance.pk and instance._saved_category_id is None and not instance._state.adding:
+        instance._saved_category_id = Product.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+
+@receiver(post_save, sender=Product)
+def product_category_counts(sender, instance, created, **kwargs):
+    previous = None if created else instance._saved_category_id
+    if previous != instance.category_id:
+        with transaction.atomic():
+            if previous:
+                adjust_products_count(category_ancestry(previous), -1)
+            adjust_products_count(category_ancestry(instance.category_id), 1)
+    instance._saved_category_id = instance.category_id
+
+@receiver(post_delete, sender=Product)
+def product_category_deleted(sender, instance, **kwargs):
+    if instance._saved_category_id:
+        adjust_products_count(category_ancestry(instance._saved_category_id), -1)
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    # Place the category under its parent's path, moving its whole subtree if the parent changed.
+    with transaction.atomic():
+        # The instance's own tree columns may predate earlier moves, so the move works from the locked rows.
+        categories = Category.objects.select_for_update()
+        old_path, old_depth, count = categories.values_list('path', 'depth', 'products_count').get(pk=instance.pk)
+        parent_path = ''
+        if instance.parent_category_id:
+            parent_path = categories.values_list('path', flat=True).get(pk=instance.parent_category_id)
+        path = f'{parent_path}{instance.pk}/'
+        depth = path.count('/') - 1
+        if path != old_path:
+            if created or not old_path:
+                Category.objects.filter(pk=instance.pk).update(path=path, depth=depth)
+            else:
+                Category.objects.filter(path__startswith=old_path).update(
+                    path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (depth - old_depth),
+                )
+                adjust_products_count(Category.path_ids(old_path)[:-1], -count)
+                adjust_products_count(Category.path_ids(path)[:-1], count)
+    instance.path, instance.depth, instance.products_count = path, depth, count
+
+# Caches are invalidated when a write happens and again once it commits. Between the two, another request can
+# still read the old rows and cache them under the new version; the second bump discards that entry.
+
+def catalog_changed(sender, **kwargs):
+    # Any catalog write invalidates the cached catalog responses and category tree.
+    invalidate_catalog()
+    transaction.on_commit(invalidate_catalog)
+
+for model in (Product, Category, Discount, Comment, Bundle, BundleProduct):
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_save_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_changed_delete_{model.__name__}')
+
+def pricing_changed(sender, **kwargs):
+    # Discount, bundle or product changes make every process rebuild its pricing index.
+    invalidate_pricing()
+    transaction.on_commit(invalidate_pricing)
+
+for model in (Product, Discount, UserDiscount, Bundle, BundleProduct):
+    post_save.connect(pricing_changed, sender=model, dispatch_uid=f'pricing_changed_save_{model.__name__}')
+    post_delete.connect(pricing_changed, sender=model, dispatch_uid=f'pricing_changed_delete_{model.__name__}')
@@ -0,0 +1,69 @@
+import io
+import shutil
+import tempfile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+from catalog.images import TASK_TYPE, VARIANT_WIDTHS, available_formats
+from catalog.models import Category, Product
+from orders.models import OrderTask
+from orders.tasks import run_pending
+
+def png_bytes(width, height, color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class ProductImageVariantsTest(APITestCase):
+    # Test cases for the responsive image pipeline.
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Laptops', description='Laptops.')
+        self.product = Product(
+            product_name='Laptop', sku='LAPTOP1', description='A laptop.', price=1000,
+            weight=2, dimensions='30x20x2 cm', status='available', category=self.category
+        )
+        self.product.image.save('laptop.png', ContentFile(png_bytes(2000, 1000, 'navy')))
+
+    def test_upload_queues_and_builds_variants(self):
+        # Saving an image queues one task; the worker writes hashed, resized files for each size and format.
+        self.assertEqual(OrderTask.objects.filter(task_type=TASK_TYPE).count(), 1)
+        self.assertEqual(run_pending('test'), 1)
+        self.product.refresh_from_db()
+        sizes = self.product.image_variants['sizes']
+        self.assertEqual(self.product.image_variants['source'], self.product.image.name)
+        self.assertEqual({size: sizes[size]['width'] for size in sizes}, VARIANT_WIDTHS)
+        self.assertEqual(sizes['thumb']['height'], 80)
+        for name in available_formats():
+            self.assertRegex(sizes['card'][name], rf'^products/derived/laptop-card-[0-9a-f]{{16}}\.{name}$')
+            with default_storage.open(sizes['card'][name]) as variant:
+                self.assertEqual(Image.open(variant).size, (480, 240))
+
+        self.product.price = 900
+        self.product.save()
+        self.assertEqual(OrderTask.objects.filter(task_type=TASK_TYPE).count(), 1)
+
+    def test_serializer_srcset(self):
+        self.assertIsNone(self.client.get(reverse('product-detail', args=[self.product.pk])).data['images'])
+        run_pending('test')
+        images = self.client.get(reverse('product-detail', args=[self.product.pk])).data['images']
+        self.assertTrue(images['thumb']['webp'].startswith('/media/products/derived/'))
+        self.assertEqual(images['srcset']['webp'].count('w, '), len(VARIANT_WIDTHS) - 1)
+        self.assertTrue(images['srcset']['webp'].endswith(' 1200w'))
+
+    def test_replaced_image_hides_old_variants(self):
+        run_pending('test')
+        self.product.image.save('laptop-new.png', ContentFile(png_bytes(300, 300, 'red')))
+        self.product.refresh_from_db()
+        self.assertIsNone(self.client.get(reverse('product-detail', args=[self.product.pk])).data['images'])
+        run_pending('test')
+        self.product.refresh_from_db()
+        # Smaller images are not upscaled.
+        self.assertEqual(self.product.image_variants['sizes']['detail']['width'], 300)
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from catalog.importer import ProductImporter, read_rows
+from catalog.models import Category, Product
+from catalog.search import search_products
+
+User = get_user_model()
+FIELDS = ['sku', 'product_name', 'description', 'price', 'weight', 'dimensions', 'status', 'category']
+
+def csv_text(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+def row(sku, name, price='10.00', category='Laptops', **extra):
+    return dict(sku=sku, product_name=name, description='Imported.', price=price, weight='1.00',
+                dimensions='1x1x1 cm', status='available', category=category, **extra)
+
+class ProductImporterTest(TestCase):
+    # Test cases for the batched product upsert.
+    def setUp(self):
+        self.electronics = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.laptops = Category.objects.create(name='Laptops', description='Laptops.', parent_category=self.electronics)
+        self.phones = Category.objects.create(name='Phones', description='Phones.', parent_category=self.electronics)
+        Product.objects.create(
+            product_name='Old Laptop', sku='LAP1', description='Old.', price=500,
+            weight=2, dimensions='30x20x2 cm', status='available', category=self.phones
+        )
+
+    def import_csv(self, rows, **options):
+        importer = ProductImporter(batch_size=2, **options)
+        return importer.run(read_rows(io.StringIO(csv_text(rows)), 'csv'))
+
+    def test_upserts_on_sku(self):
+        # New skus are created, existing ones updated in place, across several batches.
+        report = self.import_csv([row('LAP1', 'Thin Laptop', '900.00'), row('LAP2', 'Gaming Laptop'), row('LAP3', 'Zephyrbook')])
+        self.assertEqual((report['created'], report['updated'], report['failed']), (2, 1, 0))
+        laptop = Product.objects.get(sku='LAP1')
+        self.assertEqual((laptop.product_name, laptop.price, laptop.category_id), ('Thin Laptop', 900, self.laptops.pk))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(search_products('zephyrbook'), [Product.objects.get(sku='LAP3').pk])
+
+    def test_category_counts_follow_import(self):
+        # Subtree counts include new products and the product that moved from Phones to Laptops.
+        self.import_csv([row('LAP1', 'Thin Laptop'), row('LAP2', 'Gaming Laptop')])
+        counts = dict(Category.objects.values_list('name', 'products_count'))
+        self.assertEqual(counts, {'Electronics': 2, 'Laptops': 2, 'Phones': 0})
+
+    def test_bad_rows_are_reported(self):
+        # Invalid rows are listed by line number and the rest of the file is imported.
+        report = self.import_csv([
+            row('LAP2', 'Gaming Laptop'),
+            row('LAP3', 'Broken', price='abc'),
+            row('LAP4', 'Lost', category='Tablets'),
+            row('LAP5', 'Fine Laptop'),
+        ])
+        self.assertEqual((report['created'], report['failed']), (2, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+        self.assertIn('price', report['errors'][0]['errors'])
+        self.assertIn('category', report['errors'][1]['errors'])
+
+    def test_duplicate_sku_keeps_last_row(self):
+        report = self.import_csv([row('LAP2', 'First'), row('LAP2', 'Second')])
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(Product.objects.get(sku='LAP2').product_name, 'Second')
+
+    def test_create_categories(self):
+        self.import_csv([row('TAB1', 'Tablet', category='Tablets')], create_categories=True)
+        tablets = Category.objects.get(name='Tablets')
+        self.assertEqual((tablets.products_count, tablets.path), (1, f'{tablets.pk}/'))
+
+    def test_jsonl(self):
+        lines = [json.dumps(row('LAP2', 'Gaming Laptop')), 'not json', json.dumps(['a'])]
+        report = ProductImporter().run(read_rows(io.StringIO('\n'.join(lines)), 'jsonl'))
+        self.assertEqual((report['created'], [error['line'] for error in report['errors']]), (1, [2, 3]))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write(csv_text([row('LAP2', 'Gaming Laptop')]))
+        self.addCleanup(os.remove, handle.name)
+        out = StringIO()
+        call_command('import_products', handle.name, stdout=out)
+        self.assertIn('Created 1, updated 0, failed 0', out.getvalue())
+
+class ProductImportAPITest(APITestCase):
+    # Test cases for the admin import endpoint.
+    def setUp(self):
+        Category.objects.create(name='Laptops', description='Laptops.')
+        self.url = reverse('product-import-products')
+
+    def upload(self):
+        return SimpleUploadedFile('products.csv', csv_text([row('LAP2', 'Gaming Laptop'), row('LAP3', 'Bad', price='')]).encode())
+
+    def test_admin_import(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.post(self.url, {'file': self.upload()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(user=User.objects.create_user(email='user@example.com', password='password123'))
+        response = self.client.post(self.url, {'file': self.upload()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Product.objects.exists())
@@ -1,5 +1,8 @@
 
+from io import StringIO
 from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
 from catalog.models import Category, Product, Discount, Comment, Bundle, BundleProduct
 
 class CategoryModelTest(TestCase):
@@ -38,3 +41,139 @@ class ProductModelTest(TestCase):
     def test_product_str(self):
         # Test the string representation.
         self.assertEqual(str(self.product), 'Laptop')
+
+class ProductRatingTest(TestCase):
+    # Test cases for the rating aggregates maintained from comments.
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='reviewer@example.com', password='password123')
+        self.category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.product = Product.objects.create(
+            product_name='Laptop', sku='LAPTOP123', description='A powerful laptop.', price=1200.00,
+            weight=2.5, dimensions='30x20x2 cm', status='available', category=self.category
+        )
+
+    def test_comment_writes_update_aggregates(self):
+        # Creating, editing and deleting comments keeps sum, count, average and histogram in step.
+        first = Comment.objects.create(product=self.product, user=self.user, text='Good.', star=4)
+        second = Comment.objects.create(product=self.product, user=self.user, text='Okay.', star=2)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (6, 2))
+        self.assertEqual(self.product.rating_avg, 3.0)
+        self.assertEqual((self.product.star_2_count, self.product.star_4_count), (1, 1))
+
+        second.star = 5
+        second.save()
+        first.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (5, 1))
+        self.assertEqual(self.product.rating_avg, 5.0)
+        self.assertEqual((self.product.star_2_count, self.product.star_4_count, self.product.star_5_count), (0, 0, 1))
+
+        second.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_count, self.product.rating_avg), (0, 0))
+
+    def test_deferred_comments(self):
+        # Comments loaded with only() can be read, edited and deleted without losing track of their rating.
+        comment = Comment.objects.create(product=self.product, user=self.user, text='Good.', star=4)
+        deferred = Comment.objects.only('text').get(pk=comment.pk)
+        self.assertEqual(deferred.text, 'Good.')
+        deferred.text = 'Very good.'
+        deferred.save()
+        deferred = Comment.objects.only('text').get(pk=comment.pk)
+        deferred.star = 2
+        deferred.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.star_2_count, self.product.star_4_count), (2, 1, 1, 0))
+        Comment.objects.only('text').get(pk=comment.pk).delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count, self.product.star_2_count), (0, 0, 0))
+
+    def test_product_save_keeps_aggregates(self):
+        # A product loaded before a comment was posted doesn't write its stale aggregates back.
+        loaded = Product.objects.get(pk=self.product.pk)
+        Comment.objects.create(product=self.product, user=self.user, text='Good.', star=4)
+        loaded.price = 1100
+        loaded.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.price, self.product.rating_count, self.product.star_4_count), (1100, 1, 1))
+
+    def test_rebuild_product_ratings(self):
+        # The rebuild command recomputes aggregates written around the signals.
+        Comment.objects.bulk_create([
+            Comment(product=self.product, user=self.user, text='Good.', star=4),
+            Comment(product=self.product, user=self.user, text='Bad.', star=1),
+        ])
+        call_command('rebuild_product_ratings', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_sum, self.product.rating_count), (5, 2))
+        self.assertEqual(self.product.rating_avg, 2.5)
+        self.assertEqual((self.product.star_1_count, self.product.star_4_count), (1, 1))
+
+class CategoryTreeTest(TestCase):
+    # Test cases for materialized category paths and subtree product counts.
+    def setUp(self):
+        self.electronics = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.computers = Category.objects.create(name='Computers', description='Computers.', parent_category=self.electronics)
+        self.laptops = Category.objects.create(name='Laptops', description='Laptops.', parent_category=self.computers)
+        self.home = Category.objects.create(name='Home', description='Home goods.')
+
+    def create_product(self, sku, category):
+        return Product.objects.create(
+            product_name=sku, sku=sku, description='A product.', price=100,
+            weight=1, dimensions='10x10x10 cm', status='available', category=category
+        )
+
+    def counts(self):
+        return dict(Category.objects.values_list('name', 'products_count'))
+
+    def test_paths_and_counts(self):
+        # Paths nest under the parent and product writes update every ancestor's count.
+        self.laptops.refresh_from_db()
+        self.assertEqual(self.laptops.path, f'{self.electronics.pk}/{self.computers.pk}/{self.laptops.pk}/')
+        self.assertEqual(self.laptops.depth, 2)
+
+        laptop = self.create_product('LAPTOP1', self.laptops)
+        self.create_product('PC1', self.computers)
+        self.assertEqual(self.counts(), {'Electronics': 2, 'Computers': 2, 'Laptops': 1, 'Home': 0})
+        laptop.category = self.home
+        laptop.save()
+        self.assertEqual(self.counts(), {'Electronics': 1, 'Computers': 1, 'Laptops': 0, 'Home': 1})
+        laptop.delete()
+        self.assertEqual(self.counts(), {'Electronics': 1, 'Computers': 1, 'Laptops': 0, 'Home': 0})
+
+    def test_moving_a_category_moves_its_subtree(self):
+        # Re-parenting rewrites descendant paths and moves the subtree count between ancestors.
+        self.create_product('LAPTOP1', self.laptops)
+        self.computers.parent_category = self.home
+        self.computers.save()
+        self.laptops.refresh_from_db()
+        self.assertEqual(self.laptops.path, f'{self.home.pk}/{self.computers.pk}/{self.laptops.pk}/')
+        self.assertEqual(self.counts(), {'Electronics': 0, 'Computers': 1, 'Laptops': 1, 'Home': 1})
+        self.assertEqual(list(Product.objects.in_category_tree(self.home.pk).values_list('sku', flat=True)), ['LAPTOP1'])
+
+    def test_moving_twice_with_one_loaded_instance(self):
+        # A stale instance (loaded before products were added and before its first move) moves its real subtree.
+        loaded = Category.objects.get(pk=self.computers.pk)
+        self.create_product('LAPTOP1', self.laptops)
+        loaded.parent_category = self.home
+        loaded.save()
+        stale = Category.objects.get(pk=self.computers.pk)
+        self.create_product('PC1', self.computers)
+        loaded.parent_category = None
+        loaded.save()
+        stale.parent_category = self.electronics
+        stale.save()
+        self.laptops.refresh_from_db()
+        self.assertEqual(self.laptops.path, f'{self.electronics.pk}/{self.computers.pk}/{self.laptops.pk}/')
+        self.assertEqual(self.laptops.depth, 2)
+        self.assertEqual(self.counts(), {'Electronics': 2, 'Computers': 2, 'Laptops': 1, 'Home': 0})
+
+    def test_rebuild_category_tree(self):
+        # The rebuild command restores paths and counts written around the signals.
+        self.create_product('LAPTOP1', self.laptops)
+        Category.objects.update(path='', depth=0, products_count=0)
+        call_command('rebuild_category_tree', stdout=StringIO())
+        self.laptops.refresh_from_db()
+        self.assertEqual((self.laptops.path, self.laptops.depth), (f'{self.electronics.pk}/{self.computers.pk}/{self.laptops.pk}/', 2))
+        self.assertEqual(self.counts(), {'Electronics': 1, 'Computers': 1, 'Laptops': 1, 'Home': 0})
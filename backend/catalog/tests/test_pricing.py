@@ -0,0 +1,98 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from catalog.models import Category, Discount, Product, UserDiscount
+from catalog.pricing import DiscountIndex, get_index, price_lines
+
+User = get_user_model()
+NOW = timezone.now()
+DAY = timedelta(days=1)
+
+def rule(discount_id, kind, value, start=NOW - DAY, end=NOW + DAY):
+    return (discount_id, kind, Decimal(value), start, end)
+
+class DiscountIndexTest(SimpleTestCase):
+    # Test cases for pricing a cart against an in-memory index.
+    def test_line_discounts(self):
+        # Percentage and fixed product discounts apply per unit and never go below zero.
+        index = DiscountIndex([rule(1, 'percentage', 10), rule(2, 'fixed_amount', 50)], [(1, 1), (2, 2)], [], [])
+        totals = index.price([(1, 2, '100.00'), (2, 1, '30.00'), (3, 1, '5.00')], at=NOW)
+        self.assertEqual(totals['subtotal'], Decimal('235.00'))
+        self.assertEqual(totals['line_discount'], Decimal('50.00'))
+        self.assertEqual(totals['total_amount'], Decimal('185.00'))
+
+    def test_discount_windows(self):
+        # Expired and not yet started discounts are ignored.
+        index = DiscountIndex(
+            [rule(1, 'percentage', 10, end=NOW - DAY), rule(2, 'percentage', 20, start=NOW + DAY, end=NOW + 2 * DAY)],
+            [(1, 1), (2, 2)], [(7, 2)], [],
+        )
+        self.assertEqual(index.price([(1, 1, 100), (2, 1, 100)], user_id=7, at=NOW)['total_amount'], Decimal('200.00'))
+        self.assertEqual(index.price([(2, 1, 100)], user_id=7, at=NOW + DAY)['total_amount'], Decimal('64.00'))
+
+    def test_best_order_discount(self):
+        # The user's most valuable order-level discount is applied, not all of them.
+        index = DiscountIndex([rule(1, 'percentage', 10), rule(2, 'fixed_amount', 15)], [], [(7, 1), (7, 2)], [])
+        small = index.price([(1, 1, 100)], user_id=7, at=NOW)
+        self.assertEqual((small['discount_id'], small['total_amount']), (2, Decimal('85.00')))
+        large = index.price([(1, 3, 100)], user_id=7, at=NOW)
+        self.assertEqual((large['discount_id'], large['total_amount']), (1, Decimal('270.00')))
+        self.assertIsNone(index.price([(1, 1, 100)], user_id=8, at=NOW)['discount_id'])
+
+    def test_bundle_adjustment(self):
+        # Only complete bundle sets are adjusted.
+        index = DiscountIndex([], [], [], [(1, 1, 1, Decimal('-10')), (1, 2, 2, Decimal('-5'))])
+        self.assertEqual(index.price([(1, 1, 100), (2, 1, 20)], at=NOW)['bundle_discount'], Decimal('0.00'))
+        totals = index.price([(1, 3, 100), (2, 5, 20)], at=NOW)
+        self.assertEqual(totals['bundle_discount'], Decimal('40.00'))
+        self.assertEqual(totals['total_amount'], Decimal('360.00'))
+
+    def test_bundle_only_when_cheaper(self):
+        # A bundle is skipped when the product discount already beats it.
+        index = DiscountIndex([rule(1, 'percentage', 50)], [(1, 1)], [], [(1, 1, 1, Decimal('-10'))])
+        totals = index.price([(1, 1, 100)], at=NOW)
+        self.assertEqual((totals['bundle_discount'], totals['total_amount']), (Decimal('0.00'), Decimal('50.00')))
+
+    def test_line_totals_add_up(self):
+        # Bundle savings stay with their products and the order discount is shared out, to the cent.
+        index = DiscountIndex(
+            [rule(1, 'fixed_amount', 10)], [], [(7, 1)], [(1, 1, 1, Decimal('-10')), (1, 2, 1, Decimal('-5'))],
+        )
+        totals = index.price([(1, 1, 100), (2, 1, 20), (3, 3, Decimal('3.33'))], user_id=7, at=NOW)
+        self.assertEqual(totals['total_amount'], Decimal('104.99'))
+        self.assertEqual(totals['lines'], {1: Decimal('82.17'), 2: Decimal('13.70'), 3: Decimal('9.12')})
+        thirds = DiscountIndex([rule(1, 'fixed_amount', 1)], [], [(7, 1)], []).price([(1, 1, 1), (2, 1, 1), (3, 1, 1)], user_id=7, at=NOW)
+        self.assertEqual(sum(thirds['lines'].values()), thirds['total_amount'])
+
+class PricingIndexRefreshTest(TestCase):
+    # The shared index follows discount writes.
+    def test_index_rebuilt_on_change(self):
+        user = User.objects.create_user(email='saver@example.com', password='password123')
+        category = Category.objects.create(name='Books', description='Books.')
+        product = Product.objects.create(
+            product_name='Novel', sku='NOVEL1', description='A novel.', price=40,
+            weight=0.5, dimensions='20x13x3 cm', status='available', category=category
+        )
+        self.assertEqual(price_lines([(product.id, 1, product.price)], user_id=user.pk)['total_amount'], Decimal('40.00'))
+        discount = Discount.objects.create(
+            value=25, discount_type='percentage', description='Welcome', start_date=NOW - DAY, end_date=NOW + DAY,
+        )
+        UserDiscount.objects.create(user=user, discount=discount)
+        self.assertEqual(price_lines([(product.id, 1, product.price)], user_id=user.pk)['total_amount'], Decimal('30.00'))
+        index = get_index()
+        with self.assertNumQueries(0):
+            self.assertIs(get_index(), index)
+
+    def test_index_expires_without_a_new_version(self):
+        # Another process's write doesn't reach this one's memory cache; the index still ages out.
+        user = User.objects.create_user(email='saver@example.com', password='password123')
+        discount = Discount.objects.create(
+            value=10, discount_type='fixed_amount', description='Welcome', start_date=NOW - DAY, end_date=NOW + DAY,
+        )
+        index = get_index()
+        UserDiscount.objects.bulk_create([UserDiscount(user=user, discount=discount)]) # No signal, as if written elsewhere.
+        self.assertIs(get_index(), index)
+        with override_settings(PRICING_INDEX_MAX_AGE=0):
+            self.assertEqual(price_lines([(1, 1, 40)], user_id=user.pk)['total_amount'], Decimal('30.00'))
@@ -1,8 +1,15 @@
+from io import StringIO
+from unittest import skipUnless
 from rest_framework.test import APITestCase
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from rest_framework import status
+from django.contrib.auth import get_user_model
 from catalog.models import Category, Product, Discount, Comment, Bundle, BundleProduct
 
+User = get_user_model()
+
 class CategoryAPITest(APITestCase):
     # Test cases for the Category API.
     def setUp(self):
@@ -22,6 +29,21 @@ class CategoryAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['name'], 'Electronics')
 
+    def test_category_tree(self):
+        # The tree nests subcategories, is cached per version and refreshes when a category changes.
+        child = Category.objects.create(name='Laptops', description='Laptops.', parent_category=self.category)
+        url = reverse('category-tree')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tree'][0]['children'][0]['id'], child.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, response.data)
+        child.name = 'Notebooks'
+        child.save()
+        refreshed = self.client.get(url).data
+        self.assertGreater(refreshed['version'], response.data['version'])
+        self.assertEqual(refreshed['tree'][0]['children'][0]['name'], 'Notebooks')
+
 class ProductAPITest(APITestCase):
     # Test cases for the Product API.
     def setUp(self):
@@ -42,4 +64,192 @@ class ProductAPITest(APITestCase):
         # Test retrieving a list of products.
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_list_products_query_count(self):
+        # Listing products costs the same number of queries regardless of how many are returned.
+        user = User.objects.create_user(email='reviewer@example.com', password='password123')
+        discount = Discount.objects.create(
+            value=10, discount_type='percentage', description='Sale',
+            start_date='2024-01-01T00:00:00Z', end_date='2030-01-01T00:00:00Z'
+        )
+        for i in range(10):
+            product = Product.objects.create(
+                product_name=f'Phone {i}', sku=f'PHONE{i}', description='A phone.', price=500,
+                weight=0.2, dimensions='15x7x1 cm', status='available',
+                category=self.category, discount=discount
+            )
+            Comment.objects.create(product=product, user=user, text='Good.', star=4)
+            Comment.objects.create(product=product, user=user, text='Great.', star=5)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data['results']), 11)
+        phone = next(item for item in response.data['results'] if item['sku'] == 'PHONE0')
+        self.assertEqual(phone['rating'], 4.5)
+        self.assertEqual(phone['discount_percentage'], 10.0)
+        self.assertEqual(phone['category_name'], 'Electronics')
+
+    def test_list_products_cursor_pagination(self):
+        # Pages follow the price ordering through opaque cursors without repeating products.
+        for i in range(4):
+            Product.objects.create(
+                product_name=f'Mouse {i}', sku=f'MOUSE{i}', description='A mouse.', price=10 + i,
+                weight=0.1, dimensions='10x6x4 cm', status='available', category=self.category
+            )
+        response = self.client.get(self.list_url, {'ordering': 'price', 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['sku'] for item in response.data['results']], ['MOUSE0', 'MOUSE1'])
+        skus = [item['sku'] for item in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            skus.extend(item['sku'] for item in response.data['results'])
+            next_url = response.data['next']
+        self.assertEqual(skus, ['MOUSE0', 'MOUSE1', 'MOUSE2', 'MOUSE3', 'LAPTOP123'])
+
+    def test_filter_by_category_tree(self):
+        # category_tree includes products of subcategories in a single query.
+        laptops = Category.objects.create(name='Laptops', description='Laptops.', parent_category=self.category)
+        other = Category.objects.create(name='Home', description='Home goods.')
+        for sku, category in [('GAMER1', laptops), ('LAMP1', other)]:
+            Product.objects.create(
+                product_name=sku, sku=sku, description='A product.', price=100, weight=1,
+                dimensions='10x10x10 cm', status='available', category=category
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, {'category_tree': self.category.id})
+        self.assertEqual(sorted(item['sku'] for item in response.data['results']), ['GAMER1', 'LAPTOP123'])
+
+    def test_batch_lookup(self):
+        # Products come back in request order with the detail shape, missing ids are reported, in one query.
+        phones = [
+            Product.objects.create(
+                product_name=f'Phone {i}', sku=f'PHONE{i}', description='A phone.', price=500,
+                weight=0.2, dimensions='15x7x1 cm', status='available', category=self.category
+            )
+            for i in range(3)
+        ]
+        ids = [phones[2].id, self.product.id, 999999, phones[0].id, phones[2].id]
+        url = reverse('product-batch')
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['sku'] for item in response.data['results']], ['PHONE2', 'LAPTOP123', 'PHONE0'])
+        self.assertEqual(response.data['missing'], [999999])
+        detail = self.client.get(reverse('product-detail', args=[self.product.id])).data
+        self.assertEqual(response.data['results'][1], detail)
+        with self.assertNumQueries(0):
+            self.client.get(url, {'ids': ','.join(map(str, ids))})
+
+    def test_batch_lookup_validation(self):
+        url = reverse('product-batch')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'ids': '1,abc'}).status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = ','.join(str(i) for i in range(1, 202))
+        self.assertEqual(self.client.get(url, {'ids': too_many}).status_code, status.HTTP_400_BAD_REQUEST)
+
+class ProductSearchAPITest(APITestCase):
+    # Test cases for the full-text product search endpoint.
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.url = reverse('product-search')
+        for sku, name, description in [
+            ('LAPTOP123', 'Gaming Laptop', 'A powerful laptop for games.'),
+            ('BAG001', 'Backpack', 'Fits a laptop up to 15 inches.'),
+            ('MOUSE01', 'Wireless Mouse', 'A quiet mouse.'),
+        ]:
+            Product.objects.create(
+                product_name=name, sku=sku, description=description, price=100,
+                weight=1, dimensions='10x10x10 cm', status='available', category=self.category
+            )
+
+    def test_search_ranks_name_matches_first(self):
+        # Products matching in the name outrank those matching only in the description.
+        response = self.client.get(self.url, {'q': 'laptop'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['sku'] for item in response.data['results']], ['LAPTOP123', 'BAG001'])
+
+    def test_search_prefix_and_sku(self):
+        # The last term is a prefix, exact SKUs short-circuit, and edits are re-indexed.
+        response = self.client.get(self.url, {'q': 'wire'})
+        self.assertEqual([item['sku'] for item in response.data['results']], ['MOUSE01'])
+        response = self.client.get(self.url, {'q': 'bag001'})
+        self.assertEqual([item['sku'] for item in response.data['results']], ['BAG001'])
+
+        mouse = Product.objects.get(sku='MOUSE01')
+        mouse.product_name = 'Trackball'
+        mouse.save()
+        self.assertEqual(self.client.get(self.url, {'q': 'wire'}).data['results'], [])
+        mouse.delete()
+        self.assertEqual(self.client.get(self.url, {'q': 'track'}).data['results'], [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'The FTS5 index is a separate table only on SQLite.')
+    def test_existing_products_are_indexed(self):
+        # Products written before the index existed are found once post_migrate creates it, or after a rebuild.
+        from catalog.signals import create_search_index
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE catalog_product_fts')
+        create_search_index(sender=None)
+        self.assertEqual([item['sku'] for item in self.client.get(self.url, {'q': 'mouse'}).data['results']], ['MOUSE01'])
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM catalog_product_fts')
+        self.assertEqual(self.client.get(self.url, {'q': 'mouse'}).data['results'], [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual([item['sku'] for item in self.client.get(self.url, {'q': 'mouse'}).data['results']], ['MOUSE01'])
+
+class CatalogCacheAPITest(APITestCase):
+    # Test cases for the cached catalog read endpoints.
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.product = Product.objects.create(
+            product_name='Laptop', sku='LAPTOP123', description='A powerful laptop.', price=1200,
+            weight=2.5, dimensions='30x20x2 cm', status='available', category=self.category
+        )
+        self.detail_url = reverse('product-detail', args=[self.product.id])
+
+    def test_cached_detail_and_etag(self):
+        # Repeat reads skip the database, If-None-Match gets a 304, and a write invalidates the entry.
+        first = self.client.get(self.detail_url)
+        self.assertIn('ETag', first)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail_url)
+        self.assertEqual(second.data, first.data)
+        not_modified = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.product.price = 999
+        self.product.save()
+        changed = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data['price'], '999.00')
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_entry_cached_before_commit_is_discarded(self):
+        # A read between the write and its commit caches old data under the new version; the commit bump drops it.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 999
+            self.product.save()
+            Product.objects.filter(pk=self.product.pk).update(price=1200) # The row another request still sees.
+            self.assertEqual(self.client.get(self.detail_url).data['price'], '1200.00')
+            Product.objects.filter(pk=self.product.pk).update(price=999)
+        self.assertEqual(self.client.get(self.detail_url).data['price'], '999.00')
+
+    def test_list_key_ignores_param_order(self):
+        # Equivalent query strings share one entry.
+        list_url = reverse('product-list')
+        self.client.get(list_url, {'status': 'available', 'ordering': 'price'})
+        with self.assertNumQueries(0):
+            response = self.client.get(f'{list_url}?ordering=price&status=available&search=')
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_cache_stats_requires_admin(self):
+        url = reverse('catalog-cache-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.client.force_authenticate(user=admin)
+        self.client.get(self.detail_url)
+        self.client.get(self.detail_url)
+        stats = self.client.get(url).data
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
@@ -0,0 +1,35 @@
+"""
+Cached category tree.
+
+The whole tree is built from one ordered query over the materialized paths
+and cached under the catalog version (see catalog.cache). Any change to
+categories or products bumps the version, so stale trees are never served
+and clients can compare versions to skip re-rendering menus.
+"""
+from django.core.cache import cache
+from .cache import catalog_version
+from .models import Category
+
+TREE_TIMEOUT = 60 * 60
+
+def build_tree():
+    # Nest every category under its parent; path order guarantees parents come first.
+    nodes = {}
+    roots = []
+    categories = Category.objects.order_by('path').values('id', 'name', 'description', 'parent_category', 'products_count')
+    for category in categories:
+        node = dict(category, children=[])
+        nodes[node['id']] = node
+        parent = nodes.get(node.pop('parent_category'))
+        (parent['children'] if parent else roots).append(node)
+    return roots
+
+def get_tree():
+    # The current tree and its version, built at most once per version.
+    version = catalog_version()
+    key = f'catalog:category_tree:{version}'
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree()
+        cache.set(key, tree, TREE_TIMEOUT)
+    return {'version': version, 'tree': tree}
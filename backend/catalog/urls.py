@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, DiscountViewSet, ProductViewSet, CommentViewSet, BundleViewSet, BundleProductViewSet
+from .views import CategoryViewSet, DiscountViewSet, ProductViewSet, CommentViewSet, BundleViewSet, BundleProductViewSet, ProductSearchView, CatalogCacheStatsView
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -11,5 +11,7 @@ router.register(r'bundles', BundleViewSet)
 router.register(r'bundle-products', BundleProductViewSet)
 
 urlpatterns = [
+    path('search/', ProductSearchView.as_view(), name='product-search'),
+    path('cache-stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
     path('', include(router.urls)),
 ]
@@ -1,31 +1,124 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
+import io
+from rest_framework import viewsets, generics, status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser, AllowAny
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from shop.pagination import KeysetPagination
 from .models import Category, Discount, Product, Comment, Bundle, BundleProduct, UserDiscount
+from .cache import CachedReadMixin, cache_stats
+from .filters import ProductFilter
+from .importer import ProductImporter, read_rows
+from .search import search_products
+from .tree import get_tree
 from .serializers import CategorySerializer, DiscountSerializer, ProductSerializer, CommentSerializer, BundleSerializer, BundleProductSerializer, UserDiscountSerializer
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedReadMixin, viewsets.ModelViewSet):
     # ViewSet for categories.
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        # Full nested category tree with subtree product counts, served from cache.
+        return Response(get_tree())
+
 class DiscountViewSet(viewsets.ModelViewSet):
     # ViewSet for discounts.
     queryset = Discount.objects.all()
     serializer_class = DiscountSerializer
     permission_classes = [IsAdminUser]
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedReadMixin, viewsets.ModelViewSet):
     # ViewSet for products with filtering and searching.
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['category', 'status', 'price']
+    filterset_class = ProductFilter
     search_fields = ['product_name', 'description', 'sku']
-    ordering_fields = ['price', 'product_name']
+    ordering_fields = ['price', 'product_name', 'rating_avg']
+    pagination_class = KeysetPagination
+    import_batch_size = 1000
+    max_reported_errors = 1000
+    max_batch_ids = 200
+
+    def get_queryset(self):
+        # Category and discount come from the same query instead of one per product.
+        return Product.objects.for_listing()
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        # Products for ?ids=3,1,2 in the order asked, plus the ids that don't exist; one query, cached like list.
+        return self.cached_response(request, self.lookup_batch)
+
+    def batch_ids(self, request):
+        raw = [value for param in request.query_params.getlist('ids') for value in param.split(',') if value.strip()]
+        if not raw:
+            raise ValidationError({'ids': 'Pass product ids as ?ids=1,2,3.'})
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw))
+        except ValueError:
+            raise ValidationError({'ids': 'Product ids must be integers.'})
+        if len(ids) > self.max_batch_ids:
+            raise ValidationError({'ids': f'At most {self.max_batch_ids} ids per request.'})
+        return ids
+
+    def lookup_batch(self, request):
+        ids = self.batch_ids(request)
+        products = Product.objects.for_listing().in_bulk(ids)
+        return Response({
+            'results': self.get_serializer([products[pk] for pk in ids if pk in products], many=True).data,
+            'missing': [pk for pk in ids if pk not in products],
+        })
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def import_products(self, request):
+        # Upsert products by sku from an uploaded CSV or JSON Lines file; bad rows are reported, not fatal.
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'Upload the file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        if file_format not in ('csv', 'jsonl'):
+            return Response({'error': 'Format must be csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+        importer = ProductImporter(
+            batch_size=self.import_batch_size,
+            create_categories=request.data.get('create_categories') in ('1', 'true'),
+        )
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = importer.run(read_rows(stream, file_format))
+        report['errors'] = report['errors'][:self.max_reported_errors]
+        return Response(report)
+
+class ProductSearchView(generics.GenericAPIView):
+    # Ranked full-text product search; the last term is matched as a prefix for autocomplete.
+    serializer_class = ProductSerializer
+    permission_classes = [AllowAny]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        product_ids = search_products(query, max(limit, 1))
+        products = Product.objects.for_listing().in_bulk(product_ids)
+        results = [products[pk] for pk in product_ids if pk in products]
+        return Response({'query': query, 'results': self.get_serializer(results, many=True).data})
+
+class CatalogCacheStatsView(APIView):
+    # Hit/miss counters of the catalog response cache, for monitoring.
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
 
 class CommentViewSet(viewsets.ModelViewSet):
     # ViewSet for comments.
@@ -33,13 +126,13 @@ class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class BundleViewSet(viewsets.ModelViewSet):
+class BundleViewSet(CachedReadMixin, viewsets.ModelViewSet):
     # ViewSet for bundles.
     queryset = Bundle.objects.all()
     serializer_class = BundleSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class BundleProductViewSet(viewsets.ModelViewSet):
+class BundleProductViewSet(CachedReadMixin, viewsets.ModelViewSet):
     # ViewSet for bundle products.
     queryset = BundleProduct.objects.all()
     serializer_class = BundleProductSerializer
@@ -50,11 +143,3 @@ class UserDiscountViewSet(viewsets.ModelViewSet):
     queryset = UserDiscount.objects.all()
     serializer_class = UserDiscountSerializer
     permission_classes = [IsAdminUser]
-    
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
-    serializer_class = ProductSerializer
-
-class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
\ No newline at end of file
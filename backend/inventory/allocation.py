@@ -0,0 +1,85 @@
+"""
+Stock allocation across warehouses.
+
+Given the order lines and the inventory rows for their products (fetched in
+one batch, see inventory.stock.lock_inventory), ``allocate`` decides how many
+units to take from which warehouse:
+
+1. If a single warehouse can ship every line, use it.
+2. Otherwise pick warehouses greedily, each time taking the one that can
+   fully ship the most remaining lines (then the most remaining units), so
+   the order is split into as few shipments as practical.
+
+Stock below a row's ``Minimum_Quantity`` is held back and never allocated.
+Everything runs in memory; nothing is written.
+"""
+
+class AllocationError(Exception):
+    # Raised when a line cannot be allocated; carries the offending product id.
+    def __init__(self, product_id):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+class InventoryNotFound(AllocationError):
+    pass
+
+class InsufficientStock(AllocationError):
+    pass
+
+def available_quantity(inventory):
+    # Units that can be sold from a row without dipping below its minimum stock level.
+    return max(inventory.Quantity - (inventory.Minimum_Quantity or 0), 0)
+
+def allocate(lines, inventories):
+    """
+    Split order lines across warehouses.
+
+    ``lines`` is a list of (product_id, quantity) pairs with distinct
+    products and ``inventories`` the candidate ProductInventory rows.
+    Returns a list of (inventory, quantity) pairs, or raises
+    InventoryNotFound / InsufficientStock for the first line that cannot be
+    met.
+    """
+    # stock[warehouse_id][product_id] -> [inventory, available units]
+    stock = {}
+    totals = {}
+    for inventory in inventories:
+        available = available_quantity(inventory)
+        stock.setdefault(inventory.warehouse_id, {})[inventory.product_id] = [inventory, available]
+        totals[inventory.product_id] = totals.get(inventory.product_id, 0) + available
+
+    for product_id, quantity in lines:
+        if product_id not in totals:
+            raise InventoryNotFound(product_id)
+        if totals[product_id] < quantity:
+            raise InsufficientStock(product_id)
+
+    remaining = {product_id: quantity for product_id, quantity in lines if quantity > 0}
+    allocations = []
+    while remaining:
+        best_key, best_warehouse = None, None
+        for warehouse_id, rows in stock.items():
+            full_lines = units = 0
+            for product_id, quantity in remaining.items():
+                row = rows.get(product_id)
+                if row and row[1]:
+                    units += min(row[1], quantity)
+                    if row[1] >= quantity:
+                        full_lines += 1
+            # Most complete lines first, then most units, then the lowest warehouse id for stable results.
+            key = (full_lines, units, -warehouse_id)
+            if units and (best_key is None or key > best_key):
+                best_key, best_warehouse = key, warehouse_id
+
+        rows = stock[best_warehouse]
+        for product_id in list(remaining):
+            row = rows.get(product_id)
+            if not row or not row[1]:
+                continue
+            taken = min(row[1], remaining[product_id])
+            row[1] -= taken
+            allocations.append((row[0], taken))
+            remaining[product_id] -= taken
+            if not remaining[product_id]:
+                del remaining[product_id]
+    return allocations
@@ -0,0 +1,38 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from inventory.allocation import allocate
+from inventory.models import ProductInventory
+
+class Command(BaseCommand):
+    help = 'Time the in-memory warehouse allocation on synthetic carts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100)
+        parser.add_argument('--warehouses', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        lines = [(product_id, rng.randint(1, 20)) for product_id in range(1, options['lines'] + 1)]
+        # Each warehouse stocks roughly a third of the products, so most carts need several shipments.
+        inventories = [
+            ProductInventory(
+                product_id=product_id, warehouse_id=warehouse_id,
+                Quantity=rng.randint(0, 30), Minimum_Quantity=rng.choice([None, 0, 2]),
+            )
+            for warehouse_id in range(1, options['warehouses'] + 1)
+            for product_id, _ in lines
+            if rng.random() < 0.33
+        ]
+
+        start = time.perf_counter()
+        for _ in range(options['repeat']):
+            allocations = allocate(lines, inventories)
+        elapsed = (time.perf_counter() - start) / options['repeat'] * 1000
+
+        shipments = len({inv.warehouse_id for inv, _ in allocations})
+        self.stdout.write(
+            f"{options['lines']} lines x {options['warehouses']} warehouses ({len(inventories)} rows): "
+            f"{elapsed:.2f} ms per cart, {shipments} shipments, {len(allocations)} allocations"
+        )
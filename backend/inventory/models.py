@@ -40,5 +40,11 @@ class InventoryTransaction(models.Model):
     Reference_ID = models.IntegerField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'timestamp'], name='invtx_product_time_idx'),
+            models.Index(fields=['timestamp'], name='invtx_time_idx'),
+        ]
+
     def __str__(self):
         return f'{self.Type} transaction for {self.product.product_name}'
@@ -0,0 +1,102 @@
+"""
+Stock reservation helpers used by checkout.
+
+Rows are locked in primary key order so that concurrent checkouts touching
+overlapping products always acquire locks in the same order and cannot
+deadlock, and decrements are conditional so stock can never drop below a
+row's ``Minimum_Quantity`` (or zero), the same floor ``allocate`` keeps to,
+even where the database does not support row locks (SQLite). There,
+checkouts in one process also take turns on ``stock_lock`` so they queue
+instead of failing with "database is locked".
+
+``add_stock`` is the bulk counterpart for incoming stock. It skips model
+signals like any ``update()``, so it reports the products it brought back
+into stock with the ``products_restocked`` signal instead.
+"""
+import threading
+from contextlib import nullcontext
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import ProductInventory, InventoryTransaction
+
+# Sent by add_stock with `product_ids`, the products that had no stock in any warehouse before it ran.
+products_restocked = Signal()
+
+_stock_lock = threading.Lock()
+
+def stock_lock():
+    # Row locks keep checkouts apart where the database has them; otherwise checkouts in this process take turns.
+    if connection.features.has_select_for_update:
+        return nullcontext()
+    return _stock_lock
+
+def is_lock_contention(exc):
+    # SQLite reports a writer it gave up waiting for as an OperationalError.
+    return 'locked' in str(exc)
+
+def lock_inventory(product_ids):
+    # Fetch and lock every inventory row for the given products in active warehouses in one query.
+    return list(
+        ProductInventory.objects.select_for_update(of=('self',))
+        .filter(product_id__in=product_ids, warehouse__status='active')
+        .order_by('pk')
+    )
+
+def decrement_inventory(allocations):
+    """
+    Subtract stock for (inventory, quantity) pairs with a single conditional UPDATE.
+
+    Returns False if any row no longer had enough stock above its
+    ``Minimum_Quantity``; the caller must then
+    roll back, since the rows that did have enough were already decremented.
+    """
+    amounts = {}
+    for inventory, quantity in allocations:
+        amounts[inventory.pk] = amounts.get(inventory.pk, 0) + quantity
+    if not amounts:
+        return True
+    needed = Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in amounts.items()], output_field=IntegerField())
+    floor = Coalesce(F('Minimum_Quantity'), Value(0))
+    updated = ProductInventory.objects.filter(pk__in=amounts, Quantity__gte=needed + floor).update(
+        Quantity=F('Quantity') - needed,
+        Last_Updated=timezone.now(),
+    )
+    return updated == len(amounts)
+
+def add_stock(amounts):
+    """
+    Add stock to inventory rows from a {inventory id: quantity} dict with a single UPDATE.
+
+    Call inside a transaction. Returns the ids of the products that went from
+    no stock in any warehouse to some, which are also sent with
+    ``products_restocked``.
+    """
+    amounts = {pk: quantity for pk, quantity in amounts.items() if quantity}
+    if not amounts:
+        return set()
+    product_ids = set(ProductInventory.objects.filter(pk__in=amounts).values_list('product_id', flat=True))
+    stocked = ProductInventory.objects.filter(product_id__in=product_ids, Quantity__gt=0).values_list('product_id', flat=True)
+    was_empty = product_ids - set(stocked)
+    added = Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in amounts.items()], output_field=IntegerField())
+    ProductInventory.objects.filter(pk__in=amounts).update(Quantity=F('Quantity') + added, Last_Updated=timezone.now())
+    restocked = set(stocked.filter(product_id__in=was_empty)) if was_empty else set()
+    if restocked:
+        products_restocked.send(sender=ProductInventory, product_ids=restocked)
+    return restocked
+
+def record_transactions(allocations, reference_type, reference_id, transaction_type='sale'):
+    # Log each stock movement as an outgoing InventoryTransaction.
+    InventoryTransaction.objects.bulk_create([
+        InventoryTransaction(
+            product_id=inventory.product_id,
+            warehouse_id=inventory.warehouse_id,
+            Quantity=-quantity,
+            Type=transaction_type,
+            Reference_Type=reference_type,
+            Reference_ID=reference_id,
+        )
+        for inventory, quantity in allocations
+    ])
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+from inventory.allocation import allocate, InventoryNotFound, InsufficientStock
+from inventory.models import ProductInventory
+
+def inventory(product_id, warehouse_id, quantity, minimum=None):
+    return ProductInventory(product_id=product_id, warehouse_id=warehouse_id, Quantity=quantity, Minimum_Quantity=minimum)
+
+def summarize(allocations):
+    return sorted((inv.warehouse_id, inv.product_id, quantity) for inv, quantity in allocations)
+
+class AllocationTest(SimpleTestCase):
+    # Test cases for splitting order lines across warehouses.
+    def test_prefers_single_warehouse(self):
+        # A warehouse that can ship the whole order wins even if another holds more of one product.
+        rows = [inventory(1, 1, 50), inventory(2, 1, 1), inventory(1, 2, 5), inventory(2, 2, 5)]
+        self.assertEqual(summarize(allocate([(1, 3), (2, 3)], rows)), [(2, 1, 3), (2, 2, 3)])
+
+    def test_splits_into_fewest_shipments(self):
+        # Lines go to the warehouse covering the most of them, and a short line is split.
+        rows = [
+            inventory(1, 1, 5), inventory(2, 1, 5),
+            inventory(3, 2, 5),
+            inventory(1, 3, 5), inventory(3, 3, 1),
+        ]
+        self.assertEqual(summarize(allocate([(1, 2), (2, 2), (3, 2)], rows)), [(1, 1, 2), (1, 2, 2), (2, 3, 2)])
+        self.assertEqual(summarize(allocate([(1, 8)], rows)), [(1, 1, 5), (3, 1, 3)])
+
+    def test_respects_minimum_quantity(self):
+        # Stock at or below the minimum level is not allocated.
+        rows = [inventory(1, 1, 5, minimum=4), inventory(1, 2, 3)]
+        self.assertEqual(summarize(allocate([(1, 4)], rows)), [(1, 1, 1), (2, 1, 3)])
+        with self.assertRaises(InsufficientStock):
+            allocate([(1, 5)], rows)
+        with self.assertRaises(InventoryNotFound):
+            allocate([(2, 1)], rows)
@@ -1,4 +1,8 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from shop.exports import export_response
+from shop.pagination import KeysetPagination
 from .models import Warehouse, ProductInventory, InventoryTransaction
 from .serializers import WarehouseSerializer, ProductInventorySerializer, InventoryTransactionSerializer
 
@@ -11,8 +15,30 @@ class ProductInventoryViewSet(viewsets.ModelViewSet):
     # ViewSet for the ProductInventory model.
     queryset = ProductInventory.objects.all()
     serializer_class = ProductInventorySerializer
+    pagination_class = KeysetPagination
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        # Stream stock levels, filtered on when each row last changed.
+        columns = [
+            ('id', 'id'), ('product_id', 'product_id'), ('sku', 'product__sku'), ('warehouse_id', 'warehouse_id'),
+            ('warehouse', 'warehouse__Name'), ('quantity', 'Quantity'), ('minimum_quantity', 'Minimum_Quantity'),
+            ('maximum_quantity', 'Maximum_Quantity'), ('status', 'status'), ('last_updated', 'Last_Updated'),
+        ]
+        return export_response(request, ProductInventory.objects.order_by('pk'), columns, 'inventory', 'Last_Updated')
 
 class InventoryTransactionViewSet(viewsets.ModelViewSet):
     # ViewSet for the InventoryTransaction model.
     queryset = InventoryTransaction.objects.all()
     serializer_class = InventoryTransactionSerializer
+    pagination_class = KeysetPagination
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        # Stream stock movements in the requested period.
+        columns = [
+            ('id', 'Transaction_ID'), ('timestamp', 'timestamp'), ('product_id', 'product_id'), ('sku', 'product__sku'),
+            ('warehouse_id', 'warehouse_id'), ('quantity', 'Quantity'), ('type', 'Type'),
+            ('reference_type', 'Reference_Type'), ('reference_id', 'Reference_ID'),
+        ]
+        return export_response(request, InventoryTransaction.objects.order_by('pk'), columns, 'transactions', 'timestamp')
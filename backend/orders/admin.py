@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Order, OrderItem, Payment, Shipment
+from .models import Cart, CartItem, Order, OrderItem, Payment, Shipment, OrderTask
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
@@ -36,3 +36,10 @@ class ShipmentAdmin(admin.ModelAdmin):
     list_display = ('order', 'carrier', 'tracking_number', 'status', 'shipment_date')
     list_filter = ('status', 'carrier')
     search_fields = ('tracking_number',)
+
+@admin.register(OrderTask)
+class OrderTaskAdmin(admin.ModelAdmin):
+    # Admin configuration for the OrderTask model.
+    list_display = ('task_type', 'idempotency_key', 'status', 'attempts', 'available_at', 'completed_at')
+    list_filter = ('status', 'task_type')
+    search_fields = ('idempotency_key',)
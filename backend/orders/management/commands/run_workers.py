@@ -0,0 +1,58 @@
+import os
+import socket
+import threading
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from orders.tasks import run_pending
+
+class Command(BaseCommand):
+    help = 'Run order post-processing workers that consume the OrderTask outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Worker threads in this process.')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the ready tasks and exit.')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        if options['workers'] == 1:
+            try:
+                self.work(f'{prefix}:0', options)
+            except KeyboardInterrupt:
+                pass
+            return
+        threads = [
+            threading.Thread(target=self.work_in_thread, args=(f'{prefix}:{n}', options), daemon=True)
+            for n in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work_in_thread(self, worker_id, options):
+        # Each thread gets its own database connection, which must be closed on exit.
+        try:
+            self.work(worker_id, options)
+        finally:
+            connection.close()
+
+    def work(self, worker_id, options):
+        processed = 0
+        while not self.stop.is_set():
+            close_old_connections()
+            count = run_pending(worker_id, options['batch_size'])
+            processed += count
+            if not count:
+                if options['once']:
+                    break
+                self.stop.wait(options['sleep'])
+        self.stdout.write(f'{worker_id}: processed {processed} tasks')
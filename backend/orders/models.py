@@ -1,6 +1,9 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from django.utils.functional import cached_property
 from catalog.models import Product
+from catalog.pricing import price_lines
 from users.models import Address
 from catalog.models import Discount
 
@@ -11,6 +14,17 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart of {self.user.username}"
 
+    @cached_property
+    def totals(self):
+        # Priced by the discount engine; reads prefetched items when available, otherwise one query.
+        if 'cartitem_set' in getattr(self, '_prefetched_objects_cache', {}):
+            lines = [(item.product_id, item.quantity, item.product.price) for item in self.cartitem_set.all()]
+        else:
+            lines = list(self.cartitem_set.values_list('product_id', 'quantity', 'product__price'))
+        totals = price_lines(lines, user_id=self.user_id)
+        totals['item_count'] = len(lines)
+        return totals
+
 class CartItem(models.Model):
     # Items within a shopping cart.
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
@@ -32,6 +46,14 @@ class Order(models.Model):
     address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True)
     discount = models.ForeignKey(Discount, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='order_status_idx'),
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+            models.Index(fields=['user', '-order_date'], name='order_user_date_idx'),
+            models.Index(fields=['order_date'], name='order_date_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user.username}"
 
@@ -40,7 +62,10 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
-    price = models.DecimalField(max_digits=10, decimal_places=2)
+    price = models.DecimalField(max_digits=10, decimal_places=2) # List price of one unit at the time of purchase.
+    # What the line cost after product, bundle and order discounts; an order's lines add up to its total_price.
+    # Empty for items written before it was recorded, which cost quantity * price.
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
 
     def __str__(self):
         return f"{self.product.product_name} in order #{self.order.id}"
@@ -66,3 +91,31 @@ class Shipment(models.Model):
 
     def __str__(self):
         return f"Shipment for Order #{self.order.id}"
+
+class OrderTask(models.Model):
+    # Outbox of side effects to run after checkout, consumed by `manage.py run_workers`.
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    task_type = models.CharField(max_length=100) # e.g., 'order_confirmation', 'vendor_notification'
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=20, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='ordertask_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_type} task ({self.idempotency_key})"
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem, Payment, Shipment
-from catalog.serializers import ProductSerializer
+from catalog.serializers import ExpandProductMixin, ProductSerializer, ProductSummarySerializer
 from catalog.models import Product
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -28,34 +28,74 @@ class CartItemSerializer(serializers.ModelSerializer):
 class CartSerializer(serializers.ModelSerializer):
     # Serializer for the Cart model.
     items = CartItemSerializer(many=True, read_only=True, source='cartitem_set')
+    subtotal = serializers.SerializerMethodField()
+    discount_amount = serializers.SerializerMethodField()
     total_amount = serializers.SerializerMethodField()
     item_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Cart
-        fields = ('id', 'user', 'items', 'total_amount', 'item_count')
+        fields = ('id', 'user', 'items', 'subtotal', 'discount_amount', 'total_amount', 'item_count')
+
+    def get_subtotal(self, obj):
+        return float(obj.totals['subtotal'])
+
+    def get_discount_amount(self, obj):
+        return float(obj.totals['subtotal'] - obj.totals['total_amount'])
 
     def get_total_amount(self, obj):
-        total = 0.0
-        for item in obj.cartitem_set.all():
-            try:
-                total += float(item.product.price) * item.quantity
-            except Exception:
-                continue
-        return total
+        return float(obj.totals['total_amount'])
 
     def get_item_count(self, obj):
-        return obj.cartitem_set.count()
+        return obj.totals['item_count']
     def validate_quantity(self, value):
         if value < 1:
             raise serializers.ValidationError("Quantity must be at least 1.")
         return value
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    # Serializer for the OrderItem model.
+class CartOperationSerializer(serializers.Serializer):
+    # One step of a bulk cart update: add to, set or remove a product's quantity.
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, default=1)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': "Quantity must be at least 1."})
+        if attrs['op'] == 'set' and attrs['quantity'] < 0:
+            raise serializers.ValidationError({'quantity': "Quantity cannot be negative."})
+        return attrs
+
+class CartBulkSerializer(serializers.Serializer):
+    # Payload of the bulk cart endpoint; operations are applied in order.
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_operations(self, operations):
+        # Check every referenced product exists with one query.
+        product_ids = {operation['product_id'] for operation in operations}
+        missing = product_ids - set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Unknown product ids: {sorted(missing)}")
+        return operations
+
+class CompactCartItemSerializer(serializers.ModelSerializer):
+    # Cart item with only the product fields the header cart badge needs.
+    product = ProductSummarySerializer(read_only=True)
+
+    class Meta:
+        model = CartItem
+        fields = ('id', 'product', 'quantity')
+
+class CompactCartSerializer(CartSerializer):
+    # Lightweight cart representation for ?compact=1.
+    items = CompactCartItemSerializer(many=True, read_only=True, source='cartitem_set')
+
+class OrderItemSerializer(ExpandProductMixin, serializers.ModelSerializer):
+    # Serializer for the OrderItem model; ?expand=product inlines the products.
     class Meta:
         model = OrderItem
         fields = '__all__'
+        read_only_fields = ['line_total']
 
 class PaymentSerializer(serializers.ModelSerializer):
     # Serializer for the Payment model.
@@ -87,4 +127,12 @@ class OrderSerializer(serializers.ModelSerializer):
         return str(obj.id)
     
     def get_items_count(self, obj):
+        # Use the count annotated by OrderViewSet when present
+        if hasattr(obj, 'items_count'):
+            return obj.items_count
         return obj.orderitem_set.count()
+
+class OrderSummarySerializer(OrderSerializer):
+    # Lightweight order shape for order history lists (?view=summary).
+    class Meta(OrderSerializer.Meta):
+        fields = ('id', 'order_number', 'created_at', 'total_amount', 'status', 'items_count')
@@ -0,0 +1,155 @@
+"""
+Order post-processing pipeline.
+
+Checkout writes OrderTask rows in the same transaction as the order (an
+outbox), so side effects are recorded exactly when the order becomes
+durable and never run for an order that rolled back. Worker processes
+started with ``manage.py run_workers`` claim ready tasks, run the registered
+handler and retry failures with exponential backoff.
+
+Delivery is at-least-once: a worker that dies after running a handler but
+before marking the task done leaves it to be reclaimed, so handlers must be
+safe to run twice. A worker claims a batch at once but renews each claim
+just before running that task, so a task that waited behind slow ones in the
+batch runs only if nobody else has reclaimed it meanwhile. Each task's idempotency key is unique, so enqueueing the
+same work twice is a no-op.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F
+from django.utils import timezone
+from shop.bulk import insert_rows
+from .models import Order, OrderTask
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# Tasks every new order gets; other apps add theirs with register(..., on_order=True).
+ORDER_TASK_TYPES = []
+
+# A running task not finished within this many seconds is assumed abandoned and reclaimed.
+CLAIM_TIMEOUT = 300
+
+def register(task_type, on_order=False):
+    # Decorator registering the handler for a task type; on_order enqueues it for every new order.
+    def decorator(func):
+        HANDLERS[task_type] = func
+        if on_order and task_type not in ORDER_TASK_TYPES:
+            ORDER_TASK_TYPES.append(task_type)
+        return func
+    return decorator
+
+def enqueue(task_type, payload, idempotency_key):
+    # Add a single task unless one with the same key already exists.
+    task, _ = OrderTask.objects.get_or_create(
+        idempotency_key=idempotency_key,
+        defaults={'task_type': task_type, 'payload': payload},
+    )
+    return task
+
+def enqueue_many(task_type, tasks, available_at=None):
+    # Add tasks from (payload, idempotency_key) pairs with one executemany; keys that already exist are skipped.
+    insert_rows(
+        OrderTask, ['payload', 'idempotency_key'], tasks,
+        defaults={'task_type': task_type, 'available_at': available_at or timezone.now()},
+        ignore_conflicts=True,
+    )
+
+def enqueue_order_tasks(order):
+    # Write the post-checkout tasks for an order; call inside the checkout transaction.
+    OrderTask.objects.bulk_create(
+        [
+            OrderTask(task_type=task_type, payload={'order_id': order.id}, idempotency_key=f'{task_type}:order:{order.id}')
+            for task_type in ORDER_TASK_TYPES
+        ],
+        ignore_conflicts=True,
+    )
+
+def claim_tasks(worker_id, limit):
+    # Claim up to `limit` ready tasks. Each claim is a conditional UPDATE, so concurrent workers never share a task.
+    now = timezone.now()
+    stale = now - timedelta(seconds=CLAIM_TIMEOUT)
+    candidates = (
+        OrderTask.objects.filter(status=OrderTask.STATUS_PENDING, available_at__lte=now)
+        | OrderTask.objects.filter(status=OrderTask.STATUS_RUNNING, locked_at__lt=stale)
+    ).order_by('available_at', 'pk').values_list('pk', 'status', 'locked_at')[:limit]
+
+    claimed = []
+    for pk, task_status, locked_at in candidates:
+        won = OrderTask.objects.filter(pk=pk, status=task_status, locked_at=locked_at).update(
+            status=OrderTask.STATUS_RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(pk)
+    return list(OrderTask.objects.filter(pk__in=claimed).order_by('pk'))
+
+def renew_claim(task, worker_id):
+    # Restart the claim timeout for a task this worker still holds; False if another worker has reclaimed it.
+    now = timezone.now()
+    renewed = OrderTask.objects.filter(
+        pk=task.pk, status=OrderTask.STATUS_RUNNING, locked_by=worker_id, locked_at=task.locked_at,
+    ).update(locked_at=now)
+    task.locked_at = now
+    return bool(renewed)
+
+def run_task(task):
+    # Run one claimed task and record the outcome.
+    try:
+        handler = HANDLERS[task.task_type]
+        handler(task.payload)
+    except Exception as exc:
+        logger.exception('Task %s failed (attempt %s)', task.idempotency_key, task.attempts)
+        if task.attempts >= task.max_attempts:
+            OrderTask.objects.filter(pk=task.pk).update(status=OrderTask.STATUS_FAILED, last_error=repr(exc), locked_at=None)
+        else:
+            backoff = timedelta(seconds=2 ** task.attempts)
+            OrderTask.objects.filter(pk=task.pk).update(
+                status=OrderTask.STATUS_PENDING, last_error=repr(exc), locked_at=None,
+                available_at=timezone.now() + backoff,
+            )
+        return False
+    OrderTask.objects.filter(pk=task.pk).update(status=OrderTask.STATUS_DONE, completed_at=timezone.now(), locked_at=None)
+    return True
+
+def run_pending(worker_id, batch_size=20):
+    # Claim and run one batch; returns how many tasks were processed.
+    processed = 0
+    for task in claim_tasks(worker_id, batch_size):
+        if renew_claim(task, worker_id):
+            run_task(task)
+            processed += 1
+    return processed
+
+@register('order_confirmation', on_order=True)
+def send_order_confirmation(payload):
+    order = Order.objects.select_related('user').get(pk=payload['order_id'])
+    send_mail(
+        subject=f'Order #{order.id} confirmed',
+        message=f'Thank you for your order. Total: {order.total_price}. Status: {order.status}.',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[order.user.email],
+    )
+
+@register('vendor_notification', on_order=True)
+def notify_vendors(payload):
+    from vendor.models import VendorProduct
+
+    order_id = payload['order_id']
+    vendor_products = (
+        VendorProduct.objects.filter(product__orderitem__order_id=order_id)
+        .select_related('vendor__user', 'product')
+        .distinct()
+    )
+    products_by_vendor = {}
+    for vendor_product in vendor_products:
+        products_by_vendor.setdefault(vendor_product.vendor, []).append(vendor_product.product.product_name)
+    for vendor, products in products_by_vendor.items():
+        send_mail(
+            subject=f'New order #{order_id}',
+            message='Your products were ordered: ' + ', '.join(products),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[vendor.user.email],
+        )
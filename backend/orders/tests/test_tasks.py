@@ -0,0 +1,89 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from orders import tasks
+from orders.models import Order, OrderTask
+from users.models import Address
+
+User = get_user_model()
+
+class OrderTaskQueueTest(TestCase):
+    # Test cases for the order post-processing outbox and workers.
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='password123')
+        address = Address.objects.create(user=self.user, street='1 Main St', city='Tehran', state='Tehran', zip_code='12345')
+        self.order = Order.objects.create(user=self.user, total_price=100, status='pending', address=address)
+
+    def test_enqueue_is_idempotent(self):
+        # Enqueueing the same order twice leaves one task per type.
+        tasks.enqueue_order_tasks(self.order)
+        tasks.enqueue_order_tasks(self.order)
+        self.assertEqual(OrderTask.objects.count(), len(tasks.ORDER_TASK_TYPES))
+        tasks.enqueue('order_confirmation', {'order_id': self.order.id}, f'order_confirmation:order:{self.order.id}')
+        self.assertEqual(OrderTask.objects.count(), len(tasks.ORDER_TASK_TYPES))
+
+    def test_worker_runs_tasks_once(self):
+        # Processed tasks are marked done and not picked up again.
+        tasks.enqueue_order_tasks(self.order)
+        self.assertEqual(tasks.run_pending('test'), len(tasks.ORDER_TASK_TYPES))
+        self.assertEqual(tasks.run_pending('test'), 0)
+        self.assertFalse(OrderTask.objects.exclude(status=OrderTask.STATUS_DONE).exists())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+
+    def test_failed_task_is_retried_with_backoff(self):
+        # A failing handler is rescheduled until max_attempts, then marked failed.
+        handler = mock.Mock(side_effect=RuntimeError('smtp down'))
+        with mock.patch.dict(tasks.HANDLERS, {'flaky': handler}):
+            task = tasks.enqueue('flaky', {}, 'flaky:1')
+            OrderTask.objects.filter(pk=task.pk).update(max_attempts=2)
+            with self.assertLogs('orders.tasks', 'ERROR'):
+                tasks.run_pending('test')
+            task.refresh_from_db()
+            self.assertEqual((task.status, task.attempts), (OrderTask.STATUS_PENDING, 1))
+            self.assertGreater(task.available_at, timezone.now())
+            self.assertIn('smtp down', task.last_error)
+            self.assertEqual(tasks.run_pending('test'), 0)
+
+            OrderTask.objects.filter(pk=task.pk).update(available_at=timezone.now())
+            with self.assertLogs('orders.tasks', 'ERROR'):
+                tasks.run_pending('test')
+            task.refresh_from_db()
+            self.assertEqual((task.status, task.attempts), (OrderTask.STATUS_FAILED, 2))
+        self.assertEqual(handler.call_count, 2)
+
+    def test_abandoned_claim_is_reclaimed(self):
+        # A task left running by a dead worker is picked up after the claim timeout.
+        task = tasks.enqueue('order_confirmation', {'order_id': self.order.id}, 'confirm')
+        stale = timezone.now() - timedelta(seconds=tasks.CLAIM_TIMEOUT + 1)
+        OrderTask.objects.filter(pk=task.pk).update(status=OrderTask.STATUS_RUNNING, locked_by='dead', locked_at=stale)
+        self.assertEqual(tasks.run_pending('test'), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, OrderTask.STATUS_DONE)
+
+    def test_task_reclaimed_while_waiting_in_a_batch_runs_once(self):
+        # The second task of a batch outlives its claim behind a slow first one and another worker takes it over.
+        first = tasks.enqueue('slow', {}, 'slow')
+        second = tasks.enqueue('fast', {}, 'fast')
+        fast = mock.Mock()
+        def slow(payload):
+            stale = timezone.now() - timedelta(seconds=tasks.CLAIM_TIMEOUT + 1)
+            OrderTask.objects.filter(pk=second.pk).update(locked_at=stale)
+            self.assertEqual(tasks.run_pending('other'), 1)
+        with mock.patch.dict(tasks.HANDLERS, {'slow': slow, 'fast': fast}):
+            self.assertEqual(tasks.run_pending('test'), 1)
+        self.assertEqual(fast.call_count, 1)
+        self.assertEqual(set(OrderTask.objects.filter(pk__in=[first.pk, second.pk]).values_list('status', flat=True)), {OrderTask.STATUS_DONE})
+
+    def test_run_workers_once(self):
+        # The command drains the queue and exits with --once.
+        tasks.enqueue_order_tasks(self.order)
+        out = StringIO()
+        call_command('run_workers', '--once', stdout=out)
+        self.assertIn(f'processed {len(tasks.ORDER_TASK_TYPES)} tasks', out.getvalue())
+        self.assertFalse(OrderTask.objects.exclude(status=OrderTask.STATUS_DONE).exists())
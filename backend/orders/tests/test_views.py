@@ -1,9 +1,18 @@
-from rest_framework.test import APITestCase
+import threading
+from datetime import timedelta
+from rest_framework.test import APITestCase, APIClient
+from django.test import TransactionTestCase
+from django.db import connection
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from orders.models import Cart, CartItem, Order, OrderItem
-from catalog.models import Product, Category
+from orders.models import Cart, CartItem, Order, OrderItem, OrderTask
+from catalog.models import Product, Category, Discount, UserDiscount
+from catalog.pricing import get_index
+from inventory.models import Warehouse, ProductInventory, InventoryTransaction
+from inventory.stock import decrement_inventory
+from users.models import Address
 
 User = get_user_model()
 
@@ -30,3 +39,276 @@ class CartAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['user'], self.user.id)
+
+
+class CartReadAPITest(APITestCase):
+    # Test cases for reading the cart.
+    def setUp(self):
+        self.user = User.objects.create_user(email='shopper@example.com', password='password123')
+        self.category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.cart = Cart.objects.create(user=self.user)
+        for i in range(5):
+            product = Product.objects.create(
+                product_name=f'Cable {i}', sku=f'CABLE{i}', description='A cable.', price='0.10',
+                weight=0.1, dimensions='100x1x1 cm', status='available', category=self.category
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=3)
+        self.url = reverse('cart-list')
+        self.client.force_authenticate(user=self.user)
+        get_index() # Steady state: the pricing index is already built.
+
+    def test_cart_read_query_count(self):
+        # The full cart costs a fixed number of queries and totals are summed exactly.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['item_count'], 5)
+        self.assertEqual(response.data['total_amount'], 1.5)
+        self.assertEqual(response.data['items'][0]['product']['category_name'], 'Electronics')
+
+    def test_compact_cart(self):
+        # compact=1 returns only the product fields the cart badge needs.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'compact': 1})
+        self.assertEqual(set(response.data['items'][0]['product']), {'id', 'name', 'price', 'image_url', 'images'})
+        self.assertEqual(response.data['total_amount'], 1.5)
+
+class CartBulkAPITest(APITestCase):
+    # Test cases for the batched cart endpoint.
+    def setUp(self):
+        self.user = User.objects.create_user(email='bulk@example.com', password='password123')
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.products = [
+            Product.objects.create(
+                product_name=f'Adapter {i}', sku=f'ADAPTER{i}', description='An adapter.', price=10,
+                weight=0.1, dimensions='5x5x2 cm', status='available', category=category
+            )
+            for i in range(20)
+        ]
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.products[1], quantity=5)
+        self.url = reverse('order/cart-item-bulk')
+        self.client.force_authenticate(user=self.user)
+        get_index() # Steady state: the pricing index is already built.
+
+    def test_bulk_operations(self):
+        # Operations apply in order with one upsert, whatever the number of products.
+        operations = [{'op': 'add', 'product_id': product.id, 'quantity': 2} for product in self.products]
+        operations += [
+            {'op': 'remove', 'product_id': self.products[1].id},
+            {'op': 'set', 'product_id': self.products[2].id, 'quantity': 7},
+            {'op': 'set', 'product_id': self.products[3].id, 'quantity': 0},
+        ]
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quantities = dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities[self.products[0].id], 3)
+        self.assertEqual(quantities[self.products[2].id], 7)
+        self.assertNotIn(self.products[1].id, quantities)
+        self.assertNotIn(self.products[3].id, quantities)
+        self.assertEqual(response.data['item_count'], 18)
+
+    def test_bulk_rejects_unknown_products(self):
+        # Nothing is applied if any product id is unknown.
+        response = self.client.post(self.url, {'operations': [
+            {'op': 'add', 'product_id': self.products[0].id}, {'op': 'add', 'product_id': 99999},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(CartItem.objects.get(cart=self.cart, product=self.products[0]).quantity, 1)
+
+class OrderListAPITest(APITestCase):
+    # Test cases for listing orders.
+    def setUp(self):
+        from orders.models import Payment, Shipment
+        self.user = User.objects.create_user(email='history@example.com', password='password123')
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        product = Product.objects.create(
+            product_name='Laptop', sku='LAPTOP123', description='A powerful laptop.', price=1200,
+            weight=2.5, dimensions='30x20x2 cm', status='available', category=category
+        )
+        for i in range(6):
+            order = Order.objects.create(user=self.user, total_price=2400, status='completed')
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=1200)
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=1200)
+            Payment.objects.create(order=order, payment_method='card', transaction_id=f'TX{i}', amount=2400)
+            Shipment.objects.create(order=order, carrier='Post', tracking_number=f'TRACK{i}', status='delivered')
+        self.url = reverse('order-list')
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_orders_query_count(self):
+        # The nested list is prefetched: one query per relation, not per order.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 6)
+        first = response.data['results'][0]
+        self.assertEqual(first['items_count'], 2)
+        self.assertEqual((len(first['items']), len(first['payments']), len(first['shipments'])), (2, 1, 1))
+
+    def test_expand_product(self):
+        # expand=product inlines the products of every item without extra queries.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {'expand': 'product'})
+        item = response.data['results'][0]['items'][0]
+        self.assertEqual((item['product']['sku'], item['product']['category_name']), ('LAPTOP123', 'Electronics'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-item-list'), {'expand': 'product'})
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0]['product']['name'], 'Laptop')
+        self.assertIsInstance(self.client.get(reverse('order-item-list')).data[0]['product'], int)
+
+    def test_summary_view(self):
+        # view=summary returns the flat shape from a single query.
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'view': 'summary'})
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'order_number', 'created_at', 'total_amount', 'status', 'items_count'},
+        )
+        self.assertEqual(response.data['results'][0]['items_count'], 2)
+
+class PurchaseAPITest(APITestCase):
+    # Test cases for checking out a cart.
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='password123')
+        Address.objects.create(user=self.user, street='1 Main St', city='Tehran', state='Tehran', zip_code='12345')
+        self.category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.warehouse = Warehouse.objects.create(Name='Main Warehouse', Location='Tehran')
+        self.cart = Cart.objects.create(user=self.user)
+        self.inventories = []
+        for i in range(3):
+            product = Product.objects.create(
+                product_name=f'Phone {i}', sku=f'PHONE{i}', description='A phone.', price=100,
+                weight=0.2, dimensions='15x7x1 cm', status='available', category=self.category
+            )
+            self.inventories.append(ProductInventory.objects.create(product=product, warehouse=self.warehouse, Quantity=5))
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+        self.url = reverse('purchase-create-order-from-cart')
+        self.client.force_authenticate(user=self.user)
+        get_index() # Steady state: the pricing index is already built.
+
+    def test_checkout_reserves_stock_in_bulk(self):
+        # Checkout decrements stock, logs transactions and creates items with a fixed number of queries.
+        with self.assertNumQueries(13):
+            response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(pk=response.data['order_id'])
+        self.assertEqual(order.total_price, 600)
+        self.assertEqual(order.orderitem_set.count(), 3)
+        self.assertEqual([inv.Quantity for inv in ProductInventory.objects.order_by('pk')], [3, 3, 3])
+        self.assertEqual(InventoryTransaction.objects.filter(Reference_ID=order.id, Quantity=-2, Type='sale').count(), 3)
+        self.assertFalse(Cart.objects.filter(pk=self.cart.pk).exists())
+        self.assertEqual(
+            set(OrderTask.objects.filter(payload__order_id=order.id).values_list('task_type', flat=True)),
+            {'order_confirmation', 'vendor_notification', 'analytics_order'},
+        )
+
+    def test_checkout_applies_user_discount(self):
+        # The order total and discount come from the pricing engine, matching the cart totals.
+        now = timezone.now()
+        discount = Discount.objects.create(
+            value=10, discount_type='percentage', description='Loyalty',
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        UserDiscount.objects.create(user=self.user, discount=discount)
+        cart = self.client.get(reverse('cart-list')).data
+        self.assertEqual((cart['subtotal'], cart['discount_amount'], cart['total_amount']), (600, 60, 540))
+        response = self.client.post(self.url, {}, format='json')
+        order = Order.objects.get(pk=response.data['order_id'])
+        self.assertEqual((order.total_price, order.discount_id), (540, discount.id))
+        # Each item keeps its share of the discounted total, so the items add up to the order.
+        self.assertEqual(list(order.orderitem_set.values_list('price', 'line_total')), [(100, 180)] * 3)
+
+    def test_checkout_rejects_insufficient_stock(self):
+        # Nothing is written when one of the items is short.
+        ProductInventory.objects.filter(pk=self.inventories[1].pk).update(Quantity=1)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error'], 'Not enough stock for Phone 1')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderTask.objects.exists())
+        self.assertEqual(ProductInventory.objects.get(pk=self.inventories[0].pk).Quantity, 5)
+
+    def test_checkout_splits_across_warehouses(self):
+        # A line larger than any one warehouse's stock is shipped from two.
+        second = Warehouse.objects.create(Name='Second Warehouse', Location='Shiraz')
+        ProductInventory.objects.filter(pk=self.inventories[0].pk).update(Quantity=1)
+        ProductInventory.objects.create(product=self.inventories[0].product, warehouse=second, Quantity=4)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        movements = InventoryTransaction.objects.filter(product=self.inventories[0].product).order_by('warehouse_id')
+        self.assertEqual([(m.warehouse_id, m.Quantity) for m in movements], [(self.warehouse.pk, -1), (second.pk, -1)])
+
+    def test_checkout_keeps_minimum_quantity(self):
+        # Stock at a row's minimum is held back, even if it was read before the minimum was raised.
+        ProductInventory.objects.filter(pk=self.inventories[0].pk).update(Minimum_Quantity=4)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error'], 'Not enough stock for Phone 0')
+        self.assertFalse(decrement_inventory([(self.inventories[0], 2)])) # Loaded before the minimum was set.
+        self.assertEqual(ProductInventory.objects.get(pk=self.inventories[0].pk).Quantity, 5)
+
+    def test_resubmitted_checkout(self):
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual((response.status_code, response.data['error']), (status.HTTP_400_BAD_REQUEST, 'Cart is empty.'))
+        self.assertEqual(Order.objects.count(), 1)
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    # Parallel checkouts against limited stock must never oversell.
+    buyers = 8
+    stock = 3
+
+    def setUp(self):
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        warehouse = Warehouse.objects.create(Name='Main Warehouse', Location='Tehran')
+        self.product = Product.objects.create(
+            product_name='Console', sku='CONSOLE1', description='A console.', price=400,
+            weight=3, dimensions='30x25x10 cm', status='available', category=category
+        )
+        self.inventory = ProductInventory.objects.create(product=self.product, warehouse=warehouse, Quantity=self.stock)
+        self.users = []
+        for i in range(self.buyers):
+            user = User.objects.create_user(email=f'buyer{i}@example.com', password='password123')
+            Address.objects.create(user=user, street='1 Main St', city='Tehran', state='Tehran', zip_code='12345')
+            CartItem.objects.create(cart=Cart.objects.create(user=user), product=self.product, quantity=1)
+            self.users.append(user)
+
+    def checkout(self, user, barrier, results):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=user)
+        barrier.wait()
+        try:
+            results.append(client.post(reverse('purchase-create-order-from-cart'), {}, format='json').status_code)
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        barrier = threading.Barrier(self.buyers)
+        results = []
+        threads = [threading.Thread(target=self.checkout, args=(user, barrier, results)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every unit sells, and every other buyer is told the stock is gone; no request fails.
+        self.assertEqual(sorted(results), [status.HTTP_201_CREATED] * self.stock + [status.HTTP_409_CONFLICT] * (self.buyers - self.stock))
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.Quantity, 0)
+        self.assertEqual(Order.objects.count(), self.stock)
+        self.assertEqual(OrderItem.objects.count(), self.stock)
+
+    def test_duplicate_submits_place_one_order(self):
+        # The same cart submitted twice at once is checked out once; the other submit finds it empty.
+        user = self.users[0]
+        barrier = threading.Barrier(2)
+        results = []
+        threads = [threading.Thread(target=self.checkout, args=(user, barrier, results)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [status.HTTP_201_CREATED, status.HTTP_400_BAD_REQUEST])
+        self.assertEqual(Order.objects.filter(user=user).count(), 1)
@@ -1,25 +1,50 @@
 from rest_framework import viewsets, mixins
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
+from django.db import OperationalError, transaction
+from django.db.models import Count, Prefetch, prefetch_related_objects
+from shop.exports import export_response
+from shop.pagination import OrderDatePagination
 from .models import Cart, CartItem, Order, OrderItem, Payment, Shipment
 from catalog.models import Product
-from inventory.models import ProductInventory
-from .serializers import CartSerializer, CartItemSerializer, OrderSerializer, OrderItemSerializer, PaymentSerializer, ShipmentSerializer
+from catalog.serializers import expansions
+from catalog.pricing import price_lines
+from inventory.allocation import allocate, InventoryNotFound, InsufficientStock
+from inventory.stock import lock_inventory, decrement_inventory, is_lock_contention, record_transactions, stock_lock
+from .tasks import enqueue_order_tasks
+from .serializers import CartSerializer, CompactCartSerializer, CartBulkSerializer, CartItemSerializer, OrderSerializer, OrderSummarySerializer, OrderItemSerializer, PaymentSerializer, ShipmentSerializer
+
+def cart_items_prefetch(compact=False):
+    # Load all cart items with the product rows the cart serializers read in a single query.
+    if compact:
+        items = CartItem.objects.select_related('product')
+    else:
+        items = CartItem.objects.select_related('product__category', 'product__discount')
+    return Prefetch('cartitem_set', queryset=items)
+
 class CartViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins.CreateModelMixin):
     # ViewSet for a user's cart.
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
 
+    def is_compact(self):
+        return self.request.query_params.get('compact') in ('1', 'true')
+
+    def get_serializer_class(self):
+        if self.is_compact():
+            return CompactCartSerializer
+        return CartSerializer
+
     def get_queryset(self):
-        # Ensure a user can only access their own cart.
-        return Cart.objects.filter(user=self.request.user)
+        # Ensure a user can only access their own cart. Filtering by id keeps a token-only request.user from being loaded.
+        return Cart.objects.filter(user_id=self.request.user.pk).prefetch_related(cart_items_prefetch(self.is_compact()))
     
     def list(self, request, *args, **kwargs):
         # Return (or create) the authenticated user's cart as a single object
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        cart, _ = Cart.objects.get_or_create(user_id=request.user.pk)
+        prefetch_related_objects([cart], cart_items_prefetch(self.is_compact()))
         serializer = self.get_serializer(cart)
         return Response(serializer.data)
         
@@ -58,14 +83,80 @@ class CartItemViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        # Apply a list of add/set/remove operations in one transaction and return the resulting cart.
+        serializer = CartBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=request.user)
+            product_ids = {operation['product_id'] for operation in operations}
+            quantities = dict(
+                CartItem.objects.select_for_update()
+                .filter(cart=cart, product_id__in=product_ids)
+                .values_list('product_id', 'quantity')
+            )
+            existing = set(quantities)
+            for operation in operations:
+                product_id = operation['product_id']
+                if operation['op'] == 'add':
+                    quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+                elif operation['op'] == 'set' and operation['quantity'] > 0:
+                    quantities[product_id] = operation['quantity']
+                else:
+                    quantities.pop(product_id, None)
+
+            removed = existing - set(quantities)
+            if removed:
+                CartItem.objects.filter(cart=cart, product_id__in=removed).delete()
+            if quantities:
+                CartItem.objects.bulk_create(
+                    [CartItem(cart=cart, product_id=product_id, quantity=quantity) for product_id, quantity in quantities.items()],
+                    update_conflicts=True,
+                    unique_fields=['cart', 'product'],
+                    update_fields=['quantity'],
+                )
+
+        prefetch_related_objects([cart], cart_items_prefetch())
+        return Response(CartSerializer(cart, context=self.get_serializer_context()).data)
+
 class OrderViewSet(viewsets.ModelViewSet):
     # ViewSet for a user's orders.
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderDatePagination
+
+    def is_summary(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return OrderSummarySerializer
+        return OrderSerializer
     
     def get_queryset(self):
         # Ensure a user can only access their own orders.
-        return Order.objects.filter(user=self.request.user)
+        orders = Order.objects.filter(user=self.request.user).annotate(items_count=Count('orderitem'))
+        if self.is_summary():
+            return orders.only('id', 'order_date', 'total_price', 'status')
+        items = OrderItem.objects.all()
+        if 'product' in expansions(self.get_serializer_context()):
+            items = items.select_related('product__category', 'product__discount')
+        return orders.prefetch_related(Prefetch('orderitem_set', queryset=items), 'payments', 'shipments')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        # Stream every order, one row per item (orders without items get one empty-item row).
+        columns = [
+            ('order_id', 'id'), ('order_date', 'order_date'), ('user_id', 'user_id'), ('status', 'status'),
+            ('total_price', 'total_price'), ('discount_id', 'discount_id'), ('address_id', 'address_id'),
+            ('item_id', 'orderitem__id'), ('product_id', 'orderitem__product_id'), ('sku', 'orderitem__product__sku'),
+            ('quantity', 'orderitem__quantity'), ('unit_price', 'orderitem__price'),
+        ]
+        orders = Order.objects.order_by('pk', 'orderitem__id')
+        return export_response(request, orders, columns, 'orders', 'order_date')
 
 class OrderItemViewSet(viewsets.ModelViewSet):
     # ViewSet for order items.
@@ -74,7 +165,10 @@ class OrderItemViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         # Ensure a user can only access their own order items.
-        return OrderItem.objects.filter(order__user=self.request.user)
+        items = OrderItem.objects.filter(order__user=self.request.user)
+        if 'product' in expansions(self.get_serializer_context()):
+            items = items.select_related('product__category', 'product__discount')
+        return items
 
 class PaymentViewSet(viewsets.ModelViewSet):
     # ViewSet for payments.
@@ -92,32 +186,42 @@ class PurchaseViewSet(viewsets.ViewSet):
     # Handles the complete purchase process.
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def create_order_from_cart(self, request):
-        user = request.user
-        cart, _ = Cart.objects.get_or_create(user=user)
-        cart_items = CartItem.objects.filter(cart=cart)
+        try:
+            with stock_lock():
+                return self.place_order(request)
+        except OperationalError as exc:
+            if not is_lock_contention(exc):
+                raise
+            return Response({"error": "Checkout is busy, please try again."}, status=status.HTTP_409_CONFLICT)
 
-        if not cart_items.exists():
-            return Response({"error": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
+    def place_order(self, request):
+        user = request.user
 
         # Use a database transaction to ensure data integrity
         with transaction.atomic():
-            # 1. Check inventory for all items in the cart.
-            for item in cart_items:
-                product_inventory = ProductInventory.objects.filter(product=item.product).first()
-                if not product_inventory:
-                    return Response({"error": f"Inventory not found for {item.product.product_name}"}, status=status.HTTP_400_BAD_REQUEST)
-                if product_inventory.Quantity < item.quantity:
-                    return Response({"error": f"Not enough stock for {item.product.product_name}"}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 2. Calculate total price and apply discounts.
-            total_price = sum(item.product.price * item.quantity for item in cart_items)
-            
-            # Apply user-specific discounts (mock logic).
-            user_discounts = user.userdiscount_set.all()
-            if user_discounts.exists():
-                # For this example, apply the first valid discount found.
-                discount_amount = user_discounts.first().discount.value
-                total_price -= discount_amount
+            # A second submit of the same cart waits on the cart's lock, then finds it checked out and gone.
+            cart = Cart.objects.select_for_update().filter(user=user).order_by('pk').first()
+            cart_items = list(CartItem.objects.filter(cart=cart).select_related('product')) if cart else []
+            if not cart_items:
+                return Response({"error": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+            # 1. Lock the inventory rows for every cart product in one query and split the cart across warehouses.
+            products = {item.product_id: item.product for item in cart_items}
+            try:
+                allocations = allocate(
+                    [(item.product_id, item.quantity) for item in cart_items],
+                    lock_inventory(list(products)),
+                )
+            except InventoryNotFound as exc:
+                return Response({"error": f"Inventory not found for {products[exc.product_id].product_name}"}, status=status.HTTP_400_BAD_REQUEST)
+            except InsufficientStock as exc:
+                return Response({"error": f"Not enough stock for {products[exc.product_id].product_name}"}, status=status.HTTP_409_CONFLICT)
+
+            # 2. Price the cart with the same engine as the cart totals (product, bundle and user discounts).
+            pricing = price_lines(
+                [(item.product_id, item.quantity, item.product.price) for item in cart_items],
+                user_id=user.pk,
+            )
 
             # 3. Determine shipping address: optional address_id from request, otherwise first address
             address_id = request.data.get('address_id') if isinstance(request.data, dict) else None
@@ -131,28 +235,35 @@ class PurchaseViewSet(viewsets.ViewSet):
                 if not user_address:
                     return Response({"error": "User has no address on file."}, status=status.HTTP_400_BAD_REQUEST)
 
+            # 4. Reduce product inventory; a concurrent checkout may have taken the stock since it was read.
+            if not decrement_inventory(allocations):
+                transaction.set_rollback(True)
+                return Response({"error": "Not enough stock to complete the order."}, status=status.HTTP_409_CONFLICT)
+
             order = Order.objects.create(
                 user=user,
-                total_price=total_price,
+                total_price=pricing['total_amount'],
+                discount_id=pricing['discount_id'],
                 status='pending',
                 address=user_address # Assuming user has at least one address
             )
             
-            for item in cart_items:
-                OrderItem.objects.create(
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     product=item.product,
                     quantity=item.quantity,
-                    price=item.product.price # Use the product's price at the time of purchase
+                    price=item.product.price, # Use the product's price at the time of purchase
+                    line_total=pricing['lines'][item.product_id],
                 )
-                
-                # 4. Reduce product inventory.
-                product_inventory = ProductInventory.objects.get(product=item.product)
-                product_inventory.Quantity -= item.quantity
-                product_inventory.save()
+                for item in cart_items
+            ])
+            record_transactions(allocations, 'order', order.id)
+
+            # 5. Queue confirmation emails and other side effects for the workers.
+            enqueue_order_tasks(order)
 
-            # 5. Clear the user's cart.
+            # 6. Clear the user's cart.
             cart.delete()
 
         return Response({"message": "Order created successfully!", "order_id": order.id}, status=status.HTTP_201_CREATED)
-
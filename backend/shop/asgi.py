@@ -2,6 +2,9 @@
 ASGI config for shop project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (for example ``uvicorn shop.asgi:application``)
+to keep support ticket event streams open; under WSGI they fall back to
+polling (see support.live).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,65 @@
+"""
+Fast multi-row INSERTs for fan-outs that write hundreds of thousands of rows.
+
+``bulk_create`` prepares every value of every row through the field API and,
+within SQLite's parameter limit, sends a new statement every few dozen rows.
+For a wide model that compilation costs far more than the insert itself.
+``insert_rows`` prepares the columns that are the same on every row once,
+prepares only the varying columns per row, and sends everything with a
+single ``executemany``. The INSERT and ON CONFLICT syntax comes from the
+connection's own operations, as it would for bulk_create.
+
+Model signals and ``save()`` are skipped, just as with bulk_create.
+"""
+from django.db import connections, router
+from django.db.models.constants import OnConflict
+
+def insert_rows(model, columns, rows, defaults=None, ignore_conflicts=False, unique_fields=(), update_fields=()):
+    """
+    Insert `rows`, tuples of values for the fields named in `columns`.
+
+    Every other concrete field gets its value from `defaults` (field name to
+    value) or from the field's own default, computed once for all rows.
+    With ``ignore_conflicts`` rows that would violate a unique constraint are
+    skipped. With ``update_fields`` such rows update those fields instead, and
+    ``unique_fields`` must name the conflicting constraint.
+    """
+    connection = connections[router.db_for_write(model)]
+    opts = model._meta
+    varying = [opts.get_field(name) for name in columns]
+    template = model(**(defaults or {}))
+    fixed, fixed_values = [], []
+    for field in opts.local_concrete_fields:
+        if field in varying or field.db_returning:
+            continue
+        fixed.append(field)
+        fixed_values.append(field.get_db_prep_save(field.pre_save(template, add=True), connection))
+    fixed_values = tuple(fixed_values)
+
+    if update_fields:
+        on_conflict = OnConflict.UPDATE
+    elif ignore_conflicts:
+        on_conflict = OnConflict.IGNORE
+    else:
+        on_conflict = None
+    fields = varying + fixed
+    quote = connection.ops.quote_name
+    sql = '%s %s (%s) VALUES (%s) %s' % (
+        connection.ops.insert_statement(on_conflict=on_conflict),
+        quote(opts.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        connection.ops.on_conflict_suffix_sql(
+            fields, on_conflict,
+            [opts.get_field(name).column for name in update_fields],
+            [opts.get_field(name).column for name in unique_fields],
+        ),
+    )
+    params = [
+        tuple(field.get_db_prep_save(value, connection) for field, value in zip(varying, row)) + fixed_values
+        for row in rows
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+    return len(params)
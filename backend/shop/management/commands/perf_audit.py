@@ -0,0 +1,137 @@
+import re
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+# Plan lines that mean every row of a table is read.
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?!.*USING INTEGER PRIMARY KEY)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+def list_viewsets(patterns=None, prefix=''):
+    # Yield (url, viewset class, initkwargs) for every routed view exposing a list action.
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from list_viewsets(pattern.url_patterns, prefix + str(pattern.pattern))
+        elif isinstance(pattern, URLPattern):
+            callback = pattern.callback
+            actions = getattr(callback, 'actions', None) or {}
+            if actions.get('get') == 'list':
+                yield prefix + str(pattern.pattern), callback.cls, callback.initkwargs
+
+def sample_value(filter_):
+    # A plausible value for a filter so its lookup can be planned.
+    field_class = filter_.field_class
+    if issubclass(field_class, (models.DateTimeField,)) or 'DateTime' in field_class.__name__:
+        return timezone.now()
+    if 'Char' in field_class.__name__:
+        return 'x'
+    return 1
+
+class Command(BaseCommand):
+    help = (
+        "Replay each list endpoint's query, and each of its filters and orderings, through the "
+        "database's EXPLAIN and flag full-table scans and unindexed sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail', action='store_true', help='Exit with an error if anything is flagged.')
+
+    def handle(self, *args, **options):
+        pattern = SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'perf_audit does not know how to read {connection.vendor} query plans.')
+        self.scan_pattern = pattern
+        self.sort_pattern = SORT_PATTERNS[connection.vendor]
+        # A regular, unsaved user: list endpoints scoped to request.user are planned as a customer sees them.
+        self.user = get_user_model()(pk=0, is_staff=False)
+        factory = APIRequestFactory()
+
+        flagged = 0
+        seen = set()
+        for url, viewset, initkwargs in list_viewsets():
+            if viewset in seen:
+                continue
+            seen.add(viewset)
+            view = viewset(**initkwargs)
+            view.action = 'list'
+            view.args, view.kwargs, view.format_kwarg = (), {}, None
+            view.request = Request(factory.get('/' + url))
+            view.request.user = self.user
+            try:
+                queryset = view.get_queryset()
+                checks = [('list', self.paginate(view, queryset), bool(queryset.query.where))]
+                checks += self.filter_checks(view, queryset)
+                checks += self.ordering_checks(view, queryset)
+            except Exception as exc:
+                self.stdout.write(self.style.ERROR(f'{viewset.__name__}: could not build query ({exc})'))
+                flagged += 1
+                continue
+            for label, query, filtered in checks:
+                problems = self.problems(query, filtered)
+                name = f'{viewset.__name__} {label}'
+                if problems:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(f'{name}: {", ".join(problems)}'))
+                else:
+                    self.stdout.write(f'{name}: ok')
+
+        if flagged:
+            message = f'{flagged} queries flagged.'
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No full-table scans found.'))
+
+    def paginate(self, view, queryset):
+        # Apply the ordering and page size the paginator would use.
+        paginator = view.paginator
+        if paginator is None:
+            return queryset
+        ordering = getattr(paginator, 'ordering', None)
+        if ordering:
+            queryset = queryset.order_by(*([ordering] if isinstance(ordering, str) else ordering))
+        return queryset[:paginator.page_size or 100]
+
+    def filter_checks(self, view, queryset):
+        if DjangoFilterBackend not in view.filter_backends:
+            return []
+        filterset_class = DjangoFilterBackend().get_filterset_class(view, queryset)
+        if filterset_class is None:
+            return []
+        filterset = filterset_class(queryset=queryset, request=view.request)
+        return [
+            (f'?{name}=', self.paginate(view, filter_.filter(queryset, sample_value(filter_))), True)
+            for name, filter_ in filterset.filters.items()
+        ]
+
+    def ordering_checks(self, view, queryset):
+        if OrderingFilter not in view.filter_backends:
+            return []
+        fields = OrderingFilter().get_valid_fields(queryset, view, {'request': view.request})
+        return [(f'?ordering={field}', queryset.order_by(field)[:100], False) for field, _ in fields]
+
+    def problems(self, query, filtered):
+        plan = query.explain()
+        problems = []
+        if filtered:
+            # Unfiltered lists read the table in index order and stop at the page size; filtered
+            # ones must find their rows through an index, after which sorting the matches is cheap.
+            problems += [f'full scan of {table}' for table in self.scan_pattern.findall(plan)]
+        elif self.sort_pattern.search(plan):
+            problems.append('sort without index')
+        return problems
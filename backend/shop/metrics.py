@@ -0,0 +1,202 @@
+"""
+Per-request query and latency metrics.
+
+``RequestMetricsMiddleware`` wraps every database connection with
+``connection.execute_wrapper`` for the duration of a request and records:
+
+- ``queries``: how many queries ran.
+- ``db``: time spent in the database.
+- ``app``: time in the view outside the database. For DRF endpoints this is
+  mostly serializer work.
+- ``render``: time turning the response data into bytes.
+- ``total``: the whole request.
+- ``bytes``: response size.
+
+A streaming response runs most of its queries after the view returns, while
+its body is iterated, so for a regular (sync) stream the recorder stays on
+while each chunk is produced. The sample is recorded once the body is done
+or the client goes away; ``render`` then covers producing the whole body and
+``bytes`` counts what was streamed. Async streams, such as the ticket event
+stream, query from worker threads and stay open as long as the client
+listens. They are counted as ``unmeasured`` rather than reporting
+near-zero figures.
+
+Samples are tagged by endpoint. A DRF viewset gives ``ProductViewSet.list``,
+another view its class or function name. The most recent
+REQUEST_METRICS_SAMPLES samples per endpoint are kept in process memory, and
+``summary()`` turns them into percentiles for the admin metrics endpoint.
+With REQUEST_METRICS_SERVER_TIMING on, the figures are also sent as a
+``Server-Timing`` header that browser dev tools display (not on streaming
+responses, whose headers go out before the figures are known). A request whose
+query count passes REQUEST_QUERY_BUDGET logs a warning with the stack of the
+query that crossed the budget, which usually points straight at an N+1 loop.
+"""
+import logging
+import math
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TIMINGS = ['db', 'app', 'render', 'total']
+
+# Recorded for responses whose work can't be measured (async streams).
+UNMEASURED = None
+
+_samples = {}
+_lock = threading.Lock()
+
+def record(endpoint, sample):
+    with _lock:
+        samples = _samples.get(endpoint)
+        if samples is None:
+            samples = _samples[endpoint] = deque(maxlen=settings.REQUEST_METRICS_SAMPLES)
+    samples.append(sample)
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+def percentiles(values):
+    # Nearest-rank p50/p95/p99 and max of a non-empty list.
+    values = sorted(values)
+    def rank(p):
+        return values[max(0, min(len(values) - 1, math.ceil(p / 100 * len(values)) - 1))]
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'max': values[-1]}
+
+def summary():
+    # Percentiles per endpoint, slowest p95 first.
+    with _lock:
+        snapshot = {endpoint: list(samples) for endpoint, samples in _samples.items()}
+    report = []
+    for endpoint, samples in snapshot.items():
+        measured = [sample for sample in samples if sample is not UNMEASURED]
+        entry = {'endpoint': endpoint, 'count': len(measured), 'unmeasured': len(samples) - len(measured)}
+        if not measured:
+            entry.update(dict.fromkeys(['queries', 'bytes'] + [f'{name}_ms' for name in TIMINGS]))
+            report.append(entry)
+            continue
+        entry['queries'] = percentiles([sample['queries'] for sample in measured])
+        for name in TIMINGS:
+            entry[f'{name}_ms'] = {key: round(value * 1000, 2) for key, value in percentiles([sample[name] for sample in measured]).items()}
+        sizes = [sample['bytes'] for sample in measured if sample['bytes'] is not None]
+        entry['bytes'] = percentiles(sizes) if sizes else None
+        report.append(entry)
+    report.sort(key=lambda entry: entry['total_ms']['p95'] if entry['total_ms'] else -1, reverse=True)
+    return report
+
+def endpoint_name(view_func):
+    # "ViewSet.action" for DRF viewsets, the view class or function name otherwise.
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    return view_class.__name__
+
+class QueryRecorder:
+    # execute_wrapper hook counting and timing queries.
+    def __init__(self, budget):
+        self.budget = budget
+        self.queries = 0
+        self.db_time = 0.0
+        self.stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if self.queries == self.budget + 1:
+            self.stack = ''.join(traceback.format_stack()[:-1])
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+
+@contextmanager
+def recording(recorder):
+    # Route this thread's queries through `recorder`.
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(settings.REQUEST_QUERY_BUDGET)
+        request._metrics = {'recorder': recorder, 'endpoint': None, 'view_done': None, 'db_at_view_done': 0.0}
+        start = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+
+        if not response.streaming:
+            sample = self.finish(request, start, len(response.content))
+            if settings.REQUEST_METRICS_SERVER_TIMING:
+                response['Server-Timing'] = ', '.join(
+                    [f'{name};dur={sample[name] * 1000:.2f}' for name in TIMINGS] + [f'queries;desc="{recorder.queries}"']
+                )
+        elif response.is_async:
+            record(request._metrics['endpoint'] or 'unresolved', UNMEASURED)
+        else:
+            # Whatever follows the view is the body being produced.
+            if not request._metrics['view_done']:
+                request._metrics['view_done'] = time.perf_counter()
+                request._metrics['db_at_view_done'] = recorder.db_time
+            response.streaming_content = self.measured_stream(request, start, response.streaming_content)
+        return response
+
+    def measured_stream(self, request, start, chunks):
+        # Measure while each chunk is produced, on whichever thread iterates; record once done or abandoned.
+        size = 0
+        try:
+            while True:
+                with recording(request._metrics['recorder']):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.finish(request, start, size)
+
+    def finish(self, request, start, size):
+        recorder = request._metrics['recorder']
+        end = time.perf_counter()
+        endpoint = request._metrics['endpoint'] or 'unresolved'
+        view_done = request._metrics['view_done'] or end
+        db_in_view = request._metrics['db_at_view_done'] if request._metrics['view_done'] else recorder.db_time
+        sample = {
+            'queries': recorder.queries,
+            'db': recorder.db_time,
+            'app': max(view_done - start - db_in_view, 0.0),
+            'render': end - view_done,
+            'total': end - start,
+            'bytes': size,
+        }
+        record(endpoint, sample)
+        if recorder.stack:
+            logger.warning(
+                '%s %s (%s) ran %d queries, over the budget of %d. Query %d was issued from:\n%s',
+                request.method, request.path, endpoint, recorder.queries, recorder.budget, recorder.budget + 1, recorder.stack,
+            )
+        return sample
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = endpoint_name(view_func)
+        actions = getattr(view_func, 'actions', None)
+        if actions:
+            name = f"{name}.{actions.get(request.method.lower(), request.method.lower())}"
+        elif hasattr(view_func, 'cls') or hasattr(view_func, 'view_class'):
+            name = f'{name}.{request.method.lower()}'
+        request._metrics['endpoint'] = name
+
+    def process_template_response(self, request, response):
+        # Runs after the view returns and before DRF renders the response.
+        request._metrics['view_done'] = time.perf_counter()
+        request._metrics['db_at_view_done'] = request._metrics['recorder'].db_time
+        return response
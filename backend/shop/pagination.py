@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination shared by the large list endpoints.
+
+    Each page is fetched with a ``WHERE <key> > <cursor> ORDER BY <key> LIMIT n``
+    query, so the cost of a page does not grow with its position the way
+    OFFSET pagination does. The ordering key should be an indexed column;
+    an ``OrderingFilter`` on the view takes precedence over ``ordering``.
+
+    Viewsets opt in by setting ``pagination_class``, and can subclass this to
+    change the default key or the page size limits.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-pk'
+
+
+class OrderDatePagination(KeysetPagination):
+    """
+    Keyset pagination for orders, newest first.
+    """
+    ordering = ('-order_date', '-pk')
+    max_page_size = 100
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
     'dj_rest_auth.registration',
 
     # apps
+    'shop',
     'users',
     'catalog',
     'orders',
@@ -51,9 +53,11 @@ INSTALLED_APPS = [
     'vendor',
     'wishlist',
     'return',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    'shop.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +101,68 @@ DATABASES = {
 }
 
 
+# Cache
+# Set REDIS_URL (requires the redis package) to share the cache between processes in production,
+# or CACHE_DIR for a file-based cache; otherwise an in-process memory cache is used.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'shop',
+        }
+    }
+
+# Seconds before each process rebuilds its discount index even without a new version token, which
+# processes that don't share a cache (the default memory cache) never see.
+PRICING_INDEX_MAX_AGE = int(os.environ.get('PRICING_INDEX_MAX_AGE', 60))
+
+# Seconds a cached catalog response stays valid; writes invalidate it sooner.
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 300))
+
+# Seconds a user's dashboard counters are cached; writes to the counted rows invalidate them sooner.
+DASHBOARD_STATS_TIMEOUT = int(os.environ.get('DASHBOARD_STATS_TIMEOUT', 60))
+
+# Seconds over which back-in-stock and price-drop alerts are collected into one email per user.
+WISHLIST_ALERT_WINDOW = int(os.environ.get('WISHLIST_ALERT_WINDOW', 900))
+
+# Support ticket event streams (see support.live): seconds between database checks for
+# messages from other processes, and how long one connection stays open before the client reconnects.
+SUPPORT_STREAM_POLL_INTERVAL = float(os.environ.get('SUPPORT_STREAM_POLL_INTERVAL', 5))
+SUPPORT_STREAM_MAX_AGE = int(os.environ.get('SUPPORT_STREAM_MAX_AGE', 300))
+
+# Seconds a claimed support ticket may go without an agent reply before it returns to the queue (see support.queue).
+SUPPORT_CLAIM_TIMEOUT = int(os.environ.get('SUPPORT_CLAIM_TIMEOUT', 1800))
+
+
+# Request metrics (see shop.metrics): samples kept per endpoint, Server-Timing headers,
+# and the query count above which a request logs the stack of the offending query.
+REQUEST_METRICS_SAMPLES = int(os.environ.get('REQUEST_METRICS_SAMPLES', 1000))
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', str(DEBUG)).lower() in ('1', 'true', 'yes')
+REQUEST_QUERY_BUDGET = int(os.environ.get('REQUEST_QUERY_BUDGET', 50))
+
+
+# Email
+# Printed to the console unless a real backend is configured.
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'shop@localhost')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -148,6 +214,7 @@ AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -157,6 +224,22 @@ REST_FRAMEWORK = {
     #     'rest_framework.renderers.JSONRenderer',
     # ],
 }
+
+# JWT mode (see users.authentication). When on, login and registration hand out
+# an access/refresh pair and "Authorization: Bearer <access>" is accepted
+# without a database lookup. Existing "Token" keys keep working either way.
+JWT_AUTH = os.environ.get('JWT_AUTH', 'false').lower() in ('1', 'true', 'yes')
+# Seconds between reloads of the blacklisted-token filter in each process.
+JWT_REVOCATION_REFRESH = int(os.environ.get('JWT_REVOCATION_REFRESH', 30))
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_MINUTES', 15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_DAYS', 7))),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'USER_ID_FIELD': 'User_ID',
+    'USER_ID_CLAIM': 'user_id',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
+}
+
 REST_AUTH_REGISTER_SERIALIZERS = {
     'REGISTER_SERIALIZER': 'users.serializers.RegisterSerializer',
 }
@@ -0,0 +1,23 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from catalog.views import ProductViewSet
+
+class PerfAuditCommandTest(TestCase):
+    # Test cases for the perf_audit management command.
+    def test_indexed_endpoints_pass(self):
+        # Every registered list query, filter and ordering is index-backed.
+        out = StringIO()
+        call_command('perf_audit', '--fail', stdout=out)
+        self.assertIn('ProductViewSet ?status=: ok', out.getvalue())
+        self.assertIn('OrderViewSet list: ok', out.getvalue())
+
+    def test_unindexed_ordering_is_flagged(self):
+        # Adding an ordering on a column without an index is caught.
+        out = StringIO()
+        with mock.patch.object(ProductViewSet, 'ordering_fields', ['price', 'dimensions']):
+            with self.assertRaises(CommandError):
+                call_command('perf_audit', '--fail', stdout=out)
+        self.assertIn('ProductViewSet ?ordering=dimensions: sort without index', out.getvalue())
@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import os
+import unittest
+from django.db import connection
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from catalog.models import Category, Product
+from inventory.models import InventoryTransaction, ProductInventory, Warehouse
+from orders.models import Order, OrderItem
+from users.models import Address
+
+User = get_user_model()
+
+def current_rss():
+    # Resident set size of this process in bytes (Linux).
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+def read_body(response):
+    return b''.join(response.streaming_content).decode()
+
+class ExportAPITest(APITestCase):
+    # Test cases for the streaming report exports.
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.customer = User.objects.create_user(email='customer@example.com', password='password123')
+        category = Category.objects.create(name='Tools', description='Tools.')
+        self.product = Product.objects.create(
+            product_name='Hammer', sku='HAMMER1', description='A hammer.', price='12.50',
+            weight=1, dimensions='30x10x3 cm', status='available', category=category
+        )
+        self.warehouse = Warehouse.objects.create(Name='Main Warehouse', Location='Tehran')
+        ProductInventory.objects.create(product=self.product, warehouse=self.warehouse, Quantity=8)
+        for timestamp in ('2026-01-10T09:00:00Z', '2026-01-20T23:30:00Z', '2026-02-01T08:00:00Z'):
+            movement = InventoryTransaction.objects.create(
+                product=self.product, warehouse=self.warehouse, Quantity=-1, Type='sale', Reference_Type='order', Reference_ID=1,
+            )
+            InventoryTransaction.objects.filter(pk=movement.pk).update(timestamp=timestamp)
+        address = Address.objects.create(user=self.customer, street='1 Main St', city='Tehran', state='Tehran', zip_code='12345')
+        self.order = Order.objects.create(user=self.customer, total_price=25, status='pending', address=address)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, price='12.50')
+        Order.objects.create(user=self.customer, total_price=0, status='canceled', address=address)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_transactions_csv_with_date_range(self):
+        # A date-only `to` includes the whole day.
+        response = self.client.get(reverse('inventorytransaction-export'), {'from': '2026-01-01', 'to': '2026-01-20'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+        rows = list(csv.DictReader(io.StringIO(read_body(response))))
+        self.assertEqual([row['timestamp'][:10] for row in rows], ['2026-01-10', '2026-01-20'])
+        self.assertEqual(rows[0]['sku'], 'HAMMER1')
+
+    def test_orders_jsonl(self):
+        # One line per order item; orders without items still appear.
+        response = self.client.get(reverse('order-export'), {'output': 'jsonl'})
+        lines = [json.loads(line) for line in read_body(response).splitlines()]
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(
+            (lines[0]['order_id'], lines[0]['sku'], lines[0]['quantity'], lines[0]['unit_price']),
+            (self.order.id, 'HAMMER1', 2, '12.50'),
+        )
+        self.assertIsNone(lines[1]['item_id'])
+
+    def test_inventory_export(self):
+        rows = list(csv.DictReader(io.StringIO(read_body(self.client.get(reverse('productinventory-export'))))))
+        self.assertEqual([(row['sku'], row['quantity']) for row in rows], [('HAMMER1', '8')])
+
+    def test_rejects_bad_parameters(self):
+        url = reverse('inventorytransaction-export')
+        self.assertEqual(self.client.get(url, {'output': 'xlsx'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'from': '2026-13-01'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.get(reverse('order-export')).status_code, status.HTTP_403_FORBIDDEN)
+
+class ExportMemoryTest(APITestCase):
+    # Exporting a million rows must not hold them in memory. Slow, so it only runs with EXPORT_MEMORY_ROWS set:
+    #   EXPORT_MEMORY_ROWS=1000000 python manage.py test shop.tests.test_exports
+    rows = int(os.environ.get('EXPORT_MEMORY_ROWS', 0))
+    ceiling = 16 * 1024 * 1024
+
+    @unittest.skipUnless(rows, 'set EXPORT_MEMORY_ROWS to run the export memory test')
+    @unittest.skipUnless(os.path.exists('/proc/self/statm'), 'needs /proc to read RSS')
+    def test_million_rows_constant_memory(self):
+        category = Category.objects.create(name='Tools', description='Tools.')
+        product = Product.objects.create(
+            product_name='Nail', sku='NAIL1', description='A nail.', price=1,
+            weight=0.01, dimensions='5x1x1 cm', status='available', category=category
+        )
+        warehouse = Warehouse.objects.create(Name='Main Warehouse', Location='Tehran')
+        admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.client.force_authenticate(user=admin)
+        baseline = current_rss()
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO inventory_inventorytransaction (product_id, warehouse_id, "Quantity", "Type", "Reference_Type", "Reference_ID", timestamp) '
+                'VALUES (%s, %s, -1, %s, %s, %s, %s)',
+                ((product.pk, warehouse.Warehouse_ID, 'sale', 'order', i, '2026-01-01 00:00:00') for i in range(self.rows)),
+            )
+        # SQLite's test database lives in this process, so the rows themselves add to RSS; only the export is measured.
+        database = current_rss() - baseline
+
+        response = self.client.get(reverse('inventorytransaction-export'))
+        peak = current_rss()
+        lines = 0
+        for chunk in response.streaming_content:
+            lines += 1
+            if not lines % 50000:
+                peak = max(peak, current_rss())
+        self.assertEqual(lines, self.rows + 1)
+        self.assertLess(peak - baseline - database, self.ceiling)
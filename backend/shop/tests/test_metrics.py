@@ -0,0 +1,88 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from catalog.models import Category
+from shop import metrics
+from support import live
+from support.models import Ticket
+
+User = get_user_model()
+
+class RequestMetricsTest(APITestCase):
+    # Test cases for the request metrics middleware and report.
+    def setUp(self):
+        metrics.reset()
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        self.customer = User.objects.create_user(email='customer@example.com', password='password123')
+        Category.objects.create(name='Tools', description='Tools.')
+
+    def report(self):
+        return {entry['endpoint']: entry for entry in metrics.summary()}
+
+    def test_samples_are_tagged_by_viewset_action(self):
+        self.client.get(reverse('category-list'))
+        self.client.get(reverse('category-list'))
+        entry = self.report()['CategoryViewSet.list']
+        self.assertEqual(entry['count'], 2)
+        self.assertGreater(entry['queries']['max'], 0)
+        self.assertGreater(entry['bytes']['p50'], 0)
+        self.assertGreaterEqual(entry['total_ms']['max'], entry['db_ms']['max'])
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('category-list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('queries;desc=', response['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS_SERVER_TIMING=False)
+    def test_server_timing_header_can_be_turned_off(self):
+        response = self.client.get(reverse('category-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_query_budget_logs_the_offending_stack(self):
+        with self.assertLogs('shop.metrics', 'WARNING') as logs:
+            self.client.get(reverse('category-list'))
+        self.assertIn('CategoryViewSet.list', logs.output[0])
+        self.assertIn('over the budget of 0', logs.output[0])
+
+    def test_report_is_admin_only(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.get(reverse('request-metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_report_and_reset(self):
+        self.client.get(reverse('category-list'))
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('request-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('CategoryViewSet.list', [entry['endpoint'] for entry in response.data['endpoints']])
+
+        self.assertEqual(self.client.delete(reverse('request-metrics')).status_code, status.HTTP_204_NO_CONTENT)
+        # Only the DELETE itself has been recorded since the reset.
+        self.assertEqual([entry['endpoint'] for entry in metrics.summary()], ['RequestMetricsView.delete'])
+
+    def test_streaming_response_measured_while_iterated(self):
+        # The export's rows are read while its body is iterated, so the sample is recorded once the body is done.
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('order-export'))
+        self.assertNotIn('OrderViewSet.export', self.report())
+        body = b''.join(response.streaming_content)
+        entry = self.report()['OrderViewSet.export']
+        self.assertEqual((entry['count'], entry['unmeasured'], entry['bytes']['max']), (1, 0, len(body)))
+        self.assertGreater(entry['queries']['max'], 0)
+
+    async def test_async_stream_is_unmeasured(self):
+        ticket = await Ticket.objects.acreate(user=self.customer, title='Issue', description='Help.')
+        token = live.stream_token(ticket.pk, self.customer.pk)
+        response = await self.async_client.get(reverse('ticket-stream', args=[ticket.pk]), {'token': token})
+        await anext(response.streaming_content)
+        entry = (await sync_to_async(self.report)())['support.views.ticket_stream']
+        self.assertEqual((entry['count'], entry['unmeasured'], entry['total_ms']), (0, 1, None))
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual(metrics.percentiles(values), {'p50': 50, 'p95': 95, 'p99': 99, 'max': 100})
+        self.assertEqual(metrics.percentiles([7]), {'p50': 7, 'p95': 7, 'p99': 7, 'max': 7})
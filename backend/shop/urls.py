@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.views.generic import TemplateView
+from .views import RequestMetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -30,6 +31,8 @@ urlpatterns = [
     path('api/vendors/', include('vendor.urls')),
     path('api/wishlist/', include('wishlist.urls')),
     path('api/returns/', include('return.urls')),
+    path('api/analytics/', include('analytics.urls')),
+    path('api/metrics/', RequestMetricsView.as_view(), name='request-metrics'),
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
     path('product-detail/', TemplateView.as_view(template_name='product_detail.html'), name='product_detail'),
     path('cart/', TemplateView.as_view(template_name='cart.html'), name='cart'),
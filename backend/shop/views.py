@@ -0,0 +1,18 @@
+import os
+from django.conf import settings
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from . import metrics
+
+class RequestMetricsView(APIView):
+    # Query count and latency percentiles per endpoint for this server process; DELETE clears them.
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'pid': os.getpid(), 'query_budget': settings.REQUEST_QUERY_BUDGET, 'endpoints': metrics.summary()})
+
+    def delete(self, request):
+        metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -3,7 +3,7 @@ from .models import Ticket, Message, TicketAccess
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'title', 'status', 'priority', 'created_at')
+    list_display = ('id', 'user', 'title', 'status', 'priority', 'claimed_at', 'created_at')
     list_filter = ('status', 'priority')
     search_fields = ('title', 'user__username')
 
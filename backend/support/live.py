@@ -0,0 +1,132 @@
+"""
+Live ticket updates as Server-Sent Events.
+
+``GET /api/support/tickets/<id>/stream/`` keeps one connection open per
+ticket. Each new Message is sent as an event whose ``id`` is the message id
+and whose data is the MessageSerializer JSON. A browser EventSource that
+reconnects sends the id back as ``Last-Event-ID`` and resumes where it
+stopped.
+
+Every stream remembers the last message id it sent and reads newer messages
+with one indexed query. It runs that query when either:
+
+- a message is committed in the same process, which wakes it through
+  ``notify()``, or
+- SUPPORT_STREAM_POLL_INTERVAL seconds pass, which catches messages written
+  by other processes.
+
+A quiet poll sends a comment line, which keeps proxies from closing the
+connection. The stream ends when the ticket is closed or after
+SUPPORT_STREAM_MAX_AGE seconds. The client then reconnects.
+
+Long-lived responses need the ASGI server (shop/asgi.py). Under WSGI each
+request answers with whatever is new and a ``retry`` hint, so EventSource
+degrades to polling at the same interval.
+
+EventSource cannot send an Authorization header, so clients first POST to
+``stream-token/`` and open the stream with ``?token=``. The token is signed
+and short-lived, and only works for that user and ticket.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Message, Ticket
+from .serializers import MessageSerializer
+
+TOKEN_SALT = 'support.stream'
+TOKEN_MAX_AGE = 60
+BATCH_SIZE = 100
+
+_listeners = {}
+_lock = threading.Lock()
+
+def stream_token(ticket_id, user_id):
+    return signing.dumps({'ticket': ticket_id, 'user': user_id}, salt=TOKEN_SALT, compress=True)
+
+def token_user_id(token, ticket_id):
+    # The user a stream token was issued to, or None if it is invalid, expired or for another ticket.
+    try:
+        claims = signing.loads(token, salt=TOKEN_SALT, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return claims['user'] if claims.get('ticket') == ticket_id else None
+
+def notify(ticket_id):
+    # Wake the streams of a ticket in this process; safe to call from any thread.
+    with _lock:
+        listeners = list(_listeners.get(ticket_id, ()))
+    for loop, event in listeners:
+        loop.call_soon_threadsafe(event.set)
+
+@contextmanager
+def listening(ticket_id):
+    listener = (asyncio.get_running_loop(), asyncio.Event())
+    with _lock:
+        _listeners.setdefault(ticket_id, set()).add(listener)
+    try:
+        yield listener[1]
+    finally:
+        with _lock:
+            listeners = _listeners.get(ticket_id)
+            listeners.discard(listener)
+            if not listeners:
+                del _listeners[ticket_id]
+
+def latest_message_id(ticket_id):
+    return Message.objects.filter(ticket_id=ticket_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+def messages_after(ticket_id, after_id):
+    # Up to BATCH_SIZE messages newer than after_id, and whether the ticket is still open.
+    status = Ticket.objects.filter(pk=ticket_id).values_list('status', flat=True).first()
+    messages = Message.objects.filter(ticket_id=ticket_id, id__gt=after_id).order_by('id')[:BATCH_SIZE]
+    return MessageSerializer(messages, many=True).data, status is not None and status not in Ticket.CLOSED_STATUSES
+
+def message_event(message):
+    return f"id: {message['id']}\nevent: message\ndata: {json.dumps(message, cls=DjangoJSONEncoder)}\n\n"
+
+def opening(after_id):
+    # Reconnect delay, and the position to resume from even if no message follows.
+    return f'retry: {int(settings.SUPPORT_STREAM_POLL_INTERVAL * 1000)}\nid: {after_id}\n\n'
+
+def poll_once(ticket_id, after_id):
+    # Whole response body for a client that can't hold the connection (WSGI).
+    lines = [opening(after_id)]
+    while True:
+        messages, is_open = messages_after(ticket_id, after_id)
+        lines.extend(message_event(message) for message in messages)
+        if len(messages) < BATCH_SIZE:
+            break
+        after_id = messages[-1]['id']
+    if not is_open:
+        lines.append('event: closed\ndata: {}\n\n')
+    return lines
+
+async def event_stream(ticket_id, after_id):
+    fetch = sync_to_async(messages_after)
+    yield opening(after_id)
+    deadline = time.monotonic() + settings.SUPPORT_STREAM_MAX_AGE
+    with listening(ticket_id) as wakeup:
+        while True:
+            wakeup.clear()
+            messages, is_open = await fetch(ticket_id, after_id)
+            for message in messages:
+                yield message_event(message)
+                after_id = message['id']
+            if not is_open:
+                yield 'event: closed\ndata: {}\n\n'
+                return
+            if len(messages) == BATCH_SIZE:
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=min(settings.SUPPORT_STREAM_POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
@@ -0,0 +1,93 @@
+import threading
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from shop.metrics import percentiles
+from support.models import PRIORITY_RANKS, Ticket, TicketAccess
+from support.queue import claim_next, release_stale
+
+class Command(BaseCommand):
+    help = (
+        'Time many agents claiming tickets at once from a large queue. Agents run in threads with their own '
+        'connections, so the data is committed and deleted again at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=100000)
+        parser.add_argument('--agents', type=int, default=50)
+        parser.add_argument('--claims', type=int, default=40, help='Tickets each agent claims, one at a time.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        customer = User.objects.create(email='queue-benchmark-customer@example.invalid')
+        agents = User.objects.bulk_create(
+            [User(email=f'queue-benchmark-agent-{i}@example.invalid', is_staff=True) for i in range(options['agents'])]
+        )
+        try:
+            self.run(customer, agents, options)
+        finally:
+            tickets = Ticket.objects.filter(user=customer)
+            TicketAccess.objects.filter(ticket__in=tickets).delete()
+            tickets.delete()
+            User.objects.filter(pk__in=[customer.pk] + [agent.pk for agent in agents]).delete()
+
+    def run(self, customer, agents, options):
+        priorities = list(PRIORITY_RANKS)
+        now = timezone.now()
+        Ticket.objects.bulk_create(
+            [
+                Ticket(
+                    user=customer, title=f'Ticket {i}', description='Benchmark.', priority=priorities[i % len(priorities)],
+                    priority_rank=PRIORITY_RANKS[priorities[i % len(priorities)]],
+                )
+                for i in range(options['tickets'])
+            ],
+            batch_size=5000,
+        )
+        # Spread the tickets over a month so the age ordering is meaningful.
+        for pk in Ticket.objects.filter(user=customer).values_list('pk', flat=True)[::1000]:
+            Ticket.objects.filter(user=customer, pk__gte=pk, pk__lt=pk + 1000).update(created_at=now - timedelta(minutes=pk % 43200))
+
+        expected = list(Ticket.objects.queued().filter(user=customer).values_list('pk', flat=True)[:len(agents) * options['claims']])
+        latencies = []
+        errors = []
+        barrier = threading.Barrier(len(agents))
+
+        def agent_loop(agent):
+            try:
+                barrier.wait()
+                for _ in range(options['claims']):
+                    start = time.perf_counter()
+                    claim_next(agent)
+                    latencies.append(time.perf_counter() - start)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=agent_loop, args=(agent,)) for agent in agents]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        claimed = list(TicketAccess.objects.filter(user__in=agents).values_list('ticket_id', flat=True))
+        timings = {key: round(value * 1000, 2) for key, value in percentiles(latencies).items()} if latencies else {}
+        self.stdout.write(
+            f"{len(agents)} agents claimed {len(claimed)} of {options['tickets']} tickets in {elapsed:.2f} s "
+            f"({len(claimed) / elapsed:.0f} claims/s), per-claim ms {timings}"
+        )
+        self.stdout.write(
+            f'{len(claimed) - len(set(claimed))} tickets claimed twice, '
+            f'claims in queue order: {sorted(claimed) == sorted(expected)}, {len(errors)} errors {errors[:1]}'
+        )
+
+        Ticket.objects.filter(pk__in=claimed).update(claimed_at=now - timedelta(days=1))
+        start = time.perf_counter()
+        released = release_stale()
+        self.stdout.write(f'released {released} stale claims in {(time.perf_counter() - start) * 1000:.1f} ms')
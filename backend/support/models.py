@@ -1,20 +1,73 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Substr
 from django.conf import settings
 
+# Queue order of the free-text priority values; lower is more urgent, anything else counts as medium.
+PRIORITY_RANKS = {'urgent': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+class TicketQuerySet(models.QuerySet):
+    def for_participant(self, user):
+        # Tickets the user opened or was given access to.
+        access = TicketAccess.objects.filter(user=user).values('ticket_id')
+        return self.filter(models.Q(user=user) | models.Q(pk__in=access))
+
+    def queued(self):
+        # Open tickets no agent has claimed, most urgent and then oldest first (served by ticket_queue_idx).
+        return self.filter(status=Ticket.STATUS_OPEN).order_by('priority_rank', 'created_at', 'pk')
+
+    def with_message_summary(self, preview_length=120):
+        # Message count and the latest message, as correlated subqueries instead of loading every message.
+        messages = Message.objects.filter(ticket=models.OuterRef('pk'))
+        latest = messages.order_by('-id')
+        count = messages.order_by().values('ticket').annotate(count=models.Count('pk')).values('count')
+        return self.annotate(
+            messages_count=Coalesce(models.Subquery(count), 0),
+            last_message_id=models.Subquery(latest.values('id')[:1]),
+            last_message_sender=models.Subquery(latest.values('sender_user_id')[:1]),
+            last_message_date=models.Subquery(latest.values('date')[:1]),
+            last_message_preview=models.Subquery(latest.annotate(preview=Substr('content', 1, preview_length)).values('preview')[:1]),
+        )
+
 class Ticket(models.Model):
     # Model for support tickets.
+    STATUS_OPEN = 'open'
+    STATUS_CLAIMED = 'claimed'
+    # Statuses a customer sees as open; a claim only means an agent has picked the ticket up.
+    OPEN_STATUSES = (STATUS_OPEN, STATUS_CLAIMED)
+    CLOSED_STATUSES = ('closed', 'resolved')
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='tickets')
     type = models.CharField(max_length=50, default='general')
     title = models.CharField(max_length=255)
     description = models.TextField()
     status = models.CharField(max_length=50, default='open')
     priority = models.CharField(max_length=50, default='medium')
+    # Position of `priority` in PRIORITY_RANKS, kept in step by save(); querysets updating priority must set it too.
+    priority_rank = models.PositiveSmallIntegerField(default=PRIORITY_RANKS['medium'], editable=False)
+    # When an agent claimed the ticket or last replied to it (see support.queue).
+    claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TicketQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='ticket_user_status_idx'),
+            models.Index(fields=['status', 'priority_rank', 'created_at', 'id'], name='ticket_queue_idx'),
+            models.Index(fields=['status', 'claimed_at'], name='ticket_claimed_idx'),
+        ]
+
     def __str__(self):
         return f"Ticket #{self.id}: {self.title}"
 
+    def save(self, *args, **kwargs):
+        self.priority_rank = PRIORITY_RANKS.get(self.priority, PRIORITY_RANKS['medium'])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'priority' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'priority_rank'}
+        super().save(*args, **kwargs)
+
 class Message(models.Model):
     # Messages within a ticket.
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='messages')
@@ -22,11 +75,19 @@ class Message(models.Model):
     content = models.TextField()
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Message history pages, the last-message preview and the live stream all walk a ticket's messages by id.
+            models.Index(fields=['ticket', 'id'], name='message_ticket_id_idx'),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender_user.username} on ticket {self.ticket.id}"
 
 class TicketAccess(models.Model):
     # Defines which users have access to which tickets.
+    ACCESS_AGENT = 'agent' # The agent working the ticket, written by a queue claim.
+
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     access_type = models.CharField(max_length=50)
@@ -0,0 +1,113 @@
+"""
+Agent work queue for support tickets.
+
+Open tickets that no agent has claimed are served most urgent first, then
+oldest first, straight off the ``ticket_queue_idx`` index on (status,
+priority_rank, created_at, id). ``priority`` is free text, so Ticket.save
+stores its position in PRIORITY_RANKS as ``priority_rank``.
+
+``claim_next`` hands an agent the next tickets. Where the database supports
+``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL, MySQL 8, Oracle) the
+head of the queue is read with ``skip_locked``, so concurrent agents step
+past rows another agent is claiming instead of waiting on them. SQLite has
+no row locks, so there claims in one process take turns on a local lock.
+Either way the claim itself is a conditional UPDATE from ``open`` to
+``claimed``, so two processes can never both win a ticket; the loser moves
+on to the next candidate.
+
+A claim also writes a TicketAccess row with access_type ``agent``, which
+lets the agent see and answer the ticket through the regular ticket and
+message endpoints. Every reply from someone other than the customer moves
+``claimed_at`` forward (see support.signals). A claim that has been quiet
+for SUPPORT_CLAIM_TIMEOUT seconds is stale: ``release_stale`` puts the
+ticket back in the queue and drops the agent's access. It runs before every
+claim, so a closed browser tab never strands a ticket.
+
+Claims and releases are written with update(), which skips the post_save
+hook that drops the customers' cached dashboard counters, so the queue
+drops them itself once its transaction commits.
+"""
+import threading
+from contextlib import nullcontext
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from users.dashboard import invalidate_dashboard_stats
+from .models import Ticket, TicketAccess
+
+# Extra candidates read without row locks, in case other processes claim some of them first.
+LOOKAHEAD = 10
+
+_claim_lock = threading.Lock()
+
+def claim_lock():
+    # Row locks keep agents apart where the database has them; otherwise claims in this process take turns.
+    if connection.features.has_select_for_update_skip_locked:
+        return nullcontext()
+    return _claim_lock
+
+def invalidate_owners(user_ids):
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: [invalidate_dashboard_stats(user_id) for user_id in user_ids])
+
+def candidates(count):
+    queued = Ticket.objects.queued()
+    if connection.features.has_select_for_update_skip_locked:
+        return queued.select_for_update(skip_locked=True).values_list('pk', flat=True)[:count]
+    return queued.values_list('pk', flat=True)[:count + LOOKAHEAD]
+
+def claim_next(agent, count=1):
+    # Claim up to `count` queued tickets for `agent`; returns them in queue order.
+    release_stale()
+    claimed = []
+    with claim_lock(), transaction.atomic():
+        now = timezone.now()
+        for pk in candidates(count):
+            won = Ticket.objects.filter(pk=pk, status=Ticket.STATUS_OPEN).update(
+                status=Ticket.STATUS_CLAIMED, claimed_at=now, updated_at=now,
+            )
+            if won:
+                claimed.append(pk)
+                if len(claimed) == count:
+                    break
+        TicketAccess.objects.bulk_create(
+            [TicketAccess(ticket_id=pk, user=agent, access_type=TicketAccess.ACCESS_AGENT) for pk in claimed],
+            update_conflicts=True, unique_fields=['ticket', 'user'], update_fields=['access_type'],
+        )
+        tickets = list(Ticket.objects.filter(pk__in=claimed).order_by('priority_rank', 'created_at', 'pk'))
+        invalidate_owners(ticket.user_id for ticket in tickets)
+    return tickets
+
+def unclaim(ticket_ids):
+    # Put claimed tickets back in the queue and drop their agents' access; call inside a transaction.
+    tickets = Ticket.objects.filter(pk__in=ticket_ids, status=Ticket.STATUS_CLAIMED)
+    invalidate_owners(tickets.values_list('user_id', flat=True))
+    tickets.update(status=Ticket.STATUS_OPEN, claimed_at=None, updated_at=timezone.now())
+    TicketAccess.objects.filter(ticket_id__in=ticket_ids, access_type=TicketAccess.ACCESS_AGENT).delete()
+
+def release(ticket_id, agent):
+    # Hand a ticket the agent claimed back to the queue; returns whether the agent held it.
+    with transaction.atomic():
+        held = Ticket.objects.filter(
+            pk=ticket_id, status=Ticket.STATUS_CLAIMED,
+            ticketaccess__user=agent, ticketaccess__access_type=TicketAccess.ACCESS_AGENT,
+        ).exists()
+        if held:
+            unclaim([ticket_id])
+    return held
+
+def release_stale(batch_size=500):
+    # Release claims idle for longer than SUPPORT_CLAIM_TIMEOUT; returns how many were released.
+    cutoff = timezone.now() - timedelta(seconds=settings.SUPPORT_CLAIM_TIMEOUT)
+    released = 0
+    while True:
+        with transaction.atomic():
+            # Locked, so a reply renewing one of these claims waits until it is back in the queue.
+            stale = Ticket.objects.select_for_update().filter(status=Ticket.STATUS_CLAIMED, claimed_at__lt=cutoff)
+            ids = list(stale.values_list('pk', flat=True)[:batch_size])
+            unclaim(ids)
+        released += len(ids)
+        if len(ids) < batch_size:
+            return released
@@ -8,18 +8,29 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class TicketSerializer(serializers.ModelSerializer):
-    # Serializer for tickets.
-    messages = MessageSerializer(many=True, read_only=True)
+    # Serializer for tickets. Messages are paged separately; the count and preview come from
+    # Ticket.objects.with_message_summary() (a new ticket has neither).
     subject = serializers.CharField(source='title', write_only=True)
     messages_count = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
 
     class Meta:
         model = Ticket
-        fields = ['id', 'user', 'type', 'title', 'subject', 'description', 'status', 'priority', 'created_at', 'updated_at', 'messages', 'messages_count']
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'type', 'title', 'subject', 'description', 'status', 'priority', 'claimed_at', 'created_at', 'updated_at', 'messages_count', 'last_message']
+        read_only_fields = ['user', 'claimed_at', 'created_at', 'updated_at']
 
     def get_messages_count(self, obj):
-        return obj.messages.count()
+        return getattr(obj, 'messages_count', 0)
+
+    def get_last_message(self, obj):
+        if getattr(obj, 'last_message_id', None) is None:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'sender_user': obj.last_message_sender,
+            'date': serializers.DateTimeField().to_representation(obj.last_message_date),
+            'preview': obj.last_message_preview,
+        }
     
     def create(self, validated_data):
         # Ensure required fields have defaults if not provided
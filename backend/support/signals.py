@@ -0,0 +1,21 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .live import notify
+from .models import Message, Ticket
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, **kwargs):
+    # Wake this process's streams of the ticket once the message is visible to their query.
+    if created:
+        transaction.on_commit(partial(notify, instance.ticket_id))
+
+@receiver(post_save, sender=Message)
+def renew_claim(sender, instance, created, **kwargs):
+    # A reply from the agent side keeps the ticket's claim from going stale (see support.queue).
+    if created:
+        Ticket.objects.filter(pk=instance.ticket_id, status=Ticket.STATUS_CLAIMED).exclude(user_id=instance.sender_user_id).update(
+            claimed_at=timezone.now(),
+        )
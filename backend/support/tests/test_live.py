@@ -0,0 +1,79 @@
+import asyncio
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from support import live
+from support.models import Message, Ticket
+
+User = get_user_model()
+
+async def next_chunk(stream, timeout=2):
+    return (await asyncio.wait_for(anext(stream), timeout)).decode()
+
+class TicketStreamTest(TestCase):
+    # Test cases for the Server-Sent Events stream of a ticket.
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='password123')
+        self.stranger = User.objects.create_user(email='stranger@example.com', password='password123')
+        self.ticket = Ticket.objects.create(user=self.user, title='Issue', description='Help.')
+        self.first = Message.objects.create(ticket=self.ticket, sender_user=self.user, content='Hello?')
+        self.url = reverse('ticket-stream', args=[self.ticket.pk])
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.token = client.post(reverse('ticket-stream-token', args=[self.ticket.pk])).data['token']
+
+    @override_settings(SUPPORT_STREAM_POLL_INTERVAL=10)
+    async def test_new_messages_are_pushed(self):
+        response = await self.async_client.get(self.url, {'token': self.token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await next_chunk(stream), f'retry: 10000\nid: {self.first.pk}\n\n')
+        reply = await Message.objects.acreate(ticket=self.ticket, sender_user=self.stranger, content='Hi, how can I help?')
+        live.notify(self.ticket.pk) # What the on_commit hook does once the reply is committed.
+        event = await next_chunk(stream)
+        self.assertTrue(event.startswith(f'id: {reply.pk}\nevent: message\ndata: '))
+        self.assertIn('"content": "Hi, how can I help?"', event)
+
+        # A client disconnect cancels the pending read, which unregisters the listener.
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0.05)
+        self.assertIn(self.ticket.pk, live._listeners)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertNotIn(self.ticket.pk, live._listeners)
+
+    @override_settings(SUPPORT_STREAM_POLL_INTERVAL=0.05)
+    async def test_resume_poll_and_close(self):
+        # Last-Event-ID replays what was missed; polling finds messages from other processes; closing ends the stream.
+        response = await self.async_client.get(self.url, {'token': self.token}, headers={'Last-Event-ID': '0'})
+        stream = response.streaming_content
+        await next_chunk(stream)
+        self.assertIn('data: ', await next_chunk(stream))
+        later = await Message.objects.acreate(ticket=self.ticket, sender_user=self.user, content='Anyone?')
+        chunk = await next_chunk(stream)
+        while chunk.startswith(':'):
+            chunk = await next_chunk(stream)
+        self.assertTrue(chunk.startswith(f'id: {later.pk}\n'))
+        await Ticket.objects.filter(pk=self.ticket.pk).aupdate(status='closed')
+        while not chunk.startswith('event: closed'):
+            chunk = await next_chunk(stream)
+        with self.assertRaises(StopAsyncIteration):
+            await next_chunk(stream)
+
+    def test_wsgi_falls_back_to_polling(self):
+        response = self.client.get(self.url, {'token': self.token, 'after': 0})
+        body = response.content.decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn(f'id: {self.first.pk}\nevent: message', body)
+
+    def test_access(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.get(self.url, {'token': 'forged'}).status_code, 401)
+        other = Ticket.objects.create(user=self.user, title='Other', description='Help.')
+        self.assertEqual(self.client.get(reverse('ticket-stream', args=[other.pk]), {'token': self.token}).status_code, 401)
+        client = APIClient()
+        client.force_authenticate(user=self.stranger)
+        self.assertEqual(client.post(reverse('ticket-stream-token', args=[self.ticket.pk])).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'token': live.stream_token(self.ticket.pk, self.stranger.pk)}).status_code, 404)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from support import queue
+from support.models import Message, Ticket, TicketAccess
+from users.dashboard import cache_key
+
+User = get_user_model()
+
+class TicketQueueTest(APITestCase):
+    # Test cases for the agents' ticket queue.
+    def setUp(self):
+        self.customer = User.objects.create_user(email='customer@example.com', password='password123')
+        self.agent = User.objects.create_user(email='agent@example.com', password='password123', is_staff=True)
+        self.other_agent = User.objects.create_user(email='agent2@example.com', password='password123', is_staff=True)
+        self.low = self.ticket('Old and low', 'low')
+        self.medium = self.ticket('Medium', 'medium')
+        self.urgent = self.ticket('Urgent', 'urgent')
+        self.newer_urgent = self.ticket('Newer urgent', 'urgent')
+        Ticket.objects.create(user=self.customer, title='Done', description='Help.', priority='urgent', status='resolved')
+        self.client.force_authenticate(user=self.agent)
+
+    def ticket(self, title, priority):
+        return Ticket.objects.create(user=self.customer, title=title, description='Help.', priority=priority)
+
+    def claim(self, count=1):
+        return self.client.post(reverse('queue-claim') + f'?count={count}')
+
+    def test_queue_order(self):
+        response = self.client.get(reverse('queue-list'))
+        self.assertEqual([ticket['title'] for ticket in response.data], ['Urgent', 'Newer urgent', 'Medium', 'Old and low'])
+
+    def test_priority_rank_follows_priority(self):
+        self.low.priority = 'high'
+        self.low.save(update_fields=['priority'])
+        self.assertEqual(Ticket.objects.get(pk=self.low.pk).priority_rank, 1)
+
+    def test_only_staff(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.get(reverse('queue-list')).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.claim().status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_claim_gives_the_agent_the_ticket(self):
+        response = self.claim()
+        self.assertEqual([(ticket['id'], ticket['status']) for ticket in response.data], [(self.urgent.pk, 'claimed')])
+        self.assertTrue(TicketAccess.objects.filter(ticket=self.urgent, user=self.agent, access_type='agent').exists())
+        self.assertEqual([ticket['id'] for ticket in self.client.get(reverse('ticket-list')).data], [self.urgent.pk])
+
+        self.client.force_authenticate(user=self.other_agent)
+        self.assertEqual([ticket['id'] for ticket in self.claim(count=2).data], [self.newer_urgent.pk, self.medium.pk])
+        self.assertEqual([ticket['id'] for ticket in self.claim(count=5).data], [self.low.pk])
+        self.assertEqual(self.claim().data, [])
+
+    def test_lost_race_moves_on(self):
+        # A ticket another process claimed between the read and the update is skipped.
+        Ticket.objects.filter(pk=self.urgent.pk).update(status=Ticket.STATUS_CLAIMED, claimed_at=timezone.now())
+        with mock.patch('support.queue.candidates', return_value=[self.urgent.pk, self.newer_urgent.pk]):
+            claimed = queue.claim_next(self.agent)
+        self.assertEqual(claimed, [self.newer_urgent])
+
+    def test_release(self):
+        self.claim()
+        self.client.force_authenticate(user=self.other_agent)
+        self.assertEqual(self.client.post(reverse('queue-release', args=[self.urgent.pk])).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=self.agent)
+        self.assertEqual(self.client.post(reverse('queue-release', args=[self.urgent.pk])).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Ticket.objects.get(pk=self.urgent.pk).status, Ticket.STATUS_OPEN)
+        self.assertFalse(TicketAccess.objects.filter(ticket=self.urgent).exists())
+
+    @override_settings(SUPPORT_CLAIM_TIMEOUT=60)
+    def test_stale_claims_return_to_the_queue(self):
+        self.claim(count=2)
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Ticket.objects.filter(pk__in=[self.urgent.pk, self.newer_urgent.pk]).update(claimed_at=an_hour_ago)
+        # The agent's reply renews one claim; the customer's reply on the other does not.
+        Message.objects.create(ticket=self.urgent, sender_user=self.agent, content='Looking into it.')
+        Message.objects.create(ticket=self.newer_urgent, sender_user=self.customer, content='Anyone?')
+
+        self.client.force_authenticate(user=self.other_agent)
+        self.assertEqual([ticket['id'] for ticket in self.claim().data], [self.newer_urgent.pk])
+        self.assertEqual(Ticket.objects.get(pk=self.urgent.pk).status, Ticket.STATUS_CLAIMED)
+        self.assertEqual(
+            list(TicketAccess.objects.filter(ticket=self.newer_urgent).values_list('user', flat=True)), [self.other_agent.pk],
+        )
+
+    def test_customer_dashboard_still_counts_claimed_tickets(self):
+        # Claims and releases drop the customer's cached counters, and a claimed ticket still counts as open.
+        self.client.force_authenticate(user=self.customer)
+        url = reverse('user-dashboard-stats')
+        self.assertEqual(self.client.get(url).data['open_tickets'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.claim_next(self.agent, count=2)
+        self.assertIsNone(cache.get(cache_key(self.customer.pk)))
+        self.assertEqual(self.client.get(url).data['open_tickets'], 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.release(self.urgent.pk, self.agent)
+        self.assertIsNone(cache.get(cache_key(self.customer.pk)))
@@ -2,7 +2,7 @@ from rest_framework.test import APITestCase
 from django.urls import reverse
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from support.models import Ticket, Message
+from support.models import Ticket, Message, TicketAccess
 
 User = get_user_model()
 
@@ -25,3 +25,50 @@ class TicketAPITest(APITestCase):
         response = self.client.post(self.list_url, self.ticket_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Ticket.objects.count(), 1)
+
+class TicketMessagesAPITest(APITestCase):
+    # Test cases for the ticket summaries and the paged message history.
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='password123')
+        self.agent = User.objects.create_user(email='agent@example.com', password='password123')
+        self.stranger = User.objects.create_user(email='stranger@example.com', password='password123')
+        self.tickets = [Ticket.objects.create(user=self.user, title=f'Issue {i}', description='Help.') for i in range(3)]
+        for i in range(60):
+            Message.objects.create(ticket=self.tickets[0], sender_user=self.user, content=f'Message {i} ' + 'x' * 200)
+        Message.objects.create(ticket=self.tickets[1], sender_user=self.user, content='Only one')
+        TicketAccess.objects.create(ticket=self.tickets[0], user=self.agent, access_type='agent')
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_has_count_and_preview_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('ticket-list'))
+        tickets = {ticket['id']: ticket for ticket in response.data}
+        busy, quiet, empty = (tickets[ticket.pk] for ticket in self.tickets)
+        self.assertNotIn('messages', busy)
+        self.assertEqual(busy['messages_count'], 60)
+        self.assertTrue(busy['last_message']['preview'].startswith('Message 59 '))
+        self.assertEqual(len(busy['last_message']['preview']), 120)
+        self.assertEqual((quiet['messages_count'], quiet['last_message']['preview']), (1, 'Only one'))
+        self.assertEqual((empty['messages_count'], empty['last_message']), (0, None))
+
+    def test_messages_are_cursor_paginated_newest_first(self):
+        url = reverse('ticket-messages', args=[self.tickets[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertTrue(response.data['results'][0]['content'].startswith('Message 59 '))
+        older = self.client.get(response.data['next']).data['results']
+        self.assertEqual(len(older), 10)
+        self.assertTrue(older[-1]['content'].startswith('Message 0 '))
+
+    def test_participants(self):
+        # Agents with access see and answer the ticket; other users can do neither.
+        self.client.force_authenticate(user=self.agent)
+        self.assertEqual([ticket['id'] for ticket in self.client.get(reverse('ticket-list')).data], [self.tickets[0].pk])
+        response = self.client.post(reverse('message-list'), {'ticket': self.tickets[0].pk, 'sender_user': self.agent.pk, 'content': 'On it.'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.stranger)
+        response = self.client.post(reverse('message-list'), {'ticket': self.tickets[0].pk, 'sender_user': self.stranger.pk, 'content': 'Hi.'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('ticket-messages', args=[self.tickets[0].pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
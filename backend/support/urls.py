@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TicketViewSet, MessageViewSet
+from .views import TicketViewSet, MessageViewSet, QueueViewSet, ticket_stream
 
 router = DefaultRouter()
 router.register(r'tickets', TicketViewSet)
 router.register(r'messages', MessageViewSet)
+router.register(r'queue', QueueViewSet, basename='queue')
 
 urlpatterns = [
+    path('tickets/<int:pk>/stream/', ticket_stream, name='ticket-stream'),
     path('', include(router.urls)),
 ]
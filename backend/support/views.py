@@ -1,5 +1,16 @@
-from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from shop.pagination import KeysetPagination
+from . import live, queue
 from .models import Ticket, Message
 from .serializers import TicketSerializer, MessageSerializer
 
@@ -10,13 +21,31 @@ class TicketViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Users can only see tickets they own.
-        return self.queryset.filter(user=self.request.user)
+        # Users see the tickets they opened or were given access to.
+        tickets = Ticket.objects.for_participant(self.request.user)
+        if self.action in ('messages', 'stream_token'):
+            return tickets
+        return tickets.with_message_summary()
 
     def perform_create(self, serializer):
         # Automatically set the user for a new ticket.
         serializer.save(user=self.request.user)
 
+    @action(detail=True, methods=['get'], pagination_class=KeysetPagination)
+    def messages(self, request, pk=None):
+        # The ticket's messages, newest first, a cursor page at a time.
+        ticket = self.get_object()
+        page = self.paginate_queryset(Message.objects.filter(ticket=ticket))
+        return self.get_paginated_response(MessageSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path='stream-token')
+    def stream_token(self, request, pk=None):
+        # A short-lived token for opening the ticket's event stream with EventSource, which can't send headers.
+        ticket = self.get_object()
+        token = live.stream_token(ticket.pk, request.user.pk)
+        url = request.build_absolute_uri(reverse('ticket-stream', args=[ticket.pk]))
+        return Response({'token': token, 'url': f'{url}?token={token}', 'expires_in': live.TOKEN_MAX_AGE})
+
 class MessageViewSet(viewsets.ModelViewSet):
     # ViewSet for messages within a ticket.
     queryset = Message.objects.all()
@@ -24,9 +53,85 @@ class MessageViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        # Users can only see messages for their own tickets.
-        return self.queryset.filter(ticket__user=self.request.user)
+        # Users can only see messages of tickets they take part in.
+        return self.queryset.filter(ticket__in=Ticket.objects.for_participant(self.request.user))
 
     def perform_create(self, serializer):
         # Automatically set the sender for a new message.
+        if not Ticket.objects.for_participant(self.request.user).filter(pk=serializer.validated_data['ticket'].pk).exists():
+            raise PermissionDenied('You are not a participant of this ticket.')
         serializer.save(sender_user=self.request.user)
+
+class QueueViewSet(viewsets.GenericViewSet):
+    # The agents' work queue of unclaimed open tickets (see support.queue); agents are staff users.
+    queryset = Ticket.objects.all()
+    serializer_class = TicketSerializer
+    permission_classes = [IsAdminUser]
+    max_list_size = 200
+    max_claim_size = 20
+
+    def int_param(self, name, default, maximum):
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'Must be an integer.'})
+        if not 1 <= value <= maximum:
+            raise ValidationError({name: f'Must be between 1 and {maximum}.'})
+        return value
+
+    def list(self, request):
+        # The head of the queue, in the order claims will take it.
+        limit = self.int_param('limit', 50, self.max_list_size)
+        tickets = Ticket.objects.queued().with_message_summary()[:limit]
+        return Response(self.get_serializer(tickets, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        # Claim the next ?count= tickets (default 1); an empty list means the queue is empty.
+        tickets = queue.claim_next(request.user, self.int_param('count', 1, self.max_claim_size))
+        return Response(self.get_serializer(tickets, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        # Give a claimed ticket back to the queue.
+        if not queue.release(pk, request.user):
+            raise NotFound('You have not claimed this ticket.')
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def stream_participant(request, ticket_id):
+    # The streaming user's id, or an error response; accepts a stream token or the API's usual credentials.
+    token = request.GET.get('token')
+    if token:
+        user_id = live.token_user_id(token, ticket_id)
+    else:
+        try:
+            user = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+        except APIException as exc:
+            return None, JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+        user_id = user.pk if user.is_authenticated else None
+    if user_id is None:
+        return None, JsonResponse({'detail': 'Authentication credentials were not provided or have expired.'}, status=401)
+    if not Ticket.objects.for_participant(user_id).filter(pk=ticket_id).exists():
+        return None, JsonResponse({'detail': 'Not found.'}, status=404)
+    return user_id, None
+
+def resume_position(request, ticket_id):
+    for value in (request.headers.get('Last-Event-ID'), request.GET.get('after')):
+        if value and value.isdigit():
+            return int(value)
+    return live.latest_message_id(ticket_id)
+
+async def ticket_stream(request, pk):
+    # Server-Sent Events for new messages of one ticket (see support.live).
+    _, error = await sync_to_async(stream_participant)(request, pk)
+    if error:
+        return error
+    after_id = await sync_to_async(resume_position)(request, pk)
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(live.event_stream(pk, after_id), content_type='text/event-stream')
+    else:
+        response = HttpResponse(''.join(await sync_to_async(live.poll_once)(pk, after_id)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
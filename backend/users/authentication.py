@@ -0,0 +1,84 @@
+"""
+Stateless JWT authentication, active when settings.JWT_AUTH is on.
+
+``StatelessJWTAuthentication`` checks a Bearer access token's signature,
+expiry and revocation (users.revocation) without touching the User table.
+``request.user`` becomes a ``LazyUser``. Its pk, ``is_staff`` and
+``is_superuser`` come from the token, which is enough for the permission
+classes and for filters like ``user_id=request.user.pk``. Reading any other
+attribute, or passing it where a User instance is needed, loads the row once.
+
+Claims are fixed when the access token is minted; refreshing re-reads the
+staff flags from the User row (see users.tokens). A user whose staff flag
+changes, or who is deactivated, keeps the old claims until their access
+token expires (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']) unless the session is
+blacklisted.
+"""
+import copy
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .revocation import is_revoked
+
+def load_user(user_id):
+    try:
+        return get_user_model().objects.get(pk=user_id, is_active=True)
+    except get_user_model().DoesNotExist:
+        raise AuthenticationFailed('User not found or inactive.', code='user_not_found')
+
+class LazyUser(SimpleLazyObject):
+    # request.user for a JWT: identity and flags from the token, the rest loaded on first use.
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, token):
+        user_id = token[api_settings.USER_ID_CLAIM]
+        super().__init__(lambda: load_user(user_id))
+        # Set on the instance so reading them doesn't trigger the load.
+        self.__dict__.update(
+            token=token,
+            pk=user_id,
+            User_ID=user_id,
+            is_staff=bool(token.get('staff', False)),
+            is_superuser=bool(token.get('superuser', False)),
+        )
+
+    def __bool__(self):
+        return True
+
+    def __copy__(self):
+        if self._wrapped is empty:
+            return type(self)(self.token)
+        return copy.copy(self._wrapped)
+
+    def __deepcopy__(self, memo):
+        if self._wrapped is empty:
+            return type(self)(self.token)
+        return copy.deepcopy(self._wrapped, memo)
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        if not settings.JWT_AUTH:
+            return None
+        return super().authenticate(request)
+
+    def authenticate_header(self, request):
+        if not settings.JWT_AUTH:
+            return TokenAuthentication().authenticate_header(request)
+        return super().authenticate_header(request)
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token.get(api_settings.JTI_CLAIM), token.get('rjti')):
+            raise InvalidToken({'detail': 'Token has been revoked.', 'code': 'token_revoked'})
+        return token
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken({'detail': 'Token contained no recognizable user identification.', 'code': 'token_not_valid'})
+        return LazyUser(validated_token)
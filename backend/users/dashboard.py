@@ -0,0 +1,49 @@
+"""
+Dashboard counters for a user.
+
+All counts come from a single query of scalar subqueries on the user row and
+are cached for a short time. Writes to the counted models drop the cached
+copy (see users.signals), so the cache only saves repeat visits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import User, Address
+
+def count_subquery(queryset, user_field='user'):
+    # COUNT(*) of the rows in queryset belonging to the outer user, as a scalar subquery.
+    counted = (
+        queryset.filter(**{user_field: OuterRef('pk')})
+        .order_by()
+        .values(user_field)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+def cache_key(user_id):
+    return f'users:dashboard_stats:{user_id}'
+
+def compute_dashboard_stats(user_id):
+    from orders.models import Order
+    from wishlist.models import WishlistItem
+    from support.models import Ticket
+
+    return User.objects.filter(pk=user_id).values(
+        total_orders=count_subquery(Order.objects.all()),
+        pending_orders=count_subquery(Order.objects.filter(status='pending')),
+        wishlist_items=count_subquery(WishlistItem.objects.all(), 'wishlist__user'),
+        addresses_count=count_subquery(Address.objects.all()),
+        open_tickets=count_subquery(Ticket.objects.filter(status__in=Ticket.OPEN_STATUSES)),
+    ).get()
+
+def get_dashboard_stats(user_id):
+    stats = cache.get(cache_key(user_id))
+    if stats is None:
+        stats = compute_dashboard_stats(user_id)
+        cache.set(cache_key(user_id), stats, getattr(settings, 'DASHBOARD_STATS_TIMEOUT', 60))
+    return stats
+
+def invalidate_dashboard_stats(user_id):
+    cache.delete(cache_key(user_id))
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from users.models import User
+from users.tokens import issue_tokens
+
+class Command(BaseCommand):
+    help = 'Compare queries and latency per request for Token and JWT authentication on catalog and cart reads (changes are rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with override_settings(JWT_AUTH=True, ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            user = User.objects.create_user(email='benchmark-auth@example.invalid', password=None)
+            headers = {
+                'token': f'Token {Token.objects.create(user=user).key}',
+                'jwt': f"Bearer {issue_tokens(user)['access']}",
+            }
+            for name, url in (('catalog', reverse('product-list')), ('cart', reverse('cart-list'))):
+                for mode, header in headers.items():
+                    queries, ms = self.measure(Client(HTTP_AUTHORIZATION=header), url, options['requests'])
+                    self.stdout.write(f'{name:8} {mode:6} {queries:5.1f} queries/request {ms:8.2f} ms/request')
+            transaction.set_rollback(True)
+
+    def measure(self, client, url, count):
+        client.get(url) # Warm caches and the revocation filter.
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            for _ in range(count):
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - start
+        return len(captured) / count, elapsed / count * 1000
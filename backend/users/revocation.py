@@ -0,0 +1,90 @@
+"""
+Revocation checks for stateless JWT authentication.
+
+Each process keeps a Bloom filter of the jtis of blacklisted refresh tokens
+that have not expired yet. Checking an access token is a pair of lookups in
+memory:
+
+- A token the filter has never seen is accepted without a query.
+- A possible hit is confirmed against BlacklistedToken, so a false positive
+  costs one query and never rejects a valid token.
+
+The filter is rebuilt with one query every JWT_REVOCATION_REFRESH seconds.
+Tokens blacklisted in this process are added straight away (see
+users.signals). Another process rejects a revoked token at the latest after
+its next rebuild.
+"""
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+ERROR_RATE = 0.001
+MIN_CAPACITY = 1024
+
+_revoked = None
+
+class BloomFilter:
+    # Set membership with false positives at about `error_rate` up to `capacity` keys, and no false negatives.
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        # Double hashing: k positions from the two halves of one digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+class RevokedTokens:
+    # Filter of blacklisted jtis plus the time it was built.
+    def __init__(self, jtis):
+        jtis = list(jtis)
+        self.built_at = time.monotonic()
+        self.filter = BloomFilter(max(len(jtis) * 2, MIN_CAPACITY))
+        for jti in jtis:
+            self.filter.add(jti)
+
+    @classmethod
+    def build(cls):
+        now = timezone.now()
+        return cls(BlacklistedToken.objects.filter(token__expires_at__gt=now).values_list('token__jti', flat=True))
+
+    def is_stale(self):
+        return time.monotonic() - self.built_at >= settings.JWT_REVOCATION_REFRESH
+
+def get_revoked():
+    global _revoked
+    revoked = _revoked
+    if revoked is None or revoked.is_stale():
+        revoked = _revoked = RevokedTokens.build()
+    return revoked
+
+def is_revoked(*jtis):
+    # Whether any of the given jtis (None entries are skipped) has been blacklisted.
+    revoked = get_revoked()
+    candidates = [jti for jti in jtis if jti and jti in revoked.filter]
+    if not candidates:
+        return False
+    return BlacklistedToken.objects.filter(token__jti__in=candidates).exists()
+
+def note_revoked(jti):
+    # Add a jti blacklisted in this process to the current filter without waiting for the rebuild.
+    revoked = _revoked
+    if revoked is not None:
+        revoked.filter.add(jti)
+
+def reset_revoked():
+    global _revoked
+    _revoked = None
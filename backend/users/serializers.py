@@ -2,6 +2,8 @@ from rest_framework import serializers
 from .models import User, Address
 from django.contrib.auth import get_user_model
 from allauth.account.adapter import get_adapter
+from rest_framework_simplejwt import serializers as jwt_serializers
+from .tokens import SessionRefreshToken
 
 class AuthTokenSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -61,4 +63,10 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         return user
 
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    # Refreshed access tokens keep pointing at their refresh token, so logging out revokes them too,
+    # and take the staff flags from the user row as it is now.
+    token_class = SessionRefreshToken
 
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
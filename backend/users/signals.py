@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from orders.models import Order
+from support.models import Ticket
+from wishlist.models import WishlistItem
+from .dashboard import invalidate_dashboard_stats
+from .models import Address
+from .revocation import note_revoked
+
+def user_counts_changed(sender, instance, **kwargs):
+    # Drop the cached dashboard counters of the user owning the changed row.
+    if sender is WishlistItem:
+        user_id = instance.wishlist.user_id
+    else:
+        user_id = instance.user_id
+    invalidate_dashboard_stats(user_id)
+
+for model in (Order, WishlistItem, Address, Ticket):
+    post_save.connect(user_counts_changed, sender=model, dispatch_uid=f'dashboard_stats_save_{model.__name__}')
+    post_delete.connect(user_counts_changed, sender=model, dispatch_uid=f'dashboard_stats_delete_{model.__name__}')
+
+def token_blacklisted(sender, instance, created, **kwargs):
+    # Reject the session's tokens in this process right away rather than at the next filter rebuild.
+    if created:
+        note_revoked(instance.token.jti)
+
+post_save.connect(token_blacklisted, sender=BlacklistedToken, dispatch_uid='jwt_revocation_blacklisted')
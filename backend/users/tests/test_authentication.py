@@ -0,0 +1,129 @@
+import uuid
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from catalog.models import Category, Product
+from catalog.pricing import get_index
+from users.models import User
+from users.revocation import BloomFilter, get_revoked, reset_revoked
+
+@override_settings(JWT_AUTH=True)
+class StatelessJWTAuthTest(APITestCase):
+    # Test cases for JWT mode: issuing, stateless authentication and revocation.
+    def setUp(self):
+        self.user = User.objects.create_user(email='jwt@example.com', password='password123')
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        Product.objects.create(
+            product_name='Laptop', sku='LAPTOP123', description='A powerful laptop.', price=1200,
+            weight=2.5, dimensions='30x20x2 cm', status='available', category=category
+        )
+        reset_revoked()
+        get_revoked()
+        get_index()
+
+    def login(self):
+        response = self.client.post(reverse('api-token-auth'), {'email': 'jwt@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def bearer(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_login_and_register_issue_token_pairs(self):
+        self.assertEqual(set(self.login()), {'access', 'refresh'})
+        response = self.client.post(reverse('user-register'), {'email': 'new@example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['email'], 'new@example.com')
+        self.bearer(response.data['access'])
+        self.assertEqual(self.client.get(reverse('user-me')).data['email'], 'new@example.com')
+
+    @override_settings(JWT_AUTH=False)
+    def test_token_mode_is_unchanged(self):
+        response = self.client.post(reverse('api-token-auth'), {'email': 'jwt@example.com', 'password': 'password123'})
+        self.assertEqual(set(response.data), {'token'})
+        self.assertEqual(Token.objects.get(user=self.user).key, response.data['token'])
+
+    @override_settings(JWT_AUTH=False)
+    def test_bearer_tokens_are_ignored_in_token_mode(self):
+        with override_settings(JWT_AUTH=True):
+            access = self.login()['access']
+        self.bearer(access)
+        self.assertEqual(self.client.get(reverse('cart-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reads_skip_the_user_lookup(self):
+        # A Bearer token saves the authtoken/user join that a Token key costs on every request.
+        token_header = f'Token {Token.objects.create(user=self.user).key}'
+        bearer_header = f"Bearer {self.login()['access']}"
+        cart_url, products_url = reverse('cart-list'), reverse('product-list')
+        self.client.credentials(HTTP_AUTHORIZATION=token_header)
+        self.client.get(cart_url)
+        self.client.get(products_url)
+        for header, cart_queries, product_queries in ((token_header, 3, 1), (bearer_header, 2, 0)):
+            self.client.credentials(HTTP_AUTHORIZATION=header)
+            with self.assertNumQueries(cart_queries):
+                self.assertEqual(self.client.get(cart_url).status_code, status.HTTP_200_OK)
+            with self.assertNumQueries(product_queries):
+                self.assertEqual(self.client.get(products_url).status_code, status.HTTP_200_OK)
+
+    def test_user_row_is_loaded_when_a_view_needs_it(self):
+        self.bearer(self.login()['access'])
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-me'))
+        self.assertEqual(response.data['email'], 'jwt@example.com')
+
+    def test_deactivated_user_is_rejected_once_loaded(self):
+        self.bearer(self.login()['access'])
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('user-me')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_refresh_and_access_tokens(self):
+        tokens = self.login()
+        refreshed = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}).data['access']
+        response = self.client.post(reverse('user-logout'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        for access in (tokens['access'], refreshed):
+            self.bearer(access)
+            self.assertEqual(self.client.get(reverse('cart-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        response = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(JWT_REVOCATION_REFRESH=0)
+    def test_revocations_from_other_processes_are_picked_up_on_rebuild(self):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        tokens = self.login()
+        reset_revoked()
+        get_revoked()
+        # A bulk insert skips the signal, as a blacklist written by another process would here.
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=OutstandingToken.objects.get(user=self.user))])
+        self.bearer(tokens['access'])
+        self.assertEqual(self.client.get(reverse('cart-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_flag_comes_from_the_token(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        response = self.client.post(reverse('api-token-auth'), {'email': admin.email, 'password': 'password123'})
+        self.bearer(response.data['access'])
+        with self.assertNumQueries(0):
+            response = self.client.delete(reverse('request-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_refresh_picks_up_a_demotion(self):
+        admin = User.objects.create_superuser(email='admin@example.com', password='password123')
+        response = self.client.post(reverse('api-token-auth'), {'email': admin.email, 'password': 'password123'})
+        User.objects.filter(pk=admin.pk).update(is_staff=False, is_superuser=False)
+        access = self.client.post(reverse('token-refresh'), {'refresh': response.data['refresh']}).data['access']
+        self.bearer(access)
+        self.assertEqual(self.client.delete(reverse('request-metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+class BloomFilterTest(APITestCase):
+    # Test cases for the revocation Bloom filter.
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(10000)
+        keys = [uuid.uuid4().hex for _ in range(10000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 50)
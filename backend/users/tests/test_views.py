@@ -24,3 +24,37 @@ class UserAPITest(APITestCase):
         response = self.client.post(self.list_url, new_user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(User.objects.count(), 2)
+
+class DashboardStatsAPITest(APITestCase):
+    # Test cases for the dashboard statistics endpoint.
+    def setUp(self):
+        from catalog.models import Category, Product
+        from wishlist.models import Wishlist, WishlistItem
+        from support.models import Ticket
+        self.user = User.objects.create_user(email='stats@example.com', password='password123')
+        other = User.objects.create_user(email='other@example.com', password='password123')
+        Address.objects.create(user=self.user, street='1 Main St', city='Tehran', state='Tehran', zip_code='12345')
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        product = Product.objects.create(
+            product_name='Laptop', sku='LAPTOP123', description='A powerful laptop.', price=1200,
+            weight=2.5, dimensions='30x20x2 cm', status='available', category=category
+        )
+        WishlistItem.objects.create(wishlist=Wishlist.objects.create(user=self.user), product=product)
+        Ticket.objects.create(user=self.user, title='Help', description='Where is my order?')
+        Ticket.objects.create(user=other, title='Help', description='Where is my order?')
+        self.url = reverse('user-dashboard-stats')
+        self.client.force_authenticate(user=self.user)
+
+    def test_dashboard_stats_single_query(self):
+        # Counts come from one query, are cached, and refresh after a counted row changes.
+        from orders.models import Order
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data, {
+            'total_orders': 0, 'pending_orders': 0, 'wishlist_items': 1, 'addresses_count': 1, 'open_tickets': 1,
+        })
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        Order.objects.create(user=self.user, total_price=100, status='pending')
+        response = self.client.get(self.url)
+        self.assertEqual((response.data['total_orders'], response.data['pending_orders']), (1, 1))
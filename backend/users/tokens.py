@@ -0,0 +1,44 @@
+"""
+JWT issuing for JWT mode (settings.JWT_AUTH).
+
+Access tokens carry what most requests need to know about the user, so
+``users.authentication.StatelessJWTAuthentication`` can authenticate them
+without loading the User row:
+
+- ``user_id``
+- ``staff`` and ``superuser``
+- ``rjti``, the jti of the refresh token the access token was minted from
+
+``staff`` and ``superuser`` are stamped from the User row each time an
+access token is minted, at login and on every refresh, and are never kept on
+the refresh token. A demoted user loses admin rights once their current
+access token expires, not when their session does.
+
+Revoking a session means blacklisting its refresh token (logout, or the
+token_blacklist admin). Every access token minted from that refresh token
+is then rejected too, through its ``rjti`` (see users.revocation).
+"""
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+class SessionRefreshToken(RefreshToken):
+    # Refresh token whose access tokens remember which refresh token they came from.
+    # Refresh tokens issued before the flags moved off them may still carry them; they are not copied.
+    no_copy_claims = RefreshToken.no_copy_claims + ('staff', 'superuser')
+    user = None # Set when the caller already has the row, saving the lookup.
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access['rjti'] = self['jti']
+        user = self.user or get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]})
+        access['staff'] = user.is_staff
+        access['superuser'] = user.is_superuser
+        return access
+
+def issue_tokens(user):
+    # A new refresh token for `user` and its first access token, as the login response body.
+    refresh = SessionRefreshToken.for_user(user)
+    refresh.user = user
+    return {'refresh': str(refresh), 'access': str(refresh.access_token)}
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, AddressViewSet, LoginView, RegisterView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .views import UserViewSet, AddressViewSet, LoginView, LogoutView, RegisterView
 
 router = DefaultRouter()
 router.register(r'addresses', AddressViewSet)
@@ -12,4 +13,6 @@ urlpatterns = [
     path('dashboard-stats/', UserViewSet.as_view({'get': 'dashboard_stats'}), name='user-dashboard-stats'),
     path('api-token-auth/', LoginView.as_view(), name='api-token-auth'),
     path('register/', RegisterView.as_view(), name='user-register'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('logout/', LogoutView.as_view(), name='user-logout'),
 ]
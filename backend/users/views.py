@@ -7,9 +7,13 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
 from rest_framework import serializers
 from .models import User, Address
-from .serializers import UserSerializer, AddressSerializer, AuthTokenSerializer, RegisterSerializer
+from .serializers import UserSerializer, AddressSerializer, AuthTokenSerializer, RegisterSerializer, LogoutSerializer
 from .permissions import IsOwnerOrAdmin, IsAddressOwner
+from .dashboard import get_dashboard_stats
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import TokenError
+from .tokens import SessionRefreshToken, issue_tokens
 
 class UserViewSet(viewsets.ModelViewSet):
     """
@@ -74,41 +78,9 @@ class UserViewSet(viewsets.ModelViewSet):
     def dashboard_stats(self, request):
         """
         Get dashboard statistics for the current user.
+        Counts come from one query and are briefly cached.
         """
-        from orders.models import Order
-        from wishlist.models import WishlistItem
-        from support.models import Ticket
-        
-        user = request.user
-        
-        # Get order statistics
-        total_orders = Order.objects.filter(user=user).count()
-        pending_orders = Order.objects.filter(user=user, status='pending').count()
-        
-        # Get wishlist items count
-        try:
-            wishlist_items = WishlistItem.objects.filter(user=user).count()
-        except:
-            wishlist_items = 0
-        
-        # Get addresses count
-        addresses_count = Address.objects.filter(user=user).count()
-        
-        # Get open support tickets count
-        try:
-            open_tickets = Ticket.objects.filter(user=user, status='open').count()
-        except:
-            open_tickets = 0
-        
-        stats = {
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'wishlist_items': wishlist_items,
-            'addresses_count': addresses_count,
-            'open_tickets': open_tickets,
-        }
-        
-        return Response(stats)
+        return Response(get_dashboard_stats(request.user.pk))
 
 class AddressViewSet(viewsets.ModelViewSet):
     """
@@ -139,10 +111,18 @@ class AddressViewSet(viewsets.ModelViewSet):
 class LoginView(ObtainAuthToken):
     """
     Handles user login and token authentication using email and password.
+    In JWT mode (settings.JWT_AUTH) it returns an access/refresh token pair instead of a token key.
     """
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        if not settings.JWT_AUTH:
+            return super().post(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(issue_tokens(serializer.validated_data['user']))
+
 class RegisterView(generics.CreateAPIView):
     """
     Handles user registration and account creation.
@@ -150,4 +130,29 @@ class RegisterView(generics.CreateAPIView):
     queryset = get_user_model().objects.all()
     serializer_class = RegisterSerializer
 
+    def perform_create(self, serializer):
+        self.user = serializer.save()
+
+    def create(self, request, *args, **kwargs):
+        # In JWT mode the new account is logged in straight away.
+        response = super().create(request, *args, **kwargs)
+        if settings.JWT_AUTH:
+            response.data.update(issue_tokens(self.user))
+        return response
+
+class LogoutView(generics.GenericAPIView):
+    """
+    Ends a JWT session by blacklisting its refresh token, which also revokes the access tokens minted from it.
+    """
+    serializer_class = LogoutSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            SessionRefreshToken(serializer.validated_data['refresh']).blacklist()
+        except TokenError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wishlist, WishlistItem
+from .models import Wishlist, WishlistAlert, WishlistItem
 
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
@@ -10,3 +10,8 @@ class WishlistAdmin(admin.ModelAdmin):
 class WishlistItemAdmin(admin.ModelAdmin):
     list_display = ('wishlist', 'product')
     list_filter = ('wishlist',)
+
+@admin.register(WishlistAlert)
+class WishlistAlertAdmin(admin.ModelAdmin):
+    list_display = ('user', 'product', 'kind', 'previous_price', 'price', 'created_at')
+    list_filter = ('kind',)
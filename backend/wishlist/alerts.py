@@ -0,0 +1,135 @@
+"""
+Back-in-stock and price-drop alerts for wishlisted products.
+
+Detecting a change is cheap, so it never holds up the write that caused it
+(see wishlist.signals). A price drop or a restock from zero writes one
+``wishlist_fanout`` task to the order outbox, in the same transaction. The
+task is only written when the product is on at least one wishlist.
+
+The fan-out runs in a worker. It streams the ids of the users wishlisting
+the product through the ``wishlistitem_product_idx`` index, FANOUT_BATCH at
+a time. For each batch it:
+
+- Upserts one WishlistAlert per user, product and kind. Repeated drops
+  update the price but keep the price the user last saw.
+- Enqueues one ``wishlist_digest`` task per user for the current
+  WISHLIST_ALERT_WINDOW. Its idempotency key names the user and the window,
+  so every alert a user gets in that window ends up in the same task.
+
+Each digest runs when its window closes and sends the user a single email
+listing everything pending. Afterwards it clears only the alerts still as it
+sent them. A newer drop upserted into one of them during the send keeps it
+for the next digest. Both steps may run twice (see orders.tasks).
+Running them again leaves the alerts and digest tasks as they were.
+"""
+import itertools
+import math
+import operator
+import uuid
+from functools import reduce
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from catalog.models import Product
+from inventory.models import ProductInventory
+from orders.tasks import enqueue, enqueue_many
+from shop.bulk import insert_rows
+from .models import WishlistAlert, WishlistItem
+
+FANOUT_BATCH = 5000
+
+def is_wishlisted(product_id):
+    return WishlistItem.objects.filter(product_id=product_id).exists()
+
+def wishlisted(product_ids):
+    # The subset of product_ids on at least one wishlist, in one query.
+    return set(WishlistItem.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True).distinct())
+
+def queue_fanout(product_id, kind, previous_price=None):
+    # Record that wishlists of `product_id` need alerting; call inside the transaction making the change.
+    payload = {'product_id': product_id, 'kind': kind}
+    if previous_price is not None:
+        payload['previous_price'] = str(previous_price)
+    enqueue('wishlist_fanout', payload, f'wishlist_fanout:{kind}:{product_id}:{uuid.uuid4().hex}')
+
+def window_end(at=None):
+    # End of the alert window containing `at`, and its number (used in digest keys).
+    window = settings.WISHLIST_ALERT_WINDOW
+    number = math.floor((at or datetime.now(dt_timezone.utc)).timestamp() / window) + 1
+    return datetime.fromtimestamp(number * window, dt_timezone.utc), number
+
+def in_stock(product_id):
+    return ProductInventory.objects.filter(product_id=product_id, Quantity__gt=0).exists()
+
+def fan_out(product_id, kind, previous_price=None):
+    """
+    Create alerts and digest tasks for every user wishlisting the product.
+
+    The change is checked again first, so nothing goes out if the price
+    has gone back up or the stock has run out since it was queued. Returns
+    the number of users alerted.
+    """
+    price = Product.objects.filter(pk=product_id).values_list('price', flat=True).first()
+    if price is None:
+        return 0
+    if previous_price is not None:
+        previous_price = Decimal(previous_price)
+    if kind == WishlistAlert.KIND_PRICE_DROP and not price < previous_price:
+        return 0
+    if kind == WishlistAlert.KIND_BACK_IN_STOCK and not in_stock(product_id):
+        return 0
+
+    due, window = window_end()
+    user_ids = (
+        WishlistItem.objects.filter(product_id=product_id)
+        .values_list('wishlist__user_id', flat=True).order_by()
+        .iterator(chunk_size=FANOUT_BATCH)
+    )
+    alerted = 0
+    while batch := list(itertools.islice(user_ids, FANOUT_BATCH)):
+        with transaction.atomic():
+            insert_rows(
+                WishlistAlert, ['user'], [(user_id,) for user_id in batch],
+                defaults={'product_id': product_id, 'kind': kind, 'previous_price': previous_price, 'price': price},
+                unique_fields=['user', 'product', 'kind'],
+                update_fields=['price'],
+            )
+            enqueue_many(
+                'wishlist_digest',
+                [({'user_id': user_id}, f'wishlist_digest:{user_id}:{window}') for user_id in batch],
+                available_at=due,
+            )
+        alerted += len(batch)
+    return alerted
+
+def alert_line(alert):
+    name = alert.product.product_name
+    if alert.kind == WishlistAlert.KIND_PRICE_DROP:
+        return f'- {name} is now {alert.price} (was {alert.previous_price})'
+    return f'- {name} is back in stock at {alert.price}'
+
+def send_digest(user_id):
+    # Email the user their pending alerts as one message, then clear them; returns how many were sent.
+    alerts = list(WishlistAlert.objects.filter(user_id=user_id).select_related('product').order_by('kind', 'product__product_name'))
+    if not alerts:
+        return 0
+    email = get_user_model().objects.filter(pk=user_id).values_list('email', flat=True).first()
+    if email:
+        send_mail(
+            subject='News about your wishlist',
+            message='\n'.join(['Good news about items on your wishlist:', ''] + [alert_line(alert) for alert in alerts]),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[email],
+        )
+    with transaction.atomic():
+        # An upsert only changes the price, so an alert at the price that was sent has nothing new in it.
+        WishlistAlert.objects.filter(reduce(operator.or_, [Q(pk=alert.pk, price=alert.price) for alert in alerts])).delete()
+        # Alerts that arrived while this digest ran would otherwise wait for the user's next one.
+        if WishlistAlert.objects.filter(user_id=user_id).exists():
+            due, window = window_end()
+            enqueue_many('wishlist_digest', [({'user_id': user_id}, f'wishlist_digest:{user_id}:{window}')], available_at=due)
+    return len(alerts)
@@ -0,0 +1,50 @@
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog.models import Category, Product
+from inventory.models import ProductInventory, Warehouse
+from orders.models import OrderTask
+from wishlist.alerts import fan_out
+from wishlist.models import Wishlist, WishlistAlert, WishlistItem
+
+class Command(BaseCommand):
+    help = 'Time restocking a product on many wishlists: the inventory write, then the fan-out (changes are rolled back).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200000)
+
+    def handle(self, *args, **options):
+        count = options['users']
+        with transaction.atomic():
+            category = Category.objects.create(name='Benchmark', description='Wishlist alert benchmark.')
+            product = Product.objects.create(
+                product_name='Benchmark product', sku='BENCHMARK-WISHLIST', description='Benchmark.', price=Decimal('10.00'),
+                weight=1, dimensions='1x1x1 cm', status='available', category=category,
+            )
+            users = get_user_model().objects.bulk_create(
+                [get_user_model()(email=f'wishlist-benchmark-{i}@example.invalid') for i in range(count)], batch_size=5000,
+            )
+            wishlists = Wishlist.objects.bulk_create([Wishlist(user=user) for user in users], batch_size=5000)
+            WishlistItem.objects.bulk_create([WishlistItem(wishlist=wishlist, product=product) for wishlist in wishlists], batch_size=5000)
+            warehouse = Warehouse.objects.create(Name='Benchmark', Location='Nowhere')
+            stock = ProductInventory.objects.create(product=product, warehouse=warehouse, Quantity=0)
+
+            start = time.perf_counter()
+            stock.Quantity = 10
+            stock.save()
+            write_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            task = OrderTask.objects.get(task_type='wishlist_fanout', payload__product_id=product.pk)
+            alerted = fan_out(**task.payload)
+            fanout_s = time.perf_counter() - start
+
+            self.stdout.write(f'inventory write with alert detection: {write_ms:.1f} ms')
+            self.stdout.write(f'fan-out to {alerted} wishlists: {fanout_s:.2f} s')
+            self.stdout.write(
+                f'{WishlistAlert.objects.filter(product=product).count()} alerts, '
+                f"{OrderTask.objects.filter(task_type='wishlist_digest').count()} digest tasks"
+            )
+            transaction.set_rollback(True)
@@ -16,6 +16,31 @@ class WishlistItem(models.Model):
 
     class Meta:
         unique_together = ('wishlist', 'product')
+        indexes = [
+            # Covers the alert fan-out, which reads every wishlist holding one product.
+            models.Index(fields=['product', 'wishlist'], name='wishlistitem_product_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.product_name} in {self.wishlist.user.username}'s wishlist"
+
+class WishlistAlert(models.Model):
+    # A pending back-in-stock or price-drop notice, sent to the user in the next digest (see wishlist.alerts).
+    KIND_BACK_IN_STOCK = 'back_in_stock'
+    KIND_PRICE_DROP = 'price_drop'
+    KIND_CHOICES = [(KIND_BACK_IN_STOCK, 'Back in stock'), (KIND_PRICE_DROP, 'Price drop')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    previous_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product', 'kind'], name='wishlistalert_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.product_id} for user {self.user_id}"
@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from catalog.serializers import ExpandProductMixin
 from .models import Wishlist, WishlistItem
 
-class WishlistItemSerializer(serializers.ModelSerializer):
-    # Serializer for wishlist items.
+class WishlistItemSerializer(ExpandProductMixin, serializers.ModelSerializer):
+    # Serializer for wishlist items; ?expand=product inlines the products.
     class Meta:
         model = WishlistItem
         fields = '__all__'
@@ -0,0 +1,53 @@
+from decimal import Decimal
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from catalog.models import Product
+from catalog.signals import products_repriced
+from inventory.models import ProductInventory
+from inventory.stock import products_restocked
+from .alerts import is_wishlisted, queue_fanout, wishlisted
+from .models import WishlistAlert
+
+# The remembered values are read from __dict__ so instances loaded with only()/defer() don't fetch them.
+
+@receiver(post_init, sender=Product)
+def remember_price(sender, instance, **kwargs):
+    instance._saved_price = instance.__dict__.get('price') if instance.pk else None
+
+@receiver(post_save, sender=Product)
+def product_price_dropped(sender, instance, created, **kwargs):
+    previous, price = instance._saved_price, instance.__dict__.get('price')
+    instance._saved_price = price
+    if created or previous is None or price is None:
+        return
+    if Decimal(str(price)) < Decimal(str(previous)) and is_wishlisted(instance.pk):
+        queue_fanout(instance.pk, WishlistAlert.KIND_PRICE_DROP, previous_price=previous)
+
+@receiver(post_init, sender=ProductInventory)
+def remember_quantity(sender, instance, **kwargs):
+    instance._saved_quantity = instance.__dict__.get('Quantity') if instance.pk else None
+
+@receiver(post_save, sender=ProductInventory)
+def inventory_restocked(sender, instance, created, **kwargs):
+    # Back in stock when this warehouse goes from none to some while no other warehouse had any.
+    previous = 0 if created else instance._saved_quantity
+    quantity = instance.__dict__.get('Quantity')
+    instance._saved_quantity = quantity
+    if previous is None or quantity is None or not (previous <= 0 < quantity):
+        return
+    stocked_elsewhere = ProductInventory.objects.filter(product_id=instance.product_id, Quantity__gt=0).exclude(pk=instance.pk).exists()
+    if not stocked_elsewhere and is_wishlisted(instance.product_id):
+        queue_fanout(instance.product_id, WishlistAlert.KIND_BACK_IN_STOCK)
+
+# Bulk writers skip post_save and report their changes with these signals instead.
+
+@receiver(products_repriced)
+def products_price_dropped(sender, prices, **kwargs):
+    drops = {product_id: previous for product_id, (previous, price) in prices.items() if Decimal(str(price)) < Decimal(str(previous))}
+    for product_id in wishlisted(drops):
+        queue_fanout(product_id, WishlistAlert.KIND_PRICE_DROP, previous_price=drops[product_id])
+
+@receiver(products_restocked)
+def products_back_in_stock(sender, product_ids, **kwargs):
+    for product_id in wishlisted(product_ids):
+        queue_fanout(product_id, WishlistAlert.KIND_BACK_IN_STOCK)
@@ -0,0 +1,10 @@
+from orders.tasks import register
+from .alerts import fan_out, send_digest
+
+@register('wishlist_fanout')
+def alert_wishlists(payload):
+    fan_out(payload['product_id'], payload['kind'], payload.get('previous_price'))
+
+@register('wishlist_digest')
+def send_wishlist_digest(payload):
+    send_digest(payload['user_id'])
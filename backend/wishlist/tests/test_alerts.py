@@ -0,0 +1,138 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core import mail
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from catalog.importer import ProductImporter
+from catalog.models import Category, Product
+from inventory.models import ProductInventory, Warehouse
+from inventory.stock import add_stock
+from orders.models import OrderTask
+from orders.tasks import run_pending
+from wishlist.alerts import fan_out, send_digest
+from wishlist.models import Wishlist, WishlistAlert, WishlistItem
+
+User = get_user_model()
+
+class WishlistAlertTest(TestCase):
+    # Test cases for back-in-stock and price-drop alerts.
+    def setUp(self):
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        self.laptop, self.phone, self.lamp = [
+            Product.objects.create(
+                product_name=name, sku=name.upper(), description='A product.', price=price,
+                weight=1, dimensions='10x10x10 cm', status='available', category=category
+            )
+            for name, price in (('Laptop', '1200.00'), ('Phone', '500.00'), ('Lamp', '40.00'))
+        ]
+        self.users = [User.objects.create_user(email=f'fan{i}@example.com', password='password123') for i in range(3)]
+        for user in self.users:
+            wishlist = Wishlist.objects.create(user=user)
+            WishlistItem.objects.create(wishlist=wishlist, product=self.laptop)
+            WishlistItem.objects.create(wishlist=wishlist, product=self.phone)
+        self.warehouse = Warehouse.objects.create(Name='Main Warehouse', Location='Tehran')
+        self.stock = ProductInventory.objects.create(product=self.laptop, warehouse=self.warehouse, Quantity=0)
+
+    def fanouts(self):
+        return list(OrderTask.objects.filter(task_type='wishlist_fanout').values_list('payload', flat=True))
+
+    def test_price_drop_queues_one_fanout(self):
+        product = Product.objects.get(pk=self.laptop.pk)
+        product.price = Decimal('999.00')
+        product.save()
+        product.price = Decimal('1100.00') # A rise alerts nobody.
+        product.save()
+        self.lamp.price = Decimal('30.00') # Not on any wishlist.
+        self.lamp.save()
+        self.assertEqual(self.fanouts(), [{'product_id': self.laptop.pk, 'kind': 'price_drop', 'previous_price': '1200.00'}])
+
+    def test_restock_from_zero_queues_one_fanout(self):
+        self.stock.Quantity = 5
+        self.stock.save()
+        self.stock.Quantity = 9 # Already in stock.
+        self.stock.save()
+        other = Warehouse.objects.create(Name='Second Warehouse', Location='Shiraz')
+        ProductInventory.objects.create(product=self.laptop, warehouse=other, Quantity=3)
+        self.assertEqual(self.fanouts(), [{'product_id': self.laptop.pk, 'kind': 'back_in_stock'}])
+        ProductInventory.objects.create(product=self.phone, warehouse=other, Quantity=2)
+        self.assertEqual(len(self.fanouts()), 2)
+
+    def test_bulk_writes_queue_fanouts(self):
+        # The importer's upserts and add_stock skip post_save but still raise alerts.
+        rows = [
+            {'sku': sku, 'product_name': sku.title(), 'description': 'Imported.', 'price': price, 'weight': '1.00',
+             'dimensions': '1x1x1 cm', 'status': 'available', 'category': 'Electronics'}
+            for sku, price in (('LAPTOP', '999.00'), ('PHONE', '550.00'), ('LAMP', '30.00'))
+        ]
+        report = ProductImporter().run(enumerate(rows, 2))
+        self.assertEqual(report['updated'], 3)
+        self.assertEqual(self.fanouts(), [{'product_id': self.laptop.pk, 'kind': 'price_drop', 'previous_price': '1200.00'}])
+
+        self.assertEqual(add_stock({self.stock.pk: 5}), {self.laptop.pk})
+        self.assertEqual(add_stock({self.stock.pk: 5}), set())
+        self.assertEqual(self.fanouts()[1:], [{'product_id': self.laptop.pk, 'kind': 'back_in_stock'}])
+        self.assertEqual(ProductInventory.objects.get(pk=self.stock.pk).Quantity, 10)
+
+    def test_fanout_coalesces_alerts_per_user_and_window(self):
+        self.assertEqual(fan_out(self.laptop.pk, 'price_drop', previous_price='1300.00'), 3)
+        Product.objects.filter(pk=self.phone.pk).update(price=Decimal('450.00'))
+        self.assertEqual(fan_out(self.phone.pk, 'price_drop', previous_price='500.00'), 3)
+        Product.objects.filter(pk=self.phone.pk).update(price=Decimal('400.00'))
+        fan_out(self.phone.pk, 'price_drop', previous_price='450.00')
+
+        self.assertEqual(WishlistAlert.objects.count(), 6)
+        alert = WishlistAlert.objects.get(user=self.users[0], product=self.phone)
+        self.assertEqual((alert.previous_price, alert.price), (Decimal('500.00'), Decimal('400.00')))
+        digests = OrderTask.objects.filter(task_type='wishlist_digest')
+        self.assertEqual(sorted(task.payload['user_id'] for task in digests), sorted(user.pk for user in self.users))
+        self.assertTrue(all(task.available_at > timezone.now() for task in digests))
+
+    def test_fanout_rechecks_the_change(self):
+        self.assertEqual(fan_out(self.laptop.pk, 'price_drop', previous_price='1000.00'), 0)
+        self.assertEqual(fan_out(self.laptop.pk, 'back_in_stock'), 0)
+        self.assertFalse(WishlistAlert.objects.exists())
+
+    def test_digest_sends_one_email_per_user(self):
+        ProductInventory.objects.filter(pk=self.stock.pk).update(Quantity=4)
+        fan_out(self.laptop.pk, 'back_in_stock')
+        Product.objects.filter(pk=self.phone.pk).update(price=Decimal('450.00'))
+        fan_out(self.phone.pk, 'price_drop', previous_price='500.00')
+        OrderTask.objects.filter(task_type='wishlist_digest').update(available_at=timezone.now() - timedelta(seconds=1))
+
+        run_pending('test-worker', batch_size=10)
+        self.assertEqual(len(mail.outbox), 3)
+        body = mail.outbox[0].body
+        self.assertIn('Laptop is back in stock at 1200.00', body)
+        self.assertIn('Phone is now 450.00 (was 500.00)', body)
+        self.assertFalse(WishlistAlert.objects.exists())
+        self.assertEqual(send_digest(self.users[0].pk), 0)
+
+    def test_drop_during_a_digest_is_kept_for_the_next(self):
+        Product.objects.filter(pk=self.phone.pk).update(price=Decimal('450.00'))
+        fan_out(self.phone.pk, 'price_drop', previous_price='500.00')
+        def drop_again(**kwargs):
+            Product.objects.filter(pk=self.phone.pk).update(price=Decimal('400.00'))
+            fan_out(self.phone.pk, 'price_drop', previous_price='450.00')
+        with mock.patch('wishlist.alerts.send_mail', side_effect=drop_again):
+            self.assertEqual(send_digest(self.users[0].pk), 1)
+        alert = WishlistAlert.objects.get(user=self.users[0])
+        self.assertEqual((alert.previous_price, alert.price), (Decimal('500.00'), Decimal('400.00')))
+
+    def test_end_to_end_through_the_workers(self):
+        self.stock.Quantity = 2
+        self.stock.save()
+        run_pending('test-worker')
+        self.assertEqual(WishlistAlert.objects.filter(kind='back_in_stock').count(), 3)
+        self.assertEqual(OrderTask.objects.get(task_type='wishlist_fanout').status, OrderTask.STATUS_DONE)
+
+    @override_settings(WISHLIST_ALERT_WINDOW=60)
+    @mock.patch('wishlist.alerts.FANOUT_BATCH', 10)
+    def test_batches_cover_every_user(self):
+        users = User.objects.bulk_create([User(email=f'bulk{i}@example.com') for i in range(25)])
+        wishlists = Wishlist.objects.bulk_create([Wishlist(user=user) for user in users])
+        WishlistItem.objects.bulk_create([WishlistItem(wishlist=wishlist, product=self.lamp) for wishlist in wishlists])
+        Product.objects.filter(pk=self.lamp.pk).update(price=Decimal('20.00'))
+        self.assertEqual(fan_out(self.lamp.pk, 'price_drop', previous_price='40.00'), 25)
+        self.assertEqual(OrderTask.objects.filter(task_type='wishlist_digest').count(), 25)
@@ -2,6 +2,7 @@ from rest_framework.test import APITestCase
 from django.urls import reverse
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from catalog.models import Category, Product
 from wishlist.models import Wishlist, WishlistItem
 
 User = get_user_model()
@@ -18,3 +19,26 @@ class WishlistAPITest(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['user'], self.user.id)
+
+class WishlistExpandAPITest(APITestCase):
+    # Test cases for ?expand=product on wishlists.
+    def setUp(self):
+        self.user = User.objects.create_user(email='wish@example.com', password='password123')
+        category = Category.objects.create(name='Electronics', description='Electronic devices.')
+        wishlist = Wishlist.objects.create(user=self.user)
+        for i in range(5):
+            product = Product.objects.create(
+                product_name=f'Phone {i}', sku=f'PHONE{i}', description='A phone.', price=500,
+                weight=0.2, dimensions='15x7x1 cm', status='available', category=category
+            )
+            WishlistItem.objects.create(wishlist=wishlist, product=product)
+        self.client.force_authenticate(user=self.user)
+
+    def test_expand_product(self):
+        # The wishlist and its products load in a fixed number of queries.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('my-wishlist'), {'expand': 'product'})
+        self.assertEqual([item['product']['sku'] for item in response.data['items']], [f'PHONE{i}' for i in range(5)])
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('wishlistitem-list'), {'expand': 'product'})
+        self.assertEqual(response.data[0]['product']['category_name'], 'Electronics')
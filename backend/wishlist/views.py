@@ -1,5 +1,7 @@
 from rest_framework import viewsets, mixins
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework.permissions import IsAuthenticated
+from catalog.serializers import expansions
 from .models import Wishlist, WishlistItem
 from .serializers import WishlistSerializer, WishlistItemSerializer
 
@@ -12,6 +14,9 @@ class WishlistViewSet(viewsets.GenericViewSet, mixins.RetrieveModelMixin, mixins
     def get_object(self):
         # Get the current user's wishlist or create it if it doesn't exist.
         wishlist, _ = self.queryset.get_or_create(user=self.request.user)
+        if 'product' in expansions(self.get_serializer_context()):
+            items = WishlistItem.objects.select_related('product__category', 'product__discount')
+            prefetch_related_objects([wishlist], Prefetch('items', queryset=items))
         return wishlist
 
     def get_queryset(self):
@@ -26,7 +31,10 @@ class WishlistItemViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Users can only see items in their own wishlist.
-        return self.queryset.filter(wishlist__user=self.request.user)
+        items = self.queryset.filter(wishlist__user=self.request.user)
+        if 'product' in expansions(self.get_serializer_context()):
+            items = items.select_related('product__category', 'product__discount')
+        return items
 
     def perform_create(self, serializer):
         # Automatically link the item to the current user's wishlist.